@@ -0,0 +1,595 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Offline failover benchmark.
+
+Drives the Lambda handlers against the simulated EC2, Auto Scaling and Lambda backend of
+simbackend.py and reports, per path, the simulated end-to-end recovery time (MTTR), the
+lifecycle action outcome and the API calls made:
+  * launch:        first instance of the Auto Scaling group gets its VIP
+  * failover:      unhealthy instance terminated and replaced in another AZ, VIP moved over
+  * pool-failover: same with VIPPoolMode (VIP subnets staged in every AZ)
+  * retain-failover: same with VIPRetainMode (VIP subnet and ENI rebuilt in the new AZ)
+  * retain-relaunch: same with VIPRetainMode and the replacement in the same AZ (retained ENI reattached)
+  * route-failover:  same with VIPFailoverMode route (VIP routes moved to the new primary interface)
+  * standby-failover: warm standby in route mode, active instance terminated, EIP and VIP routes moved to
+                     the standby and a new standby re-seeded (MTTR up to the move, not the re-seed)
+  * standby-pool-failover: same with VIPPoolMode staged ENIs instead of VIP routes
+  * health-failover: data plane of the instance (a local FakeTarget) fails, the health monitor marks it
+                     unhealthy after HealthCheckThreshold probe rounds and the failover path follows
+  * duplicate:       launch event delivered three times, while in flight and once completed
+  * update-asg:    first instance launch of three VNF groups triggered by updateASG, once their lifecycle
+                     hooks are registered (after 20 to 45 s)
+  * cleanup:       stack deletion through the cleanup custom resource, its delete handler followed by
+                     poll_delete once a minute until VIP subnet, ENI and EIP association are gone
+  * pool-cleanup:  same with VIPPoolMode (VIP subnets and ENIs staged in every AZ)
+  * orphans:       orphan reconciler runs against a live VNF, then in dry-run mode and OrphanGracePeriod later
+                     for real once a terminate lifecycle action timed out, leaking VIP subnet, ENI and EIP
+                     association (MTTR of the releasing run)
+
+    python benchmarks/failover.py [--runs N] [--set consistency=5] [--fault create_subnet=InvalidSubnet.Conflict:2]
+                                  [--save baseline.json] [--baseline baseline.json --tolerance 0.2]
+
+With --baseline the benchmark exits with status 1 if the median MTTR or API calls of any path
+regressed by more than the tolerance.
+"""
+
+import argparse
+import collections
+import contextlib
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import traceback
+import uuid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, HERE)
+
+# Stack settings of the handlers, as set by the template
+ENV = {
+    'AWS_DEFAULT_REGION': 'eu-west-1',
+    'SecGroupId': 'sg-0123456789abcdef0',
+    'VPCId': 'vpc-0123456789abcdef0',
+    'WANRouteTable': 'rtb-0123456789abcdef0',
+    'VIPCIDRBlock': '10.16.10.0/24',
+    'VIPAddress': '10.16.10.20/32',
+    'EIPAddress': '203.0.113.10',
+    'EIPAllocationId': 'eipalloc-0123456789abcdef0',
+    'LambdaInfoTracing': 'false',
+    'InstanceRequiresReboot': 'true',
+    'SubnetCreationAttempts': '10',
+    'VIPPoolMode': 'false',
+    'VIPRetainMode': 'false',
+    'VIPFailoverMode': 'subnet',
+    'VIPRouteTables': '',
+    'WarmStandbyMode': 'false',
+    'VIPSupernetCIDRBlock': '10.16.12.0/22',
+    'AvailabilityZones': 'eu-west-1a,eu-west-1b,eu-west-1c',
+    'SecondaryVIPs': '',
+    'VNFType': 'Custom',
+    'AutoScalingGroupName': 'vnf-asg',
+    'ASGUpdateHealthCheckGraceTime': '120',
+    'HealthCheckInterval': '10',
+    'HealthCheckThreshold': '3',
+}
+for key, value in ENV.items():
+    os.environ.setdefault(key, value)
+
+import simbackend
+import awsclients
+import cleanup
+import ENIlifecycle
+import healthmonitor
+import heartbeat
+import idempotency
+import inventory
+import lease
+import metrics
+import readiness
+import reconciler
+import statestore
+import updateASG
+import waiters
+
+# Lambda function timeout of the ENI lifecycle function in the template
+LIFECYCLE_TIMEOUT = 300
+
+class Context(object):
+    """
+    Lambda context stand-in, with remaining time measured on the simulated clock
+    """
+
+    invoked_function_arn = 'arn:aws:lambda:eu-west-1:123456789012:function:LambdaAttach2ndENI'
+
+    def __init__(self,simulation,timeout):
+        self.clock = simulation.clock
+        self.deadline = self.clock.now() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return int(max(0, self.deadline - self.clock.now()) * 1000)
+
+class Run(object):
+    """
+    one benchmark run: a fresh simulation wired into the handler modules, and the handler
+    invocations it spawned
+    """
+
+    def __init__(self,profile,scale,seed,faults,directory):
+        self.simulation = simbackend.Simulation(profile,scale,seed)
+        self.threads = []
+        self.failures = []
+        self.lock = threading.Lock()
+        self.ec2 = self.simulation.backends['ec2']
+        self.asg = self.simulation.backends['autoscaling']
+        self.faults = faults
+        # EMF records written by the handlers since the measured part of the scenario started
+        self.output = io.StringIO()
+
+        awsclients.clients.clear()
+        awsclients.clients.update({service: self.simulation.client(service) for service in self.simulation.backends})
+        waiters.clock = cleanup.clock = reconciler.clock = metrics.clock = readiness.clock = idempotency.clock = lease.clock = self.simulation.clock.now
+        waiters.sleep = healthmonitor.sleep = self.simulation.clock.sleep
+        readiness.connect = self.ec2.connect
+        healthmonitor.clock = self.simulation.clock.now
+        heartbeat.wait = self.simulation.clock.wait
+        inventory.cache.clear()
+        ENIlifecycle.state_store = healthmonitor.state_store = reconciler.state_store = statestore.get_store('sqlite://' + tempfile.mkstemp(suffix='.db', dir=directory)[1])
+        self.simulation.backends['lambda'].handler = lambda event, delay: self.spawn(self.lifecycle,event,delay=delay)
+
+    def spawn(self,function,*args,delay=0):
+        """
+        run a handler invocation in its own thread after a simulated delay
+        """
+        def target():
+            self.simulation.clock.sleep(delay)
+            try:
+                function(*args)
+            except Exception:
+                with self.lock:
+                    self.failures.append(traceback.format_exc())
+        thread = threading.Thread(target=target, daemon=True)
+        with self.lock:
+            self.threads.append(thread)
+        thread.start()
+
+    def wait(self):
+        """
+        wait for all invocations, including continuations spawned meanwhile
+        """
+        while True:
+            with self.lock:
+                running = [thread for thread in self.threads if thread.is_alive()]
+            if not running:
+                return
+            for thread in running:
+                thread.join()
+
+    def publish(self,event):
+        """
+        start the lifecycle action of an event and invoke the ENI lifecycle function with it
+        """
+        self.asg.start_action(event['detail']['EC2InstanceId'])
+        self.spawn(self.lifecycle,event)
+
+    def lifecycle(self,event):
+        ENIlifecycle.lambda_handler(event,Context(self.simulation,LIFECYCLE_TIMEOUT))
+
+    def start(self):
+        """
+        start the measured part of the scenario: drop counters and metrics of its setup, inject faults
+        and return the simulated start time
+        """
+        self.simulation.reset_counters()
+        self.output.seek(0)
+        self.output.truncate()
+        for operation, code, count in self.faults:
+            self.simulation.inject(operation,code,count)
+        return self.now()
+
+    def now(self):
+        return self.simulation.clock.now()
+
+def lifecycle_event(transition,instance_id):
+    return {
+        'id': 'event-{}-{}'.format(transition, instance_id),
+        'detail-type': 'EC2 Instance-{} Lifecycle Action'.format(transition),
+        'detail': {
+            'EC2InstanceId': instance_id,
+            'AutoScalingGroupName': os.environ['AutoScalingGroupName'],
+            'LifecycleHookName': 'vnf-{}-hook'.format(transition),
+            'LifecycleActionToken': str(uuid.uuid5(uuid.NAMESPACE_URL, '{}/{}'.format(transition, instance_id))),
+        },
+    }
+
+def launch_first(run,instance_id='i-00000000000000001',az='eu-west-1a'):
+    """
+    launch an instance and run its launch lifecycle action to completion
+    """
+    run.ec2.add_instance(instance_id,az)
+    run.publish(lifecycle_event('launch',instance_id))
+    run.wait()
+    return instance_id
+
+def lifecycle_outcome(run,instance_id,start):
+    result = run.asg.result(instance_id)
+    if result is None:
+        return None, 'none'
+    return result['Time'] - start, result['Result']
+
+def scenario_launch(run):
+    start = run.start()
+    instance_id = launch_first(run)
+    return lifecycle_outcome(run,instance_id,start)
+
+def scenario_failover(run,az='eu-west-1b'):
+    old = launch_first(run)
+    # Health check failure: old instance is terminated and its replacement launched in another AZ
+    start = run.start()
+    new = 'i-00000000000000002'
+    run.ec2.add_instance(new,az)
+    run.publish(lifecycle_event('terminate',old))
+    run.publish(lifecycle_event('launch',new))
+    run.wait()
+    if run.asg.result(old) is None or run.asg.result(old)['Result'] != 'CONTINUE':
+        return None, 'terminate-' + (run.asg.result(old) or {}).get('Result', 'none')
+    return lifecycle_outcome(run,new,start)
+
+def scenario_pool_failover(run):
+    with environment(VIPPoolMode='true'):
+        return scenario_failover(run)
+
+def scenario_retain_failover(run):
+    with environment(VIPRetainMode='true'):
+        return scenario_failover(run)
+
+def scenario_retain_relaunch(run):
+    with environment(VIPRetainMode='true'):
+        return scenario_failover(run,az='eu-west-1a')
+
+def scenario_route_failover(run):
+    # Routed VIP outside the VPC CIDR, configured on the VNF itself
+    with environment(VIPFailoverMode='route',VIPAddress='192.168.100.1/32',VIPRouteTables='rtb-0fedcba9876543210'):
+        return scenario_failover(run)
+
+def standby_failover(run):
+    active = launch_first(run)
+    standby = launch_first(run,'i-00000000000000002','eu-west-1b')
+    # Health check failure: active instance is terminated and a new standby launched in its AZ
+    start = run.start()
+    run.ec2.add_instance('i-00000000000000003','eu-west-1a')
+    run.publish(lifecycle_event('terminate',active))
+    run.publish(lifecycle_event('launch','i-00000000000000003'))
+    run.wait()
+    if (run.asg.result('i-00000000000000003') or {}).get('Result') != 'CONTINUE':
+        return None, 'reseed-' + (run.asg.result('i-00000000000000003') or {}).get('Result', 'none')
+    terminated = [result for result in run.asg.results if result['InstanceId'] == active][-1]
+    if terminated['Time'] < start or terminated['Result'] != 'CONTINUE':
+        return None, 'terminate-' + (terminated['Result'] if terminated['Time'] >= start else 'none')
+    allocation = run.ec2.addresses.get(os.environ['EIPAllocationId'], {})
+    if (run.ec2.interfaces.get(allocation.get('NetworkInterfaceId')) or {}).get('Attachment', {}).get('InstanceId') != standby:
+        return None, 'eip-not-moved'
+    return allocation['Associated'] - start, 'MOVED'
+
+def scenario_standby_failover(run):
+    with environment(WarmStandbyMode='true',VIPFailoverMode='route',VIPAddress='192.168.100.1/32'):
+        return standby_failover(run)
+
+def scenario_standby_pool_failover(run):
+    with environment(WarmStandbyMode='true',VIPPoolMode='true'):
+        return standby_failover(run)
+
+def scenario_health_failover(run):
+    target = simbackend.FakeTarget()
+    launch_first(run)
+
+    def replace(instance_id):
+        # Auto Scaling replaces the unhealthy instance in another AZ
+        run.ec2.add_instance('i-00000000000000002','eu-west-1b')
+        run.publish(lifecycle_event('terminate',instance_id))
+        run.publish(lifecycle_event('launch','i-00000000000000002'))
+    run.asg.on_unhealthy = replace
+
+    with environment(HealthChecks='tcp:{}'.format(target.port),HealthCheckAddress=target.address):
+        start = run.start()
+        target.fail()
+        run.spawn(healthmonitor.lambda_handler,{'id': 'event-health'},Context(run.simulation,90))
+        run.wait()
+    if not run.asg.health:
+        return None, 'undetected'
+    return lifecycle_outcome(run,'i-00000000000000002',start)
+
+def scenario_duplicate(run):
+    start = run.start()
+    instance_id = 'i-00000000000000001'
+    run.ec2.add_instance(instance_id,'eu-west-1a')
+    event = lifecycle_event('launch',instance_id)
+    run.publish(event)
+    # At least once delivery: redelivered while the first invocation works on it, and after it completed
+    run.spawn(run.lifecycle,event,delay=1)
+    run.spawn(run.lifecycle,event,delay=60)
+    run.wait()
+    run.spawn(run.lifecycle,event)
+    run.wait()
+    return lifecycle_outcome(run,instance_id,start)
+
+def scenario_retry_launch(run):
+    instance_id = launch_first(run)
+    # Launch event of the completed lifecycle action delivered again with another token, e.g. by a retried hook
+    start = run.start()
+    event = lifecycle_event('launch',instance_id)
+    event['detail']['LifecycleActionToken'] = str(uuid.uuid5(uuid.NAMESPACE_URL, 'retry/{}'.format(instance_id)))
+    run.publish(event)
+    run.wait()
+    result = run.asg.results[-1]
+    return result['Time'] - start, result['Result']
+
+def scenario_terminate_bare(run):
+    # Terminate action of an instance that never got its VIP ENI
+    start = run.start()
+    instance_id = 'i-00000000000000001'
+    run.ec2.add_instance(instance_id,'eu-west-1a')
+    run.publish(lifecycle_event('terminate',instance_id))
+    run.wait()
+    return lifecycle_outcome(run,instance_id,start)
+
+def scenario_update_asg(run):
+    groups = ['vnf-asg', 'vnf-b-asg', 'vnf-c-asg']
+    start = run.start()
+    for group, delay in zip(groups, (20, 30, 40)):
+        run.asg.add_hook(group,'autoscaling:EC2_INSTANCE_LAUNCHING',delay)
+        run.asg.add_hook(group,'autoscaling:EC2_INSTANCE_TERMINATING',delay + 5)
+    with environment(AutoScalingGroupName=','.join(groups)):
+        run.spawn(updateASG.lambda_handler,{'id': 'event-update', 'detail-type': 'AWS API Call via CloudTrail', 'detail': {}},None)
+        run.wait()
+    if {update['AutoScalingGroupName'] for update in run.asg.updates} != set(groups):
+        return None, 'none'
+    return max(update['Time'] for update in run.asg.updates) - start, 'UPDATED'
+
+def stack_delete(run,properties):
+    """
+    run the cleanup custom resource deletion the way crhelper does in poll mode: the delete handler, then
+    poll_delete on its CloudWatch Events schedule until it returns a resource id; returns the completion time
+    """
+    event = {'RequestType': 'Delete', 'PhysicalResourceId': 'cleanup', 'ResourceProperties': properties}
+    completed = []
+
+    def delete():
+        cleanup.helper.Data = {}
+        cleanup.delete(event,None)
+        event['CrHelperData'] = dict(cleanup.helper.Data)
+        due = run.now()
+        while True:
+            due += cleanup.POLLING_INTERVAL * 60
+            run.simulation.clock.sleep(max(0, due - run.now()))
+            if cleanup.poll_delete(event,None):
+                completed.append(run.now())
+                return
+
+    run.spawn(delete)
+    run.wait()
+    return completed[0] if completed else None
+
+def cleanup_properties():
+    properties = {key: os.environ[key] for key in ('VPCId', 'AutoScalingGroupName', 'WANRouteTable', 'VIPCIDRBlock', 'VIPAddress', 'EIPAddress', 'EIPAllocationId', 'LambdaInfoTracing', 'VIPPoolMode',
+                                                 'VIPFailoverMode', 'VIPRouteTables', 'SecondaryVIPs', 'SecGroupId', 'VIPSupernetCIDRBlock')}
+    properties['AvailabilityZones'] = os.environ['AvailabilityZones'].split(',')
+    return properties
+
+def scenario_cleanup(run):
+    launch_first(run)
+    properties = cleanup_properties()
+    # Hot spare VIP subnets and ENIs staged in every AZ when the stack was created
+    cleanup.create({'RequestType': 'Create', 'ResourceProperties': properties},None)
+    start = run.start()
+    completed = stack_delete(run,properties)
+    if completed is None:
+        return None, 'none'
+    left = run.ec2.leftovers()
+    return completed - start, 'CLEAN' if not left else 'LEFTOVERS'
+
+def scenario_pool_cleanup(run):
+    with environment(VIPPoolMode='true'):
+        return scenario_cleanup(run)
+
+def scenario_orphans(run):
+    instance_id = launch_first(run)
+    run.start()
+    # VIP subnet and ENI of a live instance are no orphans
+    if reconciler.lambda_handler({'id': 'event-reconcile-1'},None)['VPCs'][os.environ['VPCId']]['Orphans']:
+        return None, 'live-orphaned'
+    # Terminate lifecycle action timed out: instance gone, its VIP subnet, ENI and EIP association left behind
+    run.ec2.terminate_instance(instance_id)
+    del run.asg.instances[instance_id]
+    report = reconciler.lambda_handler({'id': 'event-reconcile-2', 'DryRun': True},None)['VPCs'][os.environ['VPCId']]
+    if len(report['Orphans']) != 2 or report['Released'] or not run.ec2.leftovers():
+        return None, 'dry-run-' + ('released' if report['Released'] else 'missed')
+    run.simulation.clock.sleep(reconciler.GRACE_PERIOD)
+    released = run.now()
+    report = reconciler.lambda_handler({'id': 'event-reconcile-3'},None)['VPCs'][os.environ['VPCId']]
+    left = run.ec2.leftovers() or run.ec2.addresses.get(os.environ['EIPAllocationId'], {}).get('AssociationId')
+    if len(report['Released']) != 2:
+        return None, 'none'
+    return run.now() - released, 'RELEASED' if not left else 'LEFTOVERS'
+
+SCENARIOS = {
+    'launch': scenario_launch,
+    'failover': scenario_failover,
+    'pool-failover': scenario_pool_failover,
+    'retain-failover': scenario_retain_failover,
+    'retain-relaunch': scenario_retain_relaunch,
+    'route-failover': scenario_route_failover,
+    'standby-failover': scenario_standby_failover,
+    'standby-pool-failover': scenario_standby_pool_failover,
+    'health-failover': scenario_health_failover,
+    'duplicate': scenario_duplicate,
+    'retry-launch': scenario_retry_launch,
+    'terminate-bare': scenario_terminate_bare,
+    'update-asg': scenario_update_asg,
+    'cleanup': scenario_cleanup,
+    'pool-cleanup': scenario_pool_cleanup,
+    'orphans': scenario_orphans,
+}
+
+@contextlib.contextmanager
+def environment(**variables):
+    saved = {key: os.environ.get(key) for key in variables}
+    os.environ.update(variables)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+def run_scenario(name,args,directory):
+    """
+    run a scenario args.runs times and summarise recovery time, outcomes, API calls and phase durations
+    """
+    samples = []
+    for seed in range(1, args.runs + 1):
+        run = Run(args.profile,args.scale,seed,args.faults,directory)
+        with contextlib.redirect_stdout(run.output):
+            mttr, outcome = SCENARIOS[name](run)
+        phases = {}
+        for line in run.output.getvalue().splitlines():
+            record = json.loads(line)
+            for metric in record['_aws']['CloudWatchMetrics'][0]['Metrics']:
+                if metric['Unit'] == 'Milliseconds':
+                    value = record[metric['Name']]
+                    phases.setdefault(metric['Name'], []).extend(value if isinstance(value, list) else [value])
+        samples.append({
+            'mttr': mttr, 'outcome': outcome, 'failures': run.failures, 'phases': phases,
+            'calls': sum(run.simulation.calls.values()), 'by_service': calls_by_service(run.simulation.calls),
+            'retries': run.simulation.retries, 'errors': dict(run.simulation.errors),
+        })
+    recovered = [sample['mttr'] for sample in samples if sample['mttr'] is not None]
+    outcomes = sorted({sample['outcome'] for sample in samples})
+    phases = {}
+    for sample in samples:
+        for phase, values in sample['phases'].items():
+            phases.setdefault(phase, []).append(sum(values) / 1000.0)
+    errors = {}
+    for sample in samples:
+        for code, count in sample['errors'].items():
+            errors[code] = errors.get(code, 0) + count
+    return {
+        'mttr': statistics.median(recovered) if recovered else None,
+        'mttr_max': max(recovered) if recovered else None,
+        'outcomes': outcomes,
+        'calls': statistics.median_low(sample['calls'] for sample in samples),
+        'ec2_calls': statistics.median_low(sample['by_service'].get('ec2', 0) for sample in samples),
+        'asg_calls': statistics.median_low(sample['by_service'].get('autoscaling', 0) for sample in samples),
+        'retries': sum(sample['retries'] for sample in samples),
+        'errors': errors,
+        'phases': {phase: statistics.median(values) for phase, values in phases.items()},
+        'failures': [failure for sample in samples for failure in sample['failures']],
+    }
+
+def calls_by_service(calls):
+    totals = collections.Counter()
+    for (service, operation), count in calls.items():
+        totals[service] += count
+    return totals
+
+def compare(results,baseline,tolerance):
+    """
+    list regressions of median MTTR and API calls against a baseline
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for key in ('mttr', 'calls'):
+            if reference[key] is None:
+                continue
+            if result[key] is None or result[key] > reference[key] * (1 + tolerance):
+                regressions.append('{} {}: {} (baseline {})'.format(name, key, result[key], reference[key]))
+    return regressions
+
+def parse_fault(text):
+    operation, _, rest = text.partition('=')
+    code, _, count = rest.partition(':')
+    return operation, code, int(count or 1)
+
+def parse_setting(text):
+    key, _, value = text.partition('=')
+    if key not in simbackend.PROFILE:
+        raise argparse.ArgumentTypeError('unknown setting {}, one of {}'.format(key, ', '.join(simbackend.PROFILE)))
+    return key, float(value)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenarios', nargs='*', metavar='scenario', help='scenarios to run: {} (default: all)'.format(', '.join(SCENARIOS)))
+    parser.add_argument('--runs', type=int, default=3, help='runs per scenario (median is reported)')
+    parser.add_argument('--scale', type=float, default=0.005, help='real seconds per simulated second')
+    parser.add_argument('--set', dest='settings', type=parse_setting, action='append', default=[], metavar='KEY=VALUE',
+                        help='override a setting of the simulated backend, e.g. throttle_rate=0.1')
+    parser.add_argument('--fault', dest='faults', type=parse_fault, action='append', default=[], metavar='OPERATION=CODE[:COUNT]',
+                        help='fail the next COUNT calls of an operation, e.g. create_subnet=InvalidSubnet.Conflict:2')
+    parser.add_argument('--phases', action='store_true', help='also report median duration of each workflow step')
+    parser.add_argument('--save', help='write results to a JSON file, to be used as baseline')
+    parser.add_argument('--baseline', help='JSON file of previous results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression against the baseline')
+    parser.add_argument('--verbose', action='store_true', help='keep handler error logs')
+    args = parser.parse_args()
+    args.profile = dict(args.settings)
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error('unknown scenario {}'.format(name))
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.CRITICAL)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        print('{:<22} {:>9} {:>9} {:<12} {:>6} {:>5} {:>5} {:>8}  {}'.format('path', 'MTTR s', 'max s', 'outcome', 'calls', 'ec2', 'asg', 'retries', 'errors'))
+        for name in args.scenarios or SCENARIOS:
+            result = results[name] = run_scenario(name,args,directory)
+            print('{:<22} {:>9} {:>9} {:<12} {:>6} {:>5} {:>5} {:>8}  {}'.format(
+                name,
+                '-' if result['mttr'] is None else '{:.1f}'.format(result['mttr']),
+                '-' if result['mttr_max'] is None else '{:.1f}'.format(result['mttr_max']),
+                ','.join(result['outcomes']), result['calls'], result['ec2_calls'], result['asg_calls'], result['retries'],
+                ' '.join('{}={}'.format(code, count) for code, count in sorted(result['errors'].items()))))
+            if args.phases:
+                for phase, seconds in sorted(result['phases'].items(), key=lambda item: -item[1]):
+                    print('    {:<36} {:>8.1f} s'.format(phase, seconds))
+            for failure in result['failures']:
+                print(failure, file=sys.stderr)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({name: {'mttr': result['mttr'] and round(result['mttr'], 1), 'calls': result['calls']} for name, result in results.items()}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results,json.load(f),args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
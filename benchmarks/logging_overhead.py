@@ -0,0 +1,97 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Logging overhead micro-benchmark.
+
+Measures the cost of one tracing log call carrying a describe_network_interfaces response:
+  * eager:       message formatted by the caller, then dropped because tracing is off (previous behaviour)
+  * lazy off:    message template and arguments handed to logs.infolog, tracing off
+  * lazy on:     same with tracing on, emitted as JSON to a null stream with truncation
+  * lazy sampled: tracing on, invocation not sampled for INFO
+
+    python benchmarks/logging_overhead.py [--calls N]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import logs
+
+def describe_response(interfaces=4):
+    """
+    build a describe_network_interfaces response of typical size
+    """
+    return {
+        'NetworkInterfaces': [
+            {
+                'NetworkInterfaceId': 'eni-0123456789abcdef{}'.format(i),
+                'SubnetId': 'subnet-0123456789abcdef0', 'VpcId': 'vpc-0123456789abcdef0', 'AvailabilityZone': 'eu-west-1a',
+                'Description': 'VIP ENI', 'Status': 'in-use', 'SourceDestCheck': False,
+                'Groups': [{'GroupId': 'sg-0123456789abcdef0', 'GroupName': 'vnf'}],
+                'Attachment': {'AttachmentId': 'eni-attach-0123456789abcdef0', 'InstanceId': 'i-0123456789abcdef0', 'DeviceIndex': 1, 'Status': 'attached', 'DeleteOnTermination': True},
+                'PrivateIpAddresses': [
+                    {'PrivateIpAddress': '10.16.10.{}'.format(20 + j), 'Primary': j == 0,
+                     'Association': {'AssociationId': 'eipassoc-0123456789abcdef{}'.format(j), 'AllocationId': 'eipalloc-0123456789abcdef{}'.format(j), 'PublicIp': '203.0.113.{}'.format(j)}}
+                    for j in range(3)
+                ],
+                'TagSet': [{'Key': 'Name', 'Value': 'VIP ENI'}],
+            }
+            for i in range(interfaces)
+        ],
+        'ResponseMetadata': {'RequestId': '0123', 'HTTPStatusCode': 200, 'HTTPHeaders': {'content-type': 'text/xml;charset=UTF-8', 'server': 'AmazonEC2'}, 'RetryAttempts': 0},
+    }
+
+def eager(response,LambdaInfoTracing):
+    # Previous infolog: arguments formatted before the tracing check
+    string = "get_interface -- EC2 describe ENI response: {}".format(response)
+    if str(LambdaInfoTracing) == "true":
+        logging.getLogger().info('%s', string)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=20000, help='log calls per case')
+    args = parser.parse_args()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.StreamHandler(open(os.devnull, 'w')))
+    response = describe_response()
+
+    logs.bind(CorrelationId='benchmark', InstanceId='i-0123456789abcdef0')
+    cases = [
+        ('eager', lambda: eager(response, 'false')),
+        ('lazy off', lambda: logs.infolog("get_interface -- EC2 describe ENI response: {}", 'false', response)),
+        ('lazy on', lambda: logs.infolog("get_interface -- EC2 describe ENI response: {}", 'true', response)),
+    ]
+    print('{:<14} {:>14} {:>22}'.format('case', 'us per call', 'ms per 100 calls'))
+    for name, call in cases:
+        seconds = min(timeit.repeat(call, number=args.calls, repeat=3)) / args.calls
+        print('{:<14} {:>14.2f} {:>22.3f}'.format(name, seconds * 1e6, seconds * 1e5))
+
+    logs.SAMPLE_RATES['INFO'] = 0.0
+    logs.bind(CorrelationId='benchmark', InstanceId='i-0123456789abcdef0')
+    call = lambda: logs.infolog("get_interface -- EC2 describe ENI response: {}", 'true', response)
+    seconds = min(timeit.repeat(call, number=args.calls, repeat=3)) / args.calls
+    print('{:<14} {:>14.2f} {:>22.3f}'.format('lazy sampled', seconds * 1e6, seconds * 1e5))
+
+if __name__ == '__main__':
+    main()
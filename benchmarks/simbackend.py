@@ -0,0 +1,788 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Simulated EC2, Auto Scaling and Lambda backend for the offline failover benchmarks.
+
+Clients returned by Simulation.client stand in for boto3 clients: parameters are validated
+against the botocore service models, every call takes simulated latency, may fail with injected
+errors or throttling (retried like botocore does) and resources change state over simulated time
+(eventual consistency of describe calls, subnet CIDR release, attachment, instance boot, status
+checks and reboot). EC2Backend.connect stands in for TCP connections to the data plane of the simulated
+instances, and FakeTarget for the data plane of a VNF probed over a real TCP connection.
+
+Time is dilated rather than stepped: a simulated second lasts `scale` real seconds, so handler
+threads overlap as they would in AWS while a failover of several minutes runs in about a second.
+"""
+
+import collections
+import contextlib
+import copy
+import itertools
+import json
+import random
+import socket
+import threading
+import time
+import botocore.exceptions
+import botocore.session
+from botocore import xform_name
+from botocore.validate import validate_parameters
+
+# Behaviour of the simulated backend, in simulated seconds unless stated otherwise
+PROFILE = {
+    'latency': 0.1,             # latency of describe calls
+    'mutation_latency': 0.3,    # latency of all other calls
+    'consistency': 1.0,         # delay before describe calls show created resources and stop showing deleted ones
+    'subnet_release': 4.0,      # time a deleted subnet keeps its CIDR range (create_subnet fails with InvalidSubnet.Conflict)
+    'attach': 3.0,              # time for an interface attachment to become 'attached'
+    'detach': 5.0,              # time for an interface attachment to go away
+    'boot': 40.0,               # time for a launched instance to be 'running'
+    'status_checks': 60.0,      # time after boot for instance and system status checks to be 'ok'
+    'reboot': 45.0,             # time after a reboot for the VNF to serve its data plane again (status checks stay 'ok')
+    'invoke': 0.5,              # delay before an asynchronous Lambda invocation starts
+    'hook_timeout': 120.0,      # HeartbeatTimeout of the lifecycle hooks
+    'throttle_rate': 0.0,       # share of calls failing with a throttling error
+    'max_attempts': 8,          # attempts of a throttled call, including the first one
+}
+
+# Error codes of throttled calls per service
+THROTTLING_CODES = {
+    'ec2': 'RequestLimitExceeded',
+    'autoscaling': 'Throttling',
+    'lambda': 'TooManyRequestsException',
+}
+
+# Prefixes of describe calls, taking PROFILE['latency'] instead of PROFILE['mutation_latency']
+READ_PREFIXES = ('describe_', 'get_', 'list_')
+
+service_models = {}
+models_lock = threading.Lock()
+
+def service_model(service):
+    """
+    load botocore service model of a service once, with an index of its operations by method name
+
+    :param service: AWS service name, e.g. 'ec2'
+
+    """
+    with models_lock:
+        if service not in service_models:
+            model = botocore.session.get_session().get_service_model(service)
+            service_models[service] = (model, {xform_name(name): name for name in model.operation_names})
+        return service_models[service]
+
+def client_error(code,operation,message=None):
+    """
+    build the ClientError botocore raises for an AWS error code
+
+    :param code: AWS error code, e.g. 'InvalidSubnet.Conflict'
+    :param operation: operation name
+
+    """
+    return botocore.exceptions.ClientError({'Error': {'Code': code, 'Message': message or code}}, operation)
+
+class Clock(object):
+    """
+    dilated clock: simulated seconds last `scale` real seconds
+    """
+
+    def __init__(self,scale):
+        self.scale = scale
+        self.origin = time.perf_counter()
+
+    def now(self):
+        return (time.perf_counter() - self.origin) / self.scale
+
+    def sleep(self,seconds):
+        if seconds > 0:
+            time.sleep(seconds * self.scale)
+
+    def wait(self,event,seconds):
+        return event.wait(seconds * self.scale)
+
+class Simulation(object):
+    """
+    simulated AWS account: clock, profile, service backends, injected errors and call counters
+
+    :param profile: overrides of PROFILE
+    :param scale: real seconds per simulated second
+    :param seed: seed of injected throttling and retry jitter
+
+    """
+
+    def __init__(self,profile=None,scale=0.005,seed=1):
+        self.profile = dict(PROFILE, **(profile or {}))
+        self.clock = Clock(scale)
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.ids = itertools.count(1)
+        self.faults = collections.defaultdict(collections.deque)
+        self.backends = {'ec2': EC2Backend(self), 'autoscaling': AutoScalingBackend(self), 'lambda': LambdaBackend(self)}
+        self.reset_counters()
+
+    def reset_counters(self):
+        with self.lock:
+            self.calls = collections.Counter()
+            self.retries = 0
+            self.errors = collections.Counter()
+
+    def new_id(self,prefix):
+        return '{}-{:017x}'.format(prefix, next(self.ids))
+
+    def inject(self,operation,code,count=1):
+        """
+        make the next calls of an operation fail with an error code
+
+        :param operation: method name, e.g. 'create_subnet'
+        :param code: AWS error code
+        :param count: number of failing calls
+
+        """
+        self.faults[operation].extend([code] * count)
+
+    def client(self,service):
+        return SimulatedClient(self,service)
+
+    def dispatch(self,service,operation,params):
+        """
+        run one API call attempt against the backend of a service, after latency and injected errors
+
+        :param service: AWS service name
+        :param operation: method name
+        :param params: call parameters
+
+        """
+        self.clock.sleep(self.profile['latency'] if operation.startswith(READ_PREFIXES) else self.profile['mutation_latency'])
+        with self.lock:
+            self.calls[(service, operation)] += 1
+            if self.faults[operation]:
+                code = self.faults[operation].popleft()
+            elif self.random.random() < self.profile['throttle_rate']:
+                code = THROTTLING_CODES[service]
+            else:
+                code = None
+            if code:
+                self.errors[code] += 1
+                raise client_error(code,operation)
+            try:
+                response = getattr(self.backends[service], operation)(**params)
+            except botocore.exceptions.ClientError as e:
+                self.errors[e.response['Error']['Code']] += 1
+                raise
+            return copy.deepcopy(response or {})
+
+    def backoff(self,attempt):
+        """
+        obtain botocore retry delay for a throttled attempt
+
+        :param attempt: attempt number (starting from '0')
+
+        """
+        with self.lock:
+            self.retries += 1
+            return min(20.0, self.random.random() * (2 ** attempt))
+
+class SimulatedClient(object):
+    """
+    boto3 client stand-in for one service of a simulation
+    """
+
+    def __init__(self,simulation,service):
+        self.simulation = simulation
+        self.service = service
+        self.model, self.operations = service_model(service)
+
+    def __getattr__(self,name):
+        if name not in self.operations:
+            raise AttributeError("'{}' client has no operation '{}'".format(self.service, name))
+        def call(**params):
+            return self.call(name,params)
+        return call
+
+    def call(self,operation,params):
+        validate_parameters(params, self.model.operation_model(self.operations[operation]).input_shape)
+        attempt = 0
+        while True:
+            try:
+                return self.simulation.dispatch(self.service,operation,params)
+            except botocore.exceptions.ClientError as e:
+                attempt += 1
+                if e.response['Error']['Code'] != THROTTLING_CODES[self.service] or attempt >= self.simulation.profile['max_attempts']:
+                    raise
+                self.simulation.clock.sleep(self.simulation.backoff(attempt))
+
+    def get_paginator(self,operation):
+        return Paginator(self,operation)
+
+class Paginator(object):
+    """
+    paginator stand-in returning a single page
+    """
+
+    def __init__(self,client,operation):
+        self.client = client
+        self.operation = operation
+
+    def paginate(self,**params):
+        yield self.client.call(self.operation,params)
+
+def matches(item,filters,fields):
+    """
+    check a resource against describe filters
+
+    :param item: resource description
+    :param filters: list of {'Name', 'Values'} filters
+    :param fields: filter name -> function returning the values of a resource
+
+    """
+    for entry in filters or []:
+        name = entry['Name']
+        tags = item.get('Tags', item.get('TagSet', []))
+        if name.startswith('tag:'):
+            values = [tag['Value'] for tag in tags if tag['Key'] == name[4:]]
+        elif name == 'tag-key':
+            values = [tag['Key'] for tag in tags]
+        else:
+            values = fields[name](item)
+        if not set(values) & set(entry['Values']):
+            return False
+    return True
+
+def tags_of(TagSpecifications):
+    return TagSpecifications[0]['Tags'] if TagSpecifications else []
+
+class EC2Backend(object):
+    """
+    subnets, network interfaces, Elastic IP addresses, route tables and instances of one VPC
+    """
+
+    def __init__(self,simulation):
+        self.simulation = simulation
+        self.subnets = {}
+        self.interfaces = {}
+        self.addresses = {}
+        self.associations = {}
+        self.instances = {}
+        # Routes per route table: destination CIDR -> target network interface id
+        self.routes = collections.defaultdict(dict)
+
+    def now(self):
+        return self.simulation.clock.now()
+
+    def visible(self,resource):
+        """
+        check whether describe calls show a resource yet, or still show a deleted one
+        """
+        consistency = self.simulation.profile['consistency']
+        now = self.now()
+        return resource['Created'] + consistency <= now and (resource['Deleted'] is None or now < resource['Deleted'] + consistency)
+
+    def live(self,resources):
+        return [resource for resource in resources.values() if resource['Deleted'] is None]
+
+    def leftovers(self):
+        """
+        subnets and network interfaces still there, other than those of the instances themselves
+        """
+        return [resource for resource in self.live(self.subnets) + self.live(self.interfaces) if not resource.get('Primary')]
+
+    # Instances
+
+    def add_instance(self,instance_id,az,launched=None):
+        """
+        launch a simulated instance, booting from now or from a given simulated time
+        """
+        launched = self.now() if launched is None else launched
+        self.instances[instance_id] = {'InstanceId': instance_id, 'AvailabilityZone': az, 'Launched': launched, 'Rebooted': None, 'Terminated': None}
+        # Primary interface in the WAN subnet of the AZ, there from launch and deleted on termination
+        interface_id = self.simulation.new_id('eni')
+        self.interfaces[interface_id] = {
+            'NetworkInterfaceId': interface_id, 'SubnetId': 'subnet-wan-' + az, 'VpcId': 'vpc-wan', 'AvailabilityZone': az,
+            'Description': 'Primary network interface', 'PrivateIpAddress': '10.16.{}.{}'.format(ord(az[-1]) - ord('a') + 1, 10 + len(self.instances)),
+            'SourceDestCheck': True, 'Groups': [], 'TagSet': [], 'Primary': True,
+            'Attachment': {'AttachmentId': self.simulation.new_id('eni-attach'), 'InstanceId': instance_id, 'DeviceIndex': 0, 'DeleteOnTermination': True,
+                           'Attached': launched - self.simulation.profile['attach'], 'Detached': None},
+            'Created': launched - self.simulation.profile['consistency'], 'Deleted': None,
+        }
+        self.interfaces[interface_id]['PrivateIpAddresses'] = [{'PrivateIpAddress': self.interfaces[interface_id]['PrivateIpAddress'], 'Primary': True}]
+
+    def terminate_instance(self,instance_id):
+        self.instances[instance_id]['Terminated'] = self.now()
+        for interface in self.live(self.interfaces):
+            if (interface['Attachment'] or {}).get('InstanceId') == instance_id:
+                self.detach(interface)
+                if interface.get('Primary'):
+                    for allocation in self.addresses.values():
+                        if allocation.get('NetworkInterfaceId') == interface['NetworkInterfaceId']:
+                            self.release(allocation)
+                    interface['Deleted'] = self.now()
+
+    def instance_state(self,instance):
+        if instance['Terminated'] is not None:
+            return 'shutting-down'
+        return 'running' if self.now() >= instance['Launched'] + self.simulation.profile['boot'] else 'pending'
+
+    def instance_status(self,instance):
+        profile = self.simulation.profile
+        # Like EC2, a reboot does not reset status checks
+        ready = instance['Launched'] + profile['boot'] + profile['status_checks']
+        return 'ok' if self.instance_state(instance) == 'running' and self.now() >= ready else 'initializing'
+
+    def instance(self,instance_id,operation):
+        if instance_id not in self.instances:
+            raise client_error('InvalidInstanceID.NotFound',operation)
+        return self.instances[instance_id]
+
+    def describe_instances(self,InstanceIds=(),**kwargs):
+        instances = []
+        for instance_id in InstanceIds:
+            instance = self.instance(instance_id,'DescribeInstances')
+            instances.append({
+                'InstanceId': instance_id,
+                'Placement': {'AvailabilityZone': instance['AvailabilityZone']},
+                'State': {'Name': self.instance_state(instance)},
+                'NetworkInterfaces': [
+                    {'NetworkInterfaceId': interface['NetworkInterfaceId'], 'SubnetId': interface['SubnetId'], 'PrivateIpAddress': interface['PrivateIpAddress'],
+                     'Attachment': {'AttachmentId': interface['Attachment']['AttachmentId'], 'DeviceIndex': interface['Attachment']['DeviceIndex']}}
+                    for interface in self.live(self.interfaces) if (interface['Attachment'] or {}).get('InstanceId') == instance_id
+                ],
+            })
+        return {'Reservations': [{'Instances': instances}]}
+
+    def describe_instance_status(self,InstanceIds=(),IncludeAllInstances=False,**kwargs):
+        statuses = []
+        for instance_id in InstanceIds:
+            instance = self.instance(instance_id,'DescribeInstanceStatus')
+            state = self.instance_state(instance)
+            if state != 'running' and not IncludeAllInstances:
+                continue
+            status = self.instance_status(instance)
+            statuses.append({'InstanceId': instance_id, 'AvailabilityZone': instance['AvailabilityZone'], 'InstanceState': {'Name': state},
+                             'InstanceStatus': {'Status': status}, 'SystemStatus': {'Status': status}})
+        return {'InstanceStatuses': statuses}
+
+    def reboot_instances(self,InstanceIds):
+        for instance_id in InstanceIds:
+            self.instance(instance_id,'RebootInstances')['Rebooted'] = self.now()
+
+    def data_plane_up(self,instance):
+        """
+        check whether the VNF of an instance serves its data plane: from when its status checks pass,
+        except while it reboots
+        """
+        if instance['Terminated'] is not None or self.instance_status(instance) != 'ok':
+            return False
+        return instance['Rebooted'] is None or self.now() >= instance['Rebooted'] + self.simulation.profile['reboot']
+
+    def connect(self,address,timeout=None):
+        """
+        TCP connection to the data plane, standing in for socket.create_connection: succeeds if the address
+        is on an interface (or routed to one) attached to an instance whose VNF is up, and times out otherwise;
+        addresses outside the simulated VPC, such as a FakeTarget, are connected to for real
+        """
+        host, port = address
+        routed = [target for routes in self.routes.values() for destination, target in routes.items() if destination == host + '/32']
+        holders = [interface for interface in self.live(self.interfaces)
+                   if interface['NetworkInterfaceId'] in routed or host in [entry['PrivateIpAddress'] for entry in interface['PrivateIpAddresses']]]
+        if not holders:
+            return socket.create_connection(address, timeout=timeout)
+        for interface in holders:
+            if self.attachment_status(interface) == 'attached' and self.data_plane_up(self.instances[interface['Attachment']['InstanceId']]):
+                self.simulation.clock.sleep(self.simulation.profile['latency'])
+                return contextlib.nullcontext()
+        self.simulation.clock.sleep(timeout or 0)
+        raise socket.timeout('timed out')
+
+    # Subnets and route tables
+
+    def subnet_description(self,subnet):
+        return {key: subnet[key] for key in ('SubnetId', 'VpcId', 'CidrBlock', 'AvailabilityZone', 'Tags')}
+
+    def create_subnet(self,VpcId,CidrBlock,AvailabilityZone=None,TagSpecifications=None,**kwargs):
+        release = self.simulation.profile['subnet_release']
+        for subnet in self.subnets.values():
+            if subnet['VpcId'] == VpcId and subnet['CidrBlock'] == CidrBlock and (subnet['Deleted'] is None or self.now() < subnet['Deleted'] + release):
+                raise client_error('InvalidSubnet.Conflict','CreateSubnet',"The CIDR '{}' conflicts with another subnet".format(CidrBlock))
+        subnet_id = self.simulation.new_id('subnet')
+        self.subnets[subnet_id] = {'SubnetId': subnet_id, 'VpcId': VpcId, 'CidrBlock': CidrBlock, 'AvailabilityZone': AvailabilityZone,
+                                   'Tags': tags_of(TagSpecifications), 'Created': self.now(), 'Deleted': None}
+        return {'Subnet': dict(self.subnet_description(self.subnets[subnet_id]), State='pending')}
+
+    def describe_subnets(self,SubnetIds=(),Filters=None,**kwargs):
+        if SubnetIds:
+            subnets = [self.subnets.get(subnet_id) for subnet_id in SubnetIds]
+            if not all(subnet and self.visible(subnet) for subnet in subnets):
+                raise client_error('InvalidSubnetID.NotFound','DescribeSubnets')
+        else:
+            subnets = [subnet for subnet in self.subnets.values() if self.visible(subnet)]
+        fields = {'vpc-id': lambda s: [s['VpcId']], 'cidr-block': lambda s: [s['CidrBlock']], 'availability-zone': lambda s: [s['AvailabilityZone']], 'subnet-id': lambda s: [s['SubnetId']]}
+        return {'Subnets': [dict(self.subnet_description(subnet), State='available') for subnet in subnets if matches(subnet,Filters,fields)]}
+
+    def delete_subnet(self,SubnetId):
+        subnet = self.subnets.get(SubnetId)
+        if subnet is None or subnet['Deleted'] is not None:
+            raise client_error('InvalidSubnetID.NotFound','DeleteSubnet')
+        if any(interface['SubnetId'] == SubnetId for interface in self.live(self.interfaces)):
+            raise client_error('DependencyViolation','DeleteSubnet',"The subnet '{}' has dependencies and cannot be deleted.".format(SubnetId))
+        for association_id in [key for key, association in self.associations.items() if association['SubnetId'] == SubnetId]:
+            del self.associations[association_id]
+        subnet['Deleted'] = self.now()
+
+    def associate_route_table(self,RouteTableId,SubnetId,**kwargs):
+        if any(association['SubnetId'] == SubnetId for association in self.associations.values()):
+            raise client_error('Resource.AlreadyAssociated','AssociateRouteTable')
+        association_id = self.simulation.new_id('rtbassoc')
+        self.associations[association_id] = {'RouteTableAssociationId': association_id, 'RouteTableId': RouteTableId, 'SubnetId': SubnetId}
+        return {'AssociationId': association_id}
+
+    def disassociate_route_table(self,AssociationId,**kwargs):
+        if self.associations.pop(AssociationId, None) is None:
+            raise client_error('InvalidAssociationID.NotFound','DisassociateRouteTable')
+
+    def describe_route_tables(self,RouteTableIds=(),Filters=None,**kwargs):
+        tables = collections.defaultdict(list)
+        for table_id in RouteTableIds:
+            tables[table_id]
+        for association in self.associations.values():
+            tables[association['RouteTableId']].append(dict(association, Main=False))
+        for table_id in self.routes:
+            tables[table_id]
+        tables = [{'RouteTableId': table_id, 'Associations': associations,
+                   'Routes': [{'DestinationCidrBlock': cidr, 'NetworkInterfaceId': target, 'State': 'active' if target in self.interfaces and self.interfaces[target]['Deleted'] is None else 'blackhole'}
+                              for cidr, target in self.routes[table_id].items()]}
+                  for table_id, associations in tables.items()
+                  if not RouteTableIds or table_id in RouteTableIds]
+        fields = {'route-table-id': lambda t: [t['RouteTableId']], 'association.subnet-id': lambda t: [a['SubnetId'] for a in t['Associations']]}
+        return {'RouteTables': [table for table in tables if matches(table,Filters,fields)]}
+
+    def create_route(self,RouteTableId,DestinationCidrBlock,NetworkInterfaceId=None,**kwargs):
+        self.interface(NetworkInterfaceId,'CreateRoute')
+        if DestinationCidrBlock in self.routes[RouteTableId]:
+            raise client_error('RouteAlreadyExists','CreateRoute')
+        self.routes[RouteTableId][DestinationCidrBlock] = NetworkInterfaceId
+        return {'Return': True}
+
+    def replace_route(self,RouteTableId,DestinationCidrBlock,NetworkInterfaceId=None,**kwargs):
+        self.interface(NetworkInterfaceId,'ReplaceRoute')
+        if DestinationCidrBlock not in self.routes[RouteTableId]:
+            raise client_error('InvalidParameterValue','ReplaceRoute',"There is no route defined for '{}' in the route table".format(DestinationCidrBlock))
+        self.routes[RouteTableId][DestinationCidrBlock] = NetworkInterfaceId
+
+    def delete_route(self,RouteTableId,DestinationCidrBlock,**kwargs):
+        if self.routes[RouteTableId].pop(DestinationCidrBlock, None) is None:
+            raise client_error('InvalidRoute.NotFound','DeleteRoute')
+
+    # Network interfaces
+
+    def attachment_status(self,interface):
+        attachment = interface['Attachment']
+        if attachment is None:
+            return None
+        if attachment['Detached'] is not None:
+            if self.now() >= attachment['Detached'] + self.simulation.profile['detach']:
+                interface['Attachment'] = None
+                return None
+            return 'detaching'
+        return 'attached' if self.now() >= attachment['Attached'] + self.simulation.profile['attach'] else 'attaching'
+
+    def interface_description(self,interface):
+        status = self.attachment_status(interface)
+        description = {key: interface[key] for key in ('NetworkInterfaceId', 'SubnetId', 'VpcId', 'AvailabilityZone', 'Description', 'PrivateIpAddress', 'SourceDestCheck', 'Groups', 'TagSet')}
+        description['Status'] = 'in-use' if status else 'available'
+        description['PrivateIpAddresses'] = []
+        for address in interface['PrivateIpAddresses']:
+            entry = dict(address)
+            allocation = self.allocation_of(interface['NetworkInterfaceId'],address['PrivateIpAddress'])
+            if allocation:
+                entry['Association'] = {'AssociationId': allocation['AssociationId'], 'AllocationId': allocation['AllocationId'], 'PublicIp': allocation['PublicIp']}
+                if address['Primary']:
+                    description['Association'] = entry['Association']
+            description['PrivateIpAddresses'].append(entry)
+        if status:
+            attachment = interface['Attachment']
+            description['Attachment'] = {key: attachment[key] for key in ('AttachmentId', 'InstanceId', 'DeviceIndex', 'DeleteOnTermination')}
+            description['Attachment']['Status'] = status
+        return description
+
+    def interface(self,interface_id,operation):
+        interface = self.interfaces.get(interface_id)
+        if interface is None or interface['Deleted'] is not None:
+            raise client_error('InvalidNetworkInterfaceID.NotFound',operation)
+        return interface
+
+    def create_network_interface(self,SubnetId,Groups=(),Description='',PrivateIpAddress=None,PrivateIpAddresses=None,TagSpecifications=None,**kwargs):
+        subnet = self.subnets.get(SubnetId)
+        if subnet is None or subnet['Deleted'] is not None:
+            raise client_error('InvalidSubnetID.NotFound','CreateNetworkInterface')
+        addresses = [dict(address) for address in PrivateIpAddresses] if PrivateIpAddresses else [{'PrivateIpAddress': PrivateIpAddress, 'Primary': True}]
+        for interface in self.live(self.interfaces):
+            if {a['PrivateIpAddress'] for a in interface['PrivateIpAddresses']} & {a['PrivateIpAddress'] for a in addresses}:
+                raise client_error('InvalidIPAddress.InUse','CreateNetworkInterface')
+        interface_id = self.simulation.new_id('eni')
+        self.interfaces[interface_id] = {
+            'NetworkInterfaceId': interface_id, 'SubnetId': SubnetId, 'VpcId': subnet['VpcId'], 'AvailabilityZone': subnet['AvailabilityZone'],
+            'Description': Description, 'PrivateIpAddress': addresses[0]['PrivateIpAddress'], 'PrivateIpAddresses': addresses,
+            'SourceDestCheck': True, 'Groups': [{'GroupId': group} for group in Groups], 'TagSet': tags_of(TagSpecifications),
+            'Attachment': None, 'Created': self.now(), 'Deleted': None,
+        }
+        return {'NetworkInterface': self.interface_description(self.interfaces[interface_id])}
+
+    def describe_network_interfaces(self,NetworkInterfaceIds=(),Filters=None,**kwargs):
+        if NetworkInterfaceIds:
+            interfaces = [self.interfaces.get(interface_id) for interface_id in NetworkInterfaceIds]
+            if not all(interface and self.visible(interface) for interface in interfaces):
+                raise client_error('InvalidNetworkInterfaceID.NotFound','DescribeNetworkInterfaces')
+        else:
+            interfaces = [interface for interface in self.interfaces.values() if self.visible(interface)]
+        descriptions = [self.interface_description(interface) for interface in interfaces]
+        fields = {
+            'network-interface-id': lambda i: [i['NetworkInterfaceId']], 'subnet-id': lambda i: [i['SubnetId']], 'vpc-id': lambda i: [i['VpcId']],
+            'availability-zone': lambda i: [i['AvailabilityZone']], 'description': lambda i: [i['Description']],
+            'private-ip-address': lambda i: [a['PrivateIpAddress'] for a in i['PrivateIpAddresses']],
+            'attachment.instance-id': lambda i: [i.get('Attachment', {}).get('InstanceId')], 'status': lambda i: [i['Status']],
+        }
+        return {'NetworkInterfaces': [description for description in descriptions if matches(description,Filters,fields)]}
+
+    def attach_network_interface(self,NetworkInterfaceId,InstanceId,DeviceIndex,**kwargs):
+        interface = self.interface(NetworkInterfaceId,'AttachNetworkInterface')
+        instance = self.instance(InstanceId,'AttachNetworkInterface')
+        if self.instance_state(instance) != 'running':
+            raise client_error('IncorrectInstanceState','AttachNetworkInterface')
+        if interface['AvailabilityZone'] != instance['AvailabilityZone']:
+            raise client_error('InvalidParameterCombination','AttachNetworkInterface','Interface and instance are in different Availability Zones')
+        if self.attachment_status(interface):
+            raise client_error('InvalidNetworkInterface.InUse','AttachNetworkInterface')
+        attachment_id = self.simulation.new_id('eni-attach')
+        interface['Attachment'] = {'AttachmentId': attachment_id, 'InstanceId': InstanceId, 'DeviceIndex': DeviceIndex, 'DeleteOnTermination': False,
+                                   'Attached': self.now(), 'Detached': None}
+        return {'AttachmentId': attachment_id}
+
+    def detach(self,interface):
+        if interface['Attachment'] is not None and interface['Attachment']['Detached'] is None:
+            interface['Attachment']['Detached'] = self.now()
+
+    def detach_network_interface(self,AttachmentId,Force=False,**kwargs):
+        for interface in self.live(self.interfaces):
+            if (interface['Attachment'] or {}).get('AttachmentId') == AttachmentId:
+                self.detach(interface)
+                return
+        raise client_error('InvalidAttachmentID.NotFound','DetachNetworkInterface')
+
+    def modify_network_interface_attribute(self,NetworkInterfaceId,SourceDestCheck=None,Attachment=None,**kwargs):
+        interface = self.interface(NetworkInterfaceId,'ModifyNetworkInterfaceAttribute')
+        if SourceDestCheck is not None:
+            interface['SourceDestCheck'] = SourceDestCheck['Value']
+        if Attachment is not None:
+            if not interface['Attachment'] or interface['Attachment']['AttachmentId'] != Attachment['AttachmentId']:
+                raise client_error('InvalidAttachmentID.NotFound','ModifyNetworkInterfaceAttribute')
+            interface['Attachment']['DeleteOnTermination'] = Attachment['DeleteOnTermination']
+
+    def assign_private_ip_addresses(self,NetworkInterfaceId,PrivateIpAddresses=(),AllowReassignment=False,**kwargs):
+        interface = self.interface(NetworkInterfaceId,'AssignPrivateIpAddresses')
+        known = {address['PrivateIpAddress'] for address in interface['PrivateIpAddresses']}
+        interface['PrivateIpAddresses'].extend({'PrivateIpAddress': address, 'Primary': False} for address in PrivateIpAddresses if address not in known)
+
+    def delete_network_interface(self,NetworkInterfaceId,**kwargs):
+        interface = self.interface(NetworkInterfaceId,'DeleteNetworkInterface')
+        if self.attachment_status(interface):
+            raise client_error('InvalidNetworkInterface.InUse','DeleteNetworkInterface')
+        for allocation in self.addresses.values():
+            if allocation.get('NetworkInterfaceId') == NetworkInterfaceId:
+                self.release(allocation)
+        interface['Deleted'] = self.now()
+
+    # Elastic IP addresses
+
+    def allocation(self,allocation_id):
+        if allocation_id not in self.addresses:
+            self.addresses[allocation_id] = {'AllocationId': allocation_id, 'PublicIp': '203.0.113.{}'.format(len(self.addresses) + 1), 'Domain': 'vpc'}
+        return self.addresses[allocation_id]
+
+    def allocation_of(self,interface_id,private_ip):
+        for allocation in self.addresses.values():
+            if allocation.get('NetworkInterfaceId') == interface_id and allocation.get('PrivateIpAddress') == private_ip:
+                return allocation
+        return None
+
+    def release(self,allocation):
+        for key in ('AssociationId', 'NetworkInterfaceId', 'PrivateIpAddress', 'Associated'):
+            allocation.pop(key, None)
+
+    def associate_address(self,AllocationId=None,NetworkInterfaceId=None,PrivateIpAddress=None,AllowReassociation=False,**kwargs):
+        interface = self.interface(NetworkInterfaceId,'AssociateAddress')
+        allocation = self.allocation(AllocationId)
+        if allocation.get('AssociationId') and not AllowReassociation:
+            raise client_error('Resource.AlreadyAssociated','AssociateAddress')
+        private_ip = PrivateIpAddress or interface['PrivateIpAddress']
+        if private_ip not in [address['PrivateIpAddress'] for address in interface['PrivateIpAddresses']]:
+            raise client_error('InvalidParameterValue','AssociateAddress')
+        previous = self.allocation_of(NetworkInterfaceId,private_ip)
+        if previous:
+            self.release(previous)
+        association_id = self.simulation.new_id('eipassoc')
+        allocation.update(AssociationId=association_id, NetworkInterfaceId=NetworkInterfaceId, PrivateIpAddress=private_ip, Associated=self.now())
+        return {'AssociationId': association_id}
+
+    def disassociate_address(self,AssociationId=None,**kwargs):
+        for allocation in self.addresses.values():
+            if allocation.get('AssociationId') == AssociationId:
+                self.release(allocation)
+                return
+        raise client_error('InvalidAssociationID.NotFound','DisassociateAddress')
+
+    def describe_addresses(self,AllocationIds=(),Filters=None,**kwargs):
+        allocations = [self.allocation(allocation_id) for allocation_id in AllocationIds] if AllocationIds else list(self.addresses.values())
+        return {'Addresses': [{key: value for key, value in allocation.items() if key != 'Associated'} for allocation in allocations]}
+
+class AutoScalingBackend(object):
+    """
+    lifecycle actions, expiring PROFILE['hook_timeout'] after their start or last heartbeat, and capacity
+    updates, recorded with their simulated time
+    """
+
+    def __init__(self,simulation):
+        self.simulation = simulation
+        self.actions = {}
+        self.results = []
+        self.heartbeats = []
+        self.updates = []
+        # Group members: instance id -> lifecycle state and health status
+        self.instances = {}
+        self.health = []
+        # Called with the instance id when an instance is set unhealthy, to start its replacement
+        self.on_unhealthy = None
+        # Lifecycle hooks per group, each registered from its simulated time on
+        self.hooks = collections.defaultdict(list)
+
+    def add_hook(self,group,transition,delay):
+        """
+        register a lifecycle hook of a group after a simulated delay, as CloudFormation does while creating the stack
+        """
+        self.hooks[group].append({'LifecycleHookName': '{}-{}'.format(group, transition.split('_')[-1].lower()), 'AutoScalingGroupName': group,
+                                  'LifecycleTransition': transition, 'Registered': self.simulation.clock.now() + delay})
+
+    def start_action(self,instance_id):
+        """
+        start a lifecycle action for an instance, as the Auto Scaling group does before publishing its event
+        """
+        self.actions[instance_id] = self.simulation.clock.now()
+        member = self.instances.setdefault(instance_id, {'LifecycleState': 'Pending:Wait', 'HealthStatus': 'Healthy'})
+        if member['LifecycleState'] != 'Pending:Wait':
+            member['LifecycleState'] = 'Terminating:Wait'
+
+    def active(self,instance_id,operation):
+        """
+        check that the lifecycle action of an instance is still pending, recording its timeout once expired
+        """
+        if instance_id not in self.actions:
+            raise client_error('ValidationError',operation,'No active Lifecycle Action found with instance ID {}'.format(instance_id))
+        expiry = self.actions[instance_id] + self.simulation.profile['hook_timeout']
+        if self.simulation.clock.now() > expiry:
+            del self.actions[instance_id]
+            self.results.append({'Time': expiry, 'InstanceId': instance_id, 'Result': 'TIMEOUT'})
+            raise client_error('ValidationError',operation,'No active Lifecycle Action found with instance ID {}'.format(instance_id))
+
+    def complete_lifecycle_action(self,LifecycleHookName,AutoScalingGroupName,LifecycleActionResult,InstanceId=None,LifecycleActionToken=None):
+        self.active(InstanceId,'CompleteLifecycleAction')
+        del self.actions[InstanceId]
+        self.results.append({'Time': self.simulation.clock.now(), 'InstanceId': InstanceId, 'Result': LifecycleActionResult})
+        member = self.instances.get(InstanceId)
+        if member is not None:
+            launched = member['LifecycleState'] == 'Pending:Wait' and LifecycleActionResult == 'CONTINUE'
+            member['LifecycleState'] = 'InService' if launched else 'Terminating'
+
+    def record_lifecycle_action_heartbeat(self,LifecycleHookName,AutoScalingGroupName,InstanceId=None,LifecycleActionToken=None):
+        self.active(InstanceId,'RecordLifecycleActionHeartbeat')
+        self.actions[InstanceId] = self.simulation.clock.now()
+        self.heartbeats.append({'Time': self.simulation.clock.now(), 'InstanceId': InstanceId})
+
+    def describe_auto_scaling_groups(self,AutoScalingGroupNames=(),**kwargs):
+        ec2 = self.simulation.backends['ec2']
+        instances = [dict(member, InstanceId=instance_id, AvailabilityZone=ec2.instances[instance_id]['AvailabilityZone'], ProtectedFromScaleIn=False)
+                     for instance_id, member in self.instances.items() if member['LifecycleState'] != 'Terminating']
+        return {'AutoScalingGroups': [{'AutoScalingGroupName': name, 'Instances': instances} for name in AutoScalingGroupNames]}
+
+    def set_instance_health(self,InstanceId,HealthStatus,ShouldRespectGracePeriod=True):
+        if InstanceId not in self.instances:
+            raise client_error('ValidationError','SetInstanceHealth','Instance Id not found - No managed instance found for instance ID {}'.format(InstanceId))
+        self.instances[InstanceId]['HealthStatus'] = HealthStatus
+        self.health.append({'Time': self.simulation.clock.now(), 'InstanceId': InstanceId, 'HealthStatus': HealthStatus})
+        if HealthStatus == 'Unhealthy' and self.on_unhealthy is not None:
+            self.on_unhealthy(InstanceId)
+
+    def describe_lifecycle_hooks(self,AutoScalingGroupName,LifecycleHookNames=(),**kwargs):
+        now = self.simulation.clock.now()
+        return {'LifecycleHooks': [{key: value for key, value in hook.items() if key != 'Registered'}
+                                   for hook in self.hooks[AutoScalingGroupName] if hook['Registered'] <= now]}
+
+    def update_auto_scaling_group(self,AutoScalingGroupName,**kwargs):
+        self.updates.append(dict(kwargs, Time=self.simulation.clock.now(), AutoScalingGroupName=AutoScalingGroupName))
+
+    def result(self,instance_id):
+        """
+        obtain lifecycle action result recorded for an instance, or None
+        """
+        for result in self.results:
+            if result['InstanceId'] == instance_id:
+                return result
+        return None
+
+class LambdaBackend(object):
+    """
+    asynchronous invocations, handed to a callback taking the event and the simulated start delay
+    """
+
+    def __init__(self,simulation):
+        self.simulation = simulation
+        self.handler = None
+
+    def invoke(self,FunctionName,InvocationType='RequestResponse',Payload=b'',**kwargs):
+        if self.handler is None:
+            raise client_error('ResourceNotFoundException','Invoke')
+        self.handler(json.loads(Payload),self.simulation.profile['invoke'])
+        return {'StatusCode': 202}
+
+class FakeTarget(object):
+    """
+    local TCP listener standing in for the data plane of a VNF (e.g. its BGP port), accepting and closing
+    connections until it fails
+    """
+
+    def __init__(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(16)
+        self.address, self.port = self.server.getsockname()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                connection, peer = self.server.accept()
+            except OSError:
+                return
+            connection.close()
+
+    def fail(self):
+        """
+        stop accepting connections, so that probes are refused
+        """
+        # Shut down first to wake up the pending accept, closing alone leaves the port listening meanwhile
+        self.server.shutdown(socket.SHUT_RDWR)
+        self.server.close()
+        self.thread.join()
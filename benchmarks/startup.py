@@ -0,0 +1,95 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Cold start benchmark of the Lambda handlers.
+
+Each run imports one handler module in a fresh interpreter, as a cold Lambda container would,
+and measures:
+  * import time of the handler module
+  * client creation time of its first AWS client
+  * latency of its first (stubbed, offline) API call
+
+    python benchmarks/startup.py [--runs N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Handler module -> (client attribute, service, operation, parameters, stubbed response)
+HANDLERS = {
+    'ENIlifecycle': ('ec2_client', 'ec2', 'describe_instances', {'InstanceIds': ['i-0123456789abcdef0']}, {'Reservations': []}),
+    'cleanup': ('ec2_client', 'ec2', 'describe_subnets', {'Filters': [{'Name': 'cidr-block', 'Values': ['10.16.10.0/24']}]}, {'Subnets': []}),
+    'healthmonitor': ('asg_client', 'autoscaling', 'describe_auto_scaling_groups', {'AutoScalingGroupNames': ['vnf']}, {'AutoScalingGroups': []}),
+    'reconciler': ('asg_client', 'autoscaling', 'describe_auto_scaling_groups', {'AutoScalingGroupNames': ['vnf']}, {'AutoScalingGroups': []}),
+    'updateASG': ('asg_client', 'autoscaling', 'update_auto_scaling_group', {'AutoScalingGroupName': 'vnf', 'DesiredCapacity': 1}, {}),
+}
+
+# Executed in a fresh interpreter for each run
+PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+module = __import__(sys.argv[1])
+t1 = time.perf_counter()
+import awsclients
+from botocore.stub import Stubber
+attribute, service, operation, params, response = json.loads(sys.argv[2])
+client = awsclients.client(service)
+t2 = time.perf_counter()
+with Stubber(client) as stubber:
+    stubber.add_response(operation, response, params)
+    getattr(getattr(module, attribute), operation)(**params)
+t3 = time.perf_counter()
+import boto3
+t4 = time.perf_counter()
+boto3.resource('ec2')
+t5 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'client': t2 - t1, 'first_call': t3 - t2, 'resource': t5 - t4}))
+'''
+
+def probe(handler):
+    """
+    run one cold start probe of a handler module in a fresh interpreter
+
+    :param handler: handler module name
+
+    """
+    env = dict(os.environ, PYTHONPATH=SRC)
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    env.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    output = subprocess.check_output([sys.executable, '-c', PROBE, handler, json.dumps(HANDLERS[handler])], env=env)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='cold starts per handler (median is reported)')
+    args = parser.parse_args()
+
+    print('{:<14} {:>12} {:>12} {:>14} {:>24}'.format('handler', 'import ms', 'client ms', 'first call ms', 'ec2 resource (removed) ms'))
+    for handler in HANDLERS:
+        runs = [probe(handler) for _ in range(args.runs)]
+        median = {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+        print('{:<14} {:>12.1f} {:>12.1f} {:>14.1f} {:>24.1f}'.format(handler, median['import'], median['client'], median['first_call'], median['resource']))
+
+if __name__ == '__main__':
+    main()
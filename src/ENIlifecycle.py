@@ -14,332 +14,1277 @@
 #  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 #  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-import boto3
+import concurrent.futures
 import json
-import logging
-import time
+import logs
+from logs import errorlog, infolog
 import botocore
+import desiredstate
+import heartbeat
+import idempotency
+import metrics
+import readiness
 import os
-import sys
-from datetime import datetime
+import awsclients
+import inventory
+import lease
+import registry
+import snapshot
+import standby
+import statestore
+import vippool
+import viprelease
+import viproutes
+import taskgraph
+import waiters
+import workflow
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-ec2_client = boto3.client('ec2')
-asg_client = boto3.client('autoscaling')
-ec2 = boto3.resource('ec2')
+ec2_client = awsclients.LazyClient('ec2')
+asg_client = awsclients.LazyClient('autoscaling')
+lambda_client = awsclients.LazyClient('lambda')
+
+# Workflow journal store, created on first use and reused by warm containers
+state_store = None
+# Maximum number of continuation invocations for the same lifecycle event
+MAX_CONTINUATIONS = 5
 
 def lambda_handler(event, context):
+    started = metrics.clock()
     instance_id = event['detail']['EC2InstanceId']
     LifecycleHookName = event['detail']['LifecycleHookName']
     AutoScalingGroupName = event['detail']['AutoScalingGroupName']
-    secgroup_id = os.environ['SecGroupId']
-    vpc_id = os.environ['VPCId']
-    route_table_id = os.environ['WANRouteTable']
-    cidr = str(os.environ['VIPCIDRBlock'])
-    vip = str(os.environ['VIPAddress']).split('/')[0]
-    eipaddress = str(os.environ['EIPAddress']).split('/')[0]
-    eipallocation = str(os.environ['EIPAllocationId']).split('/')[0]
-    LambdaInfoTracing = str(os.environ['LambdaInfoTracing'])
-    InstanceRequiresReboot = str(os.environ['InstanceRequiresReboot'])
-    SubnetCreationAttempts = int(os.environ['SubnetCreationAttempts'])
+    # Correlate all log records of this lifecycle action
+    logs.bind(CorrelationId=event['detail'].get('LifecycleActionToken') or instance_id,InstanceId=instance_id,AutoScalingGroupName=AutoScalingGroupName)
 
-    # printing event received:
-    infolog("lambda_handler -- Event keys: {}".format(list(event['detail'].keys())),LambdaInfoTracing)
-    infolog("lambda_handler -- Complete Event: {}".format(str(event['detail'])),LambdaInfoTracing)
+    # Resolve VNF settings for the Auto Scaling Group from the registry
+    config = registry.resolve(AutoScalingGroupName)
+    if config is None:
+        errorlog("No VNF registered for AutoScalingGroup: {}",AutoScalingGroupName)
+        return
 
-    # Find out AZ from the instance
-    AZ_list = [] 
-    
-    try:
-        event_instanceid = event['detail']['EC2InstanceId']
-        infolog("lambda_handler -- EC2 instance triggering event: {}".format(event_instanceid),LambdaInfoTracing)
-    except botocore.exceptions.ClientError as e:
-        errorlog("Error extracting EC2 instance from event details: {}".format(e.response['Error']))
+    secgroup_id = config['SecGroupId']
+    vpc_id = config['VPCId']
+    route_table_id = config['WANRouteTable']
+    cidr = str(config['VIPCIDRBlock'])
+    vip = str(config['VIPAddress']).split('/')[0]
+    eipaddress = str(config['EIPAddress']).split('/')[0]
+    eipallocation = str(config['EIPAllocationId']).split('/')[0]
+    LambdaInfoTracing = str(config.get('LambdaInfoTracing',os.environ.get('LambdaInfoTracing','false')))
+    InstanceRequiresReboot = str(config['InstanceRequiresReboot'])
+    SubnetCreationAttempts = int(config['SubnetCreationAttempts'])
+    VIPPoolMode = str(config.get('VIPPoolMode','false'))
+    VIPRetainMode = str(config.get('VIPRetainMode','false'))
+    VIPFailoverMode = str(config.get('VIPFailoverMode','subnet'))
+    VIPRouteTables = viproutes.route_tables(route_table_id,config.get('VIPRouteTables',''))
+    WarmStandbyMode = str(config.get('WarmStandbyMode','false'))
+    VIPSupernetCIDRBlock = str(config.get('VIPSupernetCIDRBlock',''))
+    AvailabilityZones = [az for az in str(config.get('AvailabilityZones','')).split(',') if az]
+    SecondaryVIPs = registry.secondary_vips(config.get('SecondaryVIPs',''))
+    VNFType = str(config.get('VNFType','Custom'))
+    ReadinessChecks = str(config.get('ReadinessChecks',''))
+    ReadinessTimeout = float(config.get('ReadinessTimeout',readiness.TIMEOUT))
+    ReadinessProbeAddress = str(config.get('ReadinessProbeAddress',''))
 
-    try:
-        instance_list = ec2_client.describe_instances()
-        infolog("lambda_handler -- EC2 instances description response: {}".format(instance_list),LambdaInfoTracing)
-        for reservation in instance_list["Reservations"]:
-            for instance in reservation.get("Instances", []):
-                if instance['InstanceId'] == event_instanceid:
-                    AZ_list.append(instance["Placement"]["AvailabilityZone"])
-        infolog("lambda_handler -- AZs out of EC2 instances description response: {}".format(AZ_list),LambdaInfoTracing)
-    except botocore.exceptions.ClientError as e:
-            errorlog("Error extracting AZ from EC2 instances description response: {}".format(e.response['Error']))
-    
-    if AZ_list:
-        AZ = AZ_list[0]
+    # printing event received:
+    infolog("lambda_handler -- Event keys: {}",LambdaInfoTracing,list(event['detail'].keys()))
+    infolog("lambda_handler -- Complete Event: {}",LambdaInfoTracing,event['detail'])
+
+    # Find out AZ from the instance, with a targeted lookup reusing warm-container cache
+    instance = inventory.get_instance(ec2_client,instance_id,LambdaInfoTracing)
+    if instance:
+        AZ = instance['AvailabilityZone']
+        infolog("lambda_handler -- AZ out of EC2 instance description: {}",LambdaInfoTracing,AZ)
     else:
         errorlog("No AZs could be extracted")
         return
 
     # Tracing EC2 details
-    infolog("lambda_handler -- Event: {}".format(event["detail-type"]),LambdaInfoTracing)
-    infolog("lambda_handler -- Instance Id: {}".format(instance_id),LambdaInfoTracing)
-    infolog("lambda_handler -- LifecycleHookName: {}".format(LifecycleHookName),LambdaInfoTracing)
-    infolog("lambda_handler -- AutoScalingGroupName: {}".format(AutoScalingGroupName),LambdaInfoTracing)
-    infolog("lambda_handler -- secgroup_id: {}".format(secgroup_id),LambdaInfoTracing)
-    infolog("lambda_handler -- vpc_id: {}".format(vpc_id),LambdaInfoTracing)
-    infolog("lambda_handler -- route_table_id: {}".format(route_table_id),LambdaInfoTracing)
-    infolog("lambda_handler -- cidr: {}".format(cidr),LambdaInfoTracing)
-    infolog("lambda_handler -- vip: {}".format(vip),LambdaInfoTracing)
-    infolog("lambda_handler -- eipaddress: {}".format(eipaddress),LambdaInfoTracing)
-    infolog("lambda_handler -- eipallocation: {}".format(eipallocation),LambdaInfoTracing)
-    infolog("lambda_handler -- AZ: {}".format(AZ),LambdaInfoTracing)
-    infolog("lambda_handler -- InstanceRequiresReboot: {}".format(InstanceRequiresReboot),LambdaInfoTracing)
-    infolog("lambda_handler -- SubnetCreationAttempts: {}".format(SubnetCreationAttempts),LambdaInfoTracing)
+    infolog("lambda_handler -- Event: {}",LambdaInfoTracing,event["detail-type"])
+    infolog("lambda_handler -- Instance Id: {}",LambdaInfoTracing,instance_id)
+    infolog("lambda_handler -- LifecycleHookName: {}",LambdaInfoTracing,LifecycleHookName)
+    infolog("lambda_handler -- AutoScalingGroupName: {}",LambdaInfoTracing,AutoScalingGroupName)
+    infolog("lambda_handler -- secgroup_id: {}",LambdaInfoTracing,secgroup_id)
+    infolog("lambda_handler -- vpc_id: {}",LambdaInfoTracing,vpc_id)
+    infolog("lambda_handler -- route_table_id: {}",LambdaInfoTracing,route_table_id)
+    infolog("lambda_handler -- cidr: {}",LambdaInfoTracing,cidr)
+    infolog("lambda_handler -- vip: {}",LambdaInfoTracing,vip)
+    infolog("lambda_handler -- eipaddress: {}",LambdaInfoTracing,eipaddress)
+    infolog("lambda_handler -- eipallocation: {}",LambdaInfoTracing,eipallocation)
+    infolog("lambda_handler -- SecondaryVIPs: {}",LambdaInfoTracing,SecondaryVIPs)
+    infolog("lambda_handler -- AZ: {}",LambdaInfoTracing,AZ)
+    infolog("lambda_handler -- InstanceRequiresReboot: {}",LambdaInfoTracing,InstanceRequiresReboot)
+    infolog("lambda_handler -- SubnetCreationAttempts: {}",LambdaInfoTracing,SubnetCreationAttempts)
+    infolog("lambda_handler -- VIPPoolMode: {}",LambdaInfoTracing,VIPPoolMode)
+    infolog("lambda_handler -- VIPRetainMode: {}",LambdaInfoTracing,VIPRetainMode)
+    infolog("lambda_handler -- VIPFailoverMode: {}",LambdaInfoTracing,VIPFailoverMode)
+    infolog("lambda_handler -- WarmStandbyMode: {}",LambdaInfoTracing,WarmStandbyMode)
+
+    # Workflow state shared by all steps, extended with the outputs of completed steps
+    state = {
+        'instance_id': instance_id,
+        'LifecycleHookName': LifecycleHookName,
+        'AutoScalingGroupName': AutoScalingGroupName,
+        'secgroup_id': secgroup_id,
+        'vpc_id': vpc_id,
+        'route_table_id': route_table_id,
+        'cidr': cidr,
+        'vip': vip,
+        'eipaddress': eipaddress,
+        'eipallocation': eipallocation,
+        'SecondaryVIPs': SecondaryVIPs,
+        'addresses': [(vip, eipallocation)] + SecondaryVIPs,
+        'AZ': AZ,
+        'AvailabilityZones': AvailabilityZones,
+        'VIPSupernetCIDRBlock': VIPSupernetCIDRBlock,
+        'InstanceRequiresReboot': InstanceRequiresReboot,
+        'SubnetCreationAttempts': SubnetCreationAttempts,
+        'VIPPoolMode': VIPPoolMode,
+        'VIPRetainMode': VIPRetainMode,
+        'VIPFailoverMode': VIPFailoverMode,
+        'VIPRouteTables': VIPRouteTables,
+        'WarmStandbyMode': WarmStandbyMode,
+        'ReadinessChecks': ReadinessChecks,
+        'ReadinessTimeout': ReadinessTimeout,
+        'ReadinessProbeAddress': ReadinessProbeAddress,
+        'LambdaInfoTracing': LambdaInfoTracing,
+        'context': context,
+        # Request-scoped descriptions of subnet, ENI and route table, shared by all steps
+        'resources': snapshot.Snapshot(ec2_client,LambdaInfoTracing),
+    }
 
     if event["detail-type"] == "EC2 Instance-launch Lifecycle Action":
-        
-        subnet_id = None
-        attempts = 0
-        # Attempts to create secondary subnet in same AZ and associate it to Route Table
-        while (not subnet_id) and attempts < SubnetCreationAttempts : 
-            infolog("lambda_handler -- Attempt nr. {} to create and associate subnet".format(attempts),LambdaInfoTracing)
-            subnet_id = create_and_associate_subnet(vpc_id,cidr,AZ,route_table_id,LambdaInfoTracing)
-            attempts += 1
-            time.sleep(10)
+        if WarmStandbyMode == "true":
+            steps = STANDBY_ROUTE_LAUNCH_STEPS if VIPFailoverMode == "route" else STANDBY_POOL_LAUNCH_STEPS
+        elif VIPFailoverMode == "route":
+            steps = ROUTE_LAUNCH_STEPS
+        else:
+            steps = POOL_LAUNCH_STEPS if VIPPoolMode == "true" else RETAIN_LAUNCH_STEPS if VIPRetainMode == "true" else LAUNCH_STEPS
+        transition = 'Launch'
+    elif event["detail-type"] == "EC2 Instance-terminate Lifecycle Action":
+        if WarmStandbyMode == "true":
+            steps = STANDBY_ROUTE_TERMINATE_STEPS if VIPFailoverMode == "route" else STANDBY_POOL_TERMINATE_STEPS
+        elif VIPFailoverMode == "route":
+            steps = ROUTE_TERMINATE_STEPS
+        else:
+            steps = POOL_TERMINATE_STEPS if VIPPoolMode == "true" else RETAIN_TERMINATE_STEPS if VIPRetainMode == "true" else TERMINATE_STEPS
+        transition = 'Terminate'
+    else:
+        return
 
-        if not subnet_id:
-            # No subnet could be created after SubnetCreationAttempts attempts, abandon lifecycle hook
-            # Lifecycle Hook event failed
-            complete_lifecycle_action_failure(LifecycleHookName,AutoScalingGroupName,instance_id,LambdaInfoTracing)
+    # Per-phase timings, attempt counts and outcome of this invocation, flushed once as an EMF record
+    state['metrics'] = metrics.Histogram({'AutoScalingGroupName': AutoScalingGroupName, 'AvailabilityZone': AZ, 'VNFType': VNFType},prefix=transition+'.')
+    state['metrics'].set_property('InstanceId',instance_id)
+    state['metrics'].set_property('Continuations',int(event.get('continuations', 0)))
+    try:
+        return run_lifecycle_action(event,context,steps,state)
+    finally:
+        state['metrics'].observe('Total',(metrics.clock() - started) * 1000)
+        state['metrics'].flush()
+
+def run_lifecycle_action(event,context,steps,state):
+    """
+    run lifecycle action workflow, then hand over, roll back or complete it depending on its outcome
+
+    :param event: lifecycle event
+    :param context: Lambda context
+    :param steps: lifecycle action state machine
+    :param state: workflow state
+
+    """
+    LambdaInfoTracing = state['LambdaInfoTracing']
+    AutoScalingGroupName = state['AutoScalingGroupName']
+    LifecycleHookName = state['LifecycleHookName']
+    instance_id = state['instance_id']
+
+    # Run lifecycle action as a journaled state machine, resuming after the last completed step
+    journal_key = event['detail'].get('LifecycleActionToken') or "{}-{}-{}".format(AutoScalingGroupName,instance_id,event["detail-type"])
+
+    # Plan-only mode reports the actions the lifecycle action would take, without taking any
+    if str(event.get('PlanOnly', os.environ.get('LifecyclePlanOnly', 'false'))).lower() == "true":
+        return plan_only(steps,state,journal_key)
+
+    # Duplicate deliveries of the event neither redo nor undo the work of the invocation handling it
+    claim = idempotency.Claim(journal_store(),journal_key,context,LambdaInfoTracing)
+    if not claim.acquire():
+        result = claim.wait(workflow.budget(context,idempotency.WAIT))
+        if result is not None or not claim.acquire():
+            infolog("lambda_handler -- duplicate event for {}, handled by another invocation (result: {})",LambdaInfoTracing,journal_key,result)
+            state['metrics'].set_property('Status','duplicate')
+            state['metrics'].count('Duplicates')
             return
 
-        # Create ENI within secondary subnet in same AZ
-        interface_id = create_interface(subnet_id,secgroup_id,vip,eipaddress,eipallocation,LambdaInfoTracing)
+    try:
+        # Desired state: a lifecycle action without journal only takes the actions missing from the current state
+        steps, journal_key = reconcile(steps,state,journal_key)
 
-        if not interface_id:
-            # No ENI could be created
-            # Lifecycle Hook event failed
-            complete_lifecycle_action_failure(LifecycleHookName,AutoScalingGroupName,instance_id,LambdaInfoTracing)
-            disassociate_delete_subnet(subnet_id,route_table_id,LambdaInfoTracing)
+        # Lifecycle actions creating or tearing down the resources of the same VIP are serialised by a lease,
+        # held until this one has been completed or rolled back
+        state['lease'] = lease.Lease(journal_store(),"vip-{}-{}".format(state['vpc_id'],state['cidr']),journal_key,context,LambdaInfoTracing)
+    except Exception:
+        # Hand the lifecycle action over to the retry invocation, run_workflow releases it from here on
+        claim.release()
+        raise
+    status = None
+    try:
+        status = run_workflow(event,context,steps,state,journal_key,claim)
+        infolog("lambda_handler -- workflow {} status: {}",LambdaInfoTracing,journal_key,status)
+        infolog("lambda_handler -- EC2 describe calls: {}",LambdaInfoTracing,state['resources'].calls)
+        state['metrics'].set_property('Status',status)
+        state['metrics'].count('DescribeCalls',state['resources'].calls)
+
+        if status == workflow.SUSPENDED:
+            # Not enough time left in this invocation, hand over to a continuation invocation
+            continue_invocation(event,context,LambdaInfoTracing)
             return
 
-        # Index is 1 because it is secondary interface to the instance
-        attachment = attach_interface(interface_id,instance_id,1,LambdaInfoTracing)
+        if status == workflow.FAILED and event["detail-type"] == "EC2 Instance-launch Lifecycle Action":
+            # Lifecycle Hook event failed, roll back what was created, unless staged in hot spare or retain mode
+            # or left to the next launch in route mode
+            with state['metrics'].timer('complete_failure'):
+                complete_lifecycle_action_failure(LifecycleHookName,AutoScalingGroupName,instance_id,LambdaInfoTracing)
+            record_outcome(state,'ABANDON')
+            if steps is LAUNCH_STEPS:
+                with state['metrics'].timer('rollback'):
+                    if state.get('interface_id'):
+                        # VNF not ready still holds the VIP interface, which cannot be deleted while attached
+                        detach_interface(state['interface_id'],LambdaInfoTracing,state['resources'])
+                        delete_interface(state['interface_id'],state['eipaddress'],state['eipallocation'],LambdaInfoTracing,state['resources'])
+                    if state.get('subnet_id'):
+                        disassociate_delete_subnet(state['subnet_id'],state['route_table_id'],LambdaInfoTracing,resources=state['resources'])
+            return
+
+        if status == workflow.DONE:
+            record_outcome(state,'CONTINUE')
+
+        if event["detail-type"] == "EC2 Instance-terminate Lifecycle Action":
+            inventory.invalidate(instance_id)
+    finally:
+        # VIP resources are handed over, unless this lifecycle action goes on in a continuation invocation
+        if status != workflow.SUSPENDED:
+            state['lease'].release()
+
+def run_workflow(event,context,steps,state,journal_key,claim):
+    """
+    run lifecycle action workflow under its claim, recording lifecycle action heartbeats meanwhile; returns its status
+
+    :param event: lifecycle event
+    :param context: Lambda context
+    :param steps: lifecycle action state machine
+    :param state: workflow state
+    :param journal_key: workflow journal key
+    :param claim: idempotency.Claim held on the lifecycle action
+
+    """
+    status = None
+    try:
+        # Keep the lifecycle action alive while this invocation works on it, so the hook timeout can stay tight
+        with heartbeat.Heartbeat(asg_client,state['LifecycleHookName'],state['AutoScalingGroupName'],state['instance_id'],event['detail'].get('LifecycleActionToken'),state['LambdaInfoTracing']) as beats:
+            status = workflow.run_steps(journal_store(),journal_key,steps,state,context,state['LambdaInfoTracing'],state['metrics'])
+    finally:
+        # Hand the lifecycle action over to continuation or retry invocations, unless it has been completed
+        claim.release(status if status in (workflow.DONE, workflow.FAILED) else None)
+    state['metrics'].count('Heartbeats',beats.beats)
+    return status
+
+def plan(steps,state):
+    """
+    observe the VIP resources in one snapshot and diff them against the desired state of the instance;
+    returns the Snapshot holding their descriptions, the observed state and the missing (action, resource id) tuples
+
+    :param steps: LAUNCH_STEPS or TERMINATE_STEPS
+    :param state: workflow state
+
+    """
+    resources = snapshot.Snapshot(ec2_client,state['LambdaInfoTracing'])
+    observed = desiredstate.observe(resources,state['vpc_id'],state['cidr'],state['vip'],state['LambdaInfoTracing'])
+    if steps is LAUNCH_STEPS:
+        actions = desiredstate.launch_plan(observed,state['instance_id'],state['route_table_id'],state['addresses'])
+    else:
+        actions = desiredstate.terminate_plan(observed,state['instance_id'])
+    state['metrics'].set_property('Plan',[action for action, resource_id in actions])
+    state['metrics'].count('PlannedActions',len(actions))
+    return resources, observed, actions
+
+def plan_only(steps,state,journal_key):
+    """
+    report the actions a lifecycle action would take to reach the desired state, without taking them
+    or completing the lifecycle action; returns the report
+
+    :param steps: lifecycle action state machine
+    :param state: workflow state
+    :param journal_key: workflow journal key
+
+    """
+    state['metrics'].set_property('Status','plan')
+    if steps is not LAUNCH_STEPS and steps is not TERMINATE_STEPS:
+        # Desired state is only diffed in subnet mode, other modes reuse resources across instances
+        infolog("lambda_handler -- no plan in this VIP mode for {}, steps: {}",state['LambdaInfoTracing'],journal_key,[entry[0] for entry in steps])
+        return {'PlanOnly': True, 'Actions': None}
+    resources, observed, actions = plan(steps,state)
+    state['metrics'].count('DescribeCalls',resources.calls)
+    infolog("lambda_handler -- plan for {}: {}",state['LambdaInfoTracing'],journal_key,actions)
+    return {'PlanOnly': True, 'Actions': [list(action) for action in actions]}
+
+def reconcile(steps,state,journal_key):
+    """
+    narrow a subnet-mode lifecycle action down to the actions missing from the current state, unless it
+    already has a journal to resume; returns the lifecycle action state machine and journal key to run
+
+    A terminate action with nothing to tear down, or a launch action whose instance already holds the VIP ENI,
+    runs a reduced state machine under its own journal; any other one runs its full state machine, which looks
+    the resources up again once it holds the lease on them.
+
+    :param steps: lifecycle action state machine
+    :param state: workflow state
+    :param journal_key: workflow journal key
+
+    """
+    if (steps is not LAUNCH_STEPS and steps is not TERMINATE_STEPS) or journal_store().get(journal_key)[0] is not None:
+        return steps, journal_key
+    try:
+        resources, observed, actions = plan(steps,state)
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error observing VIP resources, running all steps: {}",e.response['Error'])
+        return steps, journal_key
+    except botocore.exceptions.BotoCoreError as e:
+        errorlog("Error observing VIP resources, running all steps: {}",e)
+        return steps, journal_key
+    infolog("reconcile -- missing actions for {}: {}",state['LambdaInfoTracing'],journal_key,actions)
+
+    if steps is TERMINATE_STEPS:
+        if actions:
+            state['metrics'].count('DescribeCalls',resources.calls)
+            return steps, journal_key
+        return CONVERGED_TERMINATE_STEPS, journal_key + '-converge'
+
+    if not desiredstate.owned(observed,state['instance_id']):
+        state['metrics'].count('DescribeCalls',resources.calls)
+        return steps, journal_key
+    # Nobody else acts on the VIP ENI attached to this instance, its descriptions stay valid for the steps
+    state['resources'] = resources
+    state['subnet_id'] = observed.Subnet.SubnetId
+    state['interface_id'] = observed.Interface.NetworkInterfaceId
+    state['attachment'] = observed.Interface.Attachment.AttachmentId
+    names = [action for action, resource_id in actions]
+    converge = [(name, CONVERGE_STEPS[name], []) for name in names]
+    return converge + [('wait_ready', step_wait_ready, names), ('complete', step_complete_success, ['wait_ready'])], journal_key + '-converge'
+
+def record_outcome(state,outcome):
+    """
+    record lifecycle action result sent to the Auto Scaling Group as a count and a property of the metrics record
+
+    :param state: workflow state
+    :param outcome: 'CONTINUE' or 'ABANDON'
+
+    """
+    state['metrics'].set_property('Outcome',outcome)
+    state['metrics'].count(outcome.capitalize())
+
+def journal_store():
+    """
+    obtain state store for workflow journals, created once per container
+    """
+    global state_store
+    if state_store is None:
+        state_store = statestore.get_store()
+    return state_store
+
+def continue_invocation(event,context,LambdaInfoTracing):
+    """
+    invoke this function again asynchronously with same event, to resume the workflow journal
+
+    :param event: lifecycle event
+    :param context: Lambda context
+
+    """
+    continuations = int(event.get('continuations', 0))
+    if context is None or continuations >= MAX_CONTINUATIONS:
+        errorlog("No further continuation for event: {}",event['detail'])
+        return
+    try:
+        event = dict(event, continuations=continuations + 1)
+        response = lambda_client.invoke(FunctionName=context.invoked_function_arn,InvocationType='Event',Payload=json.dumps(event))
+        infolog("continue_invocation -- Lambda invoke response: {}",LambdaInfoTracing,response['StatusCode'])
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error invoking continuation: {}",e.response['Error'])
+
+def step_create_subnet(state):
+    """
+    workflow step: create secondary subnet in same AZ
+
+    :param state: workflow state
+
+    """
+    LambdaInfoTracing = state['LambdaInfoTracing']
+    vpc_id = state['vpc_id']
+    cidr = state['cidr']
+
+    subnet_id = None
+    if state['Resumed']:
+        # Subnet may have been created by the interrupted invocation
+        subnet_id = get_subnet(vpc_id,cidr,LambdaInfoTracing,state['resources'])
+
+    attempts = 0
+    # Attempts to create secondary subnet in same AZ
+    while (not subnet_id) and attempts < state['SubnetCreationAttempts'] :
+        infolog("step_create_subnet -- Attempt nr. {} to create subnet",LambdaInfoTracing,attempts)
+        subnet_id = create_subnet(vpc_id,cidr,state['AZ'],LambdaInfoTracing,state['resources'])
+        attempts += 1
+        if (not subnet_id) and attempts < state['SubnetCreationAttempts']:
+            # Previous VIP subnet may not have been deleted yet by the terminate action
+            waiters.wait_subnet_released(ec2_client,vpc_id,cidr,LambdaInfoTracing,workflow.budget(state['context'],waiters.PHASE_CAPS['subnet_released']['timeout']))
+
+    state['metrics'].count('SubnetCreationAttempts',attempts)
+    if not subnet_id:
+        # No subnet could be created after SubnetCreationAttempts attempts
+        raise workflow.StepFailed("VIP subnet {} could not be created".format(cidr))
+
+    waiters.wait_subnet_available(ec2_client,subnet_id,LambdaInfoTracing)
+    return {'subnet_id': subnet_id}
+
+def step_associate_subnet(state):
+    """
+    workflow step: associate secondary subnet to Route Table
+
+    :param state: workflow state
+
+    """
+    associate_subnet(state['subnet_id'],state['route_table_id'],state['LambdaInfoTracing'],state['resources'])
+
+def step_create_interface(state):
+    """
+    workflow step: create ENI within secondary subnet in same AZ
+
+    :param state: workflow state
+
+    """
+    interface_id = None
+    if state['Resumed']:
+        # Interface may have been created by the interrupted invocation
+        interface_id = get_interface(state['subnet_id'],state['vip'],state['LambdaInfoTracing'],resources=state['resources'])
+    if not interface_id:
+        interface_id = create_interface(state['subnet_id'],state['secgroup_id'],state['vip'],state['LambdaInfoTracing'],state['SecondaryVIPs'],state['resources'])
+    if not interface_id:
+        raise workflow.StepFailed("VIP interface could not be created")
+    return {'interface_id': interface_id}
+
+def step_stage_interface(state):
+    """
+    workflow step: obtain VIP ENI staged in this AZ, staging it if VIP pool is not there yet
+
+    :param state: workflow state
 
-        if not attachment:
-            # ENI could not be attached
-            # Lifecycle Hook event failed
-            complete_lifecycle_action_failure(LifecycleHookName,AutoScalingGroupName,instance_id,LambdaInfoTracing)
-            delete_interface(interface_id,eipaddress,eipallocation,LambdaInfoTracing)
+    """
+    AZ = state['AZ']
+    # VIP addresses keep their host offset within the VIP subnet staged in this AZ
+    pool_cidr = vippool.pool_cidrs(state['VIPSupernetCIDRBlock'],state['AvailabilityZones']+[AZ])[AZ]
+    addresses = [(vippool.pool_vip(pool_cidr,address,state['cidr']), allocation) for address, allocation in state['addresses']]
+
+    interface_id = vippool.get_staged_interface(ec2_client,state['vpc_id'],state['AutoScalingGroupName'],AZ,state['LambdaInfoTracing'])
+    interface = state['resources'].interface(interface_id) if interface_id else None
+    if not interface or any(address not in interface.PrivateIpAddresses for address, allocation in addresses):
+        # VIP pool has not been staged yet in this AZ, or the staged ENI is missing (secondary) addresses
+        interface_id = vippool.stage_az(ec2_client,state['vpc_id'],state['AutoScalingGroupName'],AZ,pool_cidr,state['route_table_id'],state['secgroup_id'],addresses[0][0],state['LambdaInfoTracing'],[address for address, allocation in addresses[1:]])
+        if not interface_id:
+            raise workflow.StepFailed("No staged VIP interface available in {}".format(AZ))
+        state['resources'].invalidate(interface_id)
+        interface = state['resources'].interface(interface_id)
+    if interface and interface.Attachment and interface.Attachment.InstanceId != state['instance_id']:
+        holder = interface.Attachment.InstanceId
+        # Staged ENI of this AZ may belong to a live active or standby VNF, which must keep its data plane, unless
+        # it is being replaced: its terminate action leaves the warm-standby controller as its first step
+        if state['WarmStandbyMode'] == "true" and not waiters.wait_until('standby_left',lambda: not standby_member_alive(state,holder),state['LambdaInfoTracing']):
+            raise workflow.StepFailed("Staged VIP interface {} in {} is held by live warm-standby VNF {}".format(interface_id,AZ,holder))
+        # Previous instance in this AZ went away without its terminate action detaching the ENI
+        infolog("step_stage_interface -- taking staged VIP interface {} over from {}",state['LambdaInfoTracing'],interface_id,holder)
+        detach_interface(interface_id,state['LambdaInfoTracing'],state['resources'])
+        # EIPs the previous instance left on addresses this VNF no longer has
+        stale = [association for association in interface.Associations if (association.PrivateIpAddress, association.AllocationId) not in addresses]
+        if stale:
+            viprelease.disassociate_addresses(ec2_client,interface._replace(Associations=stale),state['LambdaInfoTracing'])
+            state['resources'].invalidate(interface_id)
+    return {'interface_id': interface_id, 'staged': True, 'addresses': addresses}
+
+def step_reuse_interface(state):
+    """
+    workflow step: obtain VIP subnet and ENI retained by the previous instance, reusing them if they are in
+    the AZ of this instance, and tearing them down otherwise so that they are rebuilt in this AZ
+
+    :param state: workflow state
+
+    """
+    LambdaInfoTracing = state['LambdaInfoTracing']
+    resources = state['resources']
+    subnet_id = None
+    interface = None
+    try:
+        subnet = resources.subnet(state['vpc_id'],state['cidr'])
+        if subnet:
+            subnet_id = subnet.SubnetId
+            interface = resources.interface_by_address(state['vip'],subnet_id)
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error obtaining retained VIP subnet and interface: {}",e.response['Error'])
+        return {'staged': True, 'reused': False}
+
+    if subnet_id and interface and subnet.AvailabilityZone == state['AZ']:
+        infolog("step_reuse_interface -- reusing VIP subnet {} and interface {} in {}",LambdaInfoTracing,subnet_id,interface.NetworkInterfaceId,state['AZ'])
+        if interface.Attachment and interface.Attachment.InstanceId != state['instance_id']:
+            # Previous instance went away without its terminate action detaching the ENI
+            detach_interface(interface.NetworkInterfaceId,LambdaInfoTracing,resources)
+        state['metrics'].count('Reused')
+        return {'subnet_id': subnet_id, 'interface_id': interface.NetworkInterfaceId, 'staged': True, 'reused': True}
+
+    if subnet_id:
+        # AZ change, or retained resources incomplete: full teardown, then rebuild in this AZ
+        infolog("step_reuse_interface -- VIP subnet {} in {} cannot be reused in {}",LambdaInfoTracing,subnet_id,subnet.AvailabilityZone,state['AZ'])
+        teardown_vip(state,subnet_id,interface.NetworkInterfaceId if interface else None,resources)
+    state['metrics'].count('Reused',0)
+    return {'staged': True, 'reused': False}
+
+def teardown_vip(state,subnet_id,interface_id,resources):
+    """
+    tear down VIP ENI and subnet left by a previous instance, detaching the ENI first if still attached
+
+    :param state: workflow state
+    :param subnet_id: VIP subnet id
+    :param interface_id: VIP ENI id, or None
+    :param resources: request-scoped Snapshot of resource descriptions
+
+    """
+    LambdaInfoTracing = state['LambdaInfoTracing']
+    if interface_id:
+        detach_interface(interface_id,LambdaInfoTracing,resources)
+        delete_interface(interface_id,state['eipaddress'],state['eipallocation'],LambdaInfoTracing,resources)
+    disassociate_delete_subnet(subnet_id,state['route_table_id'],LambdaInfoTracing,resources=resources)
+
+def wait_vip_lease(state,deadline):
+    """
+    wait until the lease on the VIP resources is acquired, suspending if invocation time runs out first
+
+    :param state: workflow state
+    :param deadline: waiters.clock() time after which the step fails
+
+    """
+    remaining = max(0, deadline - waiters.clock())
+    timeout = workflow.budget(state['context'],remaining)
+    if state['lease'].wait(timeout):
+        return
+    if timeout < remaining:
+        raise workflow.Suspend()
+    raise workflow.StepFailed("Lease on VIP subnet {} not released within {} seconds".format(state['cidr'],waiters.PHASE_CAPS['lease_released']['timeout']))
+
+def step_acquire_vip(state):
+    """
+    workflow step: acquire the lease on the VIP resources once the previous instance has released them,
+    finishing their teardown if it was interrupted or never started by a terminate action
+
+    :param state: workflow state
+
+    """
+    LambdaInfoTracing = state['LambdaInfoTracing']
+    vip_lease = state['lease']
+    deadline = waiters.clock() + waiters.PHASE_CAPS['lease_released']['timeout']
+    while True:
+        # Each pass after handing the lease over may have found the previous instance still attached
+        remaining = deadline - waiters.clock()
+        if remaining <= 0:
+            raise workflow.StepFailed("VIP interface still attached to the previous instance after {} seconds".format(waiters.PHASE_CAPS['lease_released']['timeout']))
+        if workflow.budget(state['context'],remaining) <= 0:
+            raise workflow.Suspend()
+        wait_vip_lease(state,deadline)
+        # Looked up afresh once the lease is held, the previous holder may just have deleted them
+        resources = snapshot.Snapshot(ec2_client,LambdaInfoTracing)
+        subnet_id = get_subnet(state['vpc_id'],state['cidr'],LambdaInfoTracing,resources)
+        if not subnet_id:
             return
-        
-        if str(InstanceRequiresReboot) == "true": 
-            # ENI attachment requires instance reboot
-            time.sleep(30)
-            restart_instance(instance_id,LambdaInfoTracing)
-            time.sleep(120)
-
-        # Lifecycle Hook event successfully completed otherwise
-        complete_lifecycle_action_success(LifecycleHookName,AutoScalingGroupName,instance_id,LambdaInfoTracing)
+        interface_id = get_interface(subnet_id,state['vip'],LambdaInfoTracing,resources=resources)
+        interface = resources.interface(interface_id) if interface_id else None
+        if interface and interface.Attachment and interface.Attachment.InstanceId != state['instance_id'] and vip_lease.stale is None:
+            # Previous instance still has its VIP resources: let its terminate action take the lease and tear them down
+            infolog("step_acquire_vip -- VIP interface {} still attached to {}, waiting for its teardown",LambdaInfoTracing,interface_id,interface.Attachment.InstanceId)
+            vip_lease.release()
+            vip_lease.wait_taken(workflow.budget(state['context'],max(0, deadline - waiters.clock())))
+            continue
+        # Teardown interrupted with its lease expired, or leftovers not attached to any instance
+        infolog("step_acquire_vip -- finishing teardown of VIP subnet {} (lease taken over from: {})",LambdaInfoTracing,subnet_id,vip_lease.stale)
+        teardown_vip(state,subnet_id,interface_id,resources)
         return
 
-    if event["detail-type"] == "EC2 Instance-terminate Lifecycle Action":
-        
-        # Obtained Subnet ID from same VPC and CIDR range
-        subnet_id = get_subnet(vpc_id,cidr,LambdaInfoTracing)
-
-        # Obtained Interface ID from same subnet
-        interface_id = get_interface(subnet_id,vip,LambdaInfoTracing)
-        
-        # Interface ID could be extracted from Subnet ID
-        if interface_id is not None:
-            try:
-                # Detach the ENI from the instance
-                detach_interface(interface_id,LambdaInfoTracing)
-            except botocore.exceptions.ClientError as e:
-                errorlog("Error detaching interface: {}".format(e.response['Error']))
-            
-            try:
-                # After detaching, delete the interface
-                delete_interface(interface_id,eipaddress,eipallocation,LambdaInfoTracing)
-            except botocore.exceptions.ClientError as e:
-                errorlog("Error deleting interface: {}".format(e.response['Error']))
-
-        if subnet_id is not None:
-            try:
-                # After having detached and deleted the ENI, subnet can be deleted
-                disassociate_delete_subnet(subnet_id,route_table_id,LambdaInfoTracing)
-            except botocore.exceptions.ClientError as e:
-                errorlog("Error deleting subnet: {}".format(e.response['Error']))
-
-        # After detaching ENI, deleting it and deleting the subnet, this is a successful lifecycle hook
-        complete_lifecycle_action_success(LifecycleHookName,AutoScalingGroupName,instance_id,LambdaInfoTracing)
+def step_acquire_vip_teardown(state):
+    """
+    workflow step: acquire the lease on the VIP resources before tearing them down, leaving them alone
+    if they have been handed over to a replacement instance meanwhile
+
+    :param state: workflow state
+
+    """
+    wait_vip_lease(state,waiters.clock() + waiters.PHASE_CAPS['lease_released']['timeout'])
+    interface_id = get_interface(None,state['vip'],state['LambdaInfoTracing'],vpc_id=state['vpc_id'],resources=state['resources'])
+    interface = state['resources'].interface(interface_id) if interface_id else None
+    if interface and interface.Attachment and interface.Attachment.InstanceId != state['instance_id']:
+        infolog("step_acquire_vip_teardown -- VIP interface {} already attached to {}",state['LambdaInfoTracing'],interface_id,interface.Attachment.InstanceId)
+        return {'handed_over': True}
+    return {'handed_over': False}
+
+def while_leased(step):
+    """
+    wrap a workflow step tearing down VIP resources, so that it is skipped when they have been handed over
+    to a replacement instance, or when the lease on them has been taken over (fencing)
+
+    :param step: workflow step function
+
+    """
+    def skip_unless_leased(state):
+        if state.get('handed_over'):
+            return None
+        if not state['lease'].held():
+            errorlog("Lease on VIP subnet {} lost, skipping teardown of instance {}",state['cidr'],state['instance_id'])
+            return None
+        return step(state)
+    return skip_unless_leased
+
+def unless_reused(step):
+    """
+    wrap a workflow step building the VIP subnet or ENI, so that it is skipped when retained ones are reused
+
+    :param step: workflow step function
+
+    """
+    def skip_if_reused(state):
+        if state.get('reused'):
+            return None
+        return step(state)
+    return skip_if_reused
+
+def step_primary_interface(state):
+    """
+    workflow step: obtain primary ENI of the instance, the VIP route target in route mode, and let it forward
+    traffic for the VIP
+
+    :param state: workflow state
+
+    """
+    LambdaInfoTracing = state['LambdaInfoTracing']
+    instance = inventory.get_instance(ec2_client,state['instance_id'],LambdaInfoTracing)
+    primary = [interface for interface in (instance or {}).get('NetworkInterfaces', []) if interface['DeviceIndex'] == 0]
+    if not primary:
+        raise workflow.StepFailed("No primary interface found for instance {}".format(state['instance_id']))
+    interface_id = primary[0]['NetworkInterfaceId']
+    try:
+        # VIP is not an address of the interface, traffic to it needs to pass the source/destination check
+        ec2_client.modify_network_interface_attribute(NetworkInterfaceId=interface_id,SourceDestCheck={'Value': False})
+    except botocore.exceptions.ClientError as e:
+        raise workflow.StepFailed("Source/destination check of interface {} could not be disabled: {}".format(interface_id,e.response['Error']))
+    infolog("step_primary_interface -- primary interface of {}: {}",LambdaInfoTracing,state['instance_id'],interface_id)
+    return {'interface_id': interface_id, 'primary_address': primary[0]['PrivateIpAddress']}
+
+def step_replace_routes(state):
+    """
+    workflow step: point VIP routes of WAN and additional route tables to the primary ENI of the instance
+
+    :param state: workflow state
+
+    """
+    if not viproutes.replace_routes(ec2_client,state['VIPRouteTables'],viproutes.destinations(state['addresses']),state['interface_id'],state['LambdaInfoTracing']):
+        raise workflow.StepFailed("VIP routes could not be pointed to interface {}".format(state['interface_id']))
+
+def step_move_route_address(state):
+    """
+    workflow step: associate EIP to the primary private address of the instance, moving it from the previous one
+
+    :param state: workflow state
+
+    """
+    associate_addresses(state['interface_id'],[(state['primary_address'], state['eipallocation'])],state['LambdaInfoTracing'],state['resources'])
+
+def standby_controller(state):
+    """
+    obtain warm-standby controller of the VIP
+
+    :param state: workflow state
+
+    """
+    return standby.Controller(journal_store(),"vip-{}-{}".format(state['vpc_id'],state['cidr']),state['LambdaInfoTracing'])
+
+def standby_member(state):
+    """
+    obtain warm-standby member of the instance: its own pre-attached ENI and the addresses its EIPs go to once active
+
+    :param state: workflow state
+
+    """
+    if state.get('primary_address'):
+        addresses = [(state['primary_address'], state['eipallocation'])]
+    else:
+        addresses = state['addresses']
+    return {'InstanceId': state['instance_id'], 'AZ': state['AZ'], 'InterfaceId': state['interface_id'], 'Addresses': addresses}
+
+def instance_alive(state):
+    """
+    obtain function telling whether an instance is still pending or running, to check members of the
+    warm-standby controller
+
+    :param state: workflow state
+
+    """
+    def alive(instance_id):
+        instance = inventory.get_instance(ec2_client,instance_id,state['LambdaInfoTracing'],refresh=True)
+        return instance is not None and instance['State'] in ('pending', 'running')
+    return alive
+
+def standby_member_alive(state,instance_id):
+    """
+    check whether an instance is a live active or standby member of the warm-standby controller
+
+    :param state: workflow state
+    :param instance_id: instance id
+
+    """
+    active, standbys = standby_controller(state).members()
+    members = ([active] if active else []) + standbys
+    return any(member['InstanceId'] == instance_id for member in members) and instance_alive(state)(instance_id)
+
+def activate(state,member):
+    """
+    move EIPs and, in route mode, VIP routes to the VNF made active by the warm-standby controller
+
+    :param state: workflow state
+    :param member: active member of the warm-standby controller
+
+    """
+    LambdaInfoTracing = state['LambdaInfoTracing']
+    if state['VIPFailoverMode'] == "route":
+        if not viproutes.replace_routes(ec2_client,state['VIPRouteTables'],viproutes.destinations(state['addresses']),member['InterfaceId'],LambdaInfoTracing):
+            raise workflow.StepFailed("VIP routes could not be pointed to interface {}".format(member['InterfaceId']))
+    associate_addresses(member['InterfaceId'],[tuple(address) for address in member['Addresses']],LambdaInfoTracing,state['resources'])
+    standby_controller(state).activated(member['InstanceId'])
+    infolog("activate -- EIP and VIP routes moved to {} ({})",LambdaInfoTracing,member['InstanceId'],member['InterfaceId'])
+
+def step_join_standby(state):
+    """
+    workflow step: register the ready VNF with the warm-standby controller, moving EIP and VIP routes to it
+    if there is no live active VNF
+
+    :param state: workflow state
+
+    """
+    member = standby_member(state)
+    role = standby_controller(state).join(member,instance_alive(state))
+    if role == 'active':
+        activate(state,member)
+    state['metrics'].set_property('Role',role)
+    return {'role': role}
+
+def step_leave_standby(state):
+    """
+    workflow step: deregister the terminating VNF from the warm-standby controller, moving EIP and VIP routes
+    to a standby VNF first if it was the active one
+
+    :param state: workflow state
+
+    """
+    promoted = standby_controller(state).leave(state['instance_id'],instance_alive(state))
+    if promoted is not None:
+        activate(state,promoted)
+        state['metrics'].count('Promoted')
+    return {'promoted': promoted['InstanceId'] if promoted else None}
+
+def step_wait_running(state):
+    """
+    workflow step: wait for instance to be running, as needed before attaching ENI
+
+    :param state: workflow state
+
+    """
+    waiters.wait_instance_running(ec2_client,state['instance_id'],state['LambdaInfoTracing'])
+
+def step_attach_interface(state):
+    """
+    workflow step: attach ENI to instance as secondary interface
+
+    :param state: workflow state
+
+    """
+    # Index is 1 because it is secondary interface to the instance, staged ENI needs to survive instance termination
+    attachment = attach_interface(state['interface_id'],state['instance_id'],1,state['LambdaInfoTracing'],delete_on_termination=not state.get('staged'),resources=state['resources'])
+    if not attachment and state['Resumed']:
+        # Interface may have been attached by the interrupted invocation
+        attachment = get_attachment(state['interface_id'],state['instance_id'],state['LambdaInfoTracing'],state['resources'])
+    if not attachment:
+        raise workflow.StepFailed("VIP interface {} could not be attached".format(state['interface_id']))
+    return {'attachment': attachment}
+
+def step_associate_addresses(state):
+    """
+    workflow step: associate EIPs to the VIP ENI, moving them from any previous association
+
+    :param state: workflow state
+
+    """
+    associate_addresses(state['interface_id'],state['addresses'],state['LambdaInfoTracing'],state['resources'])
+
+def step_reboot(state):
+    """
+    workflow step: reboot instance once ENI attachment has been accomplished, if required by VNF
+
+    :param state: workflow state
+
+    """
+    rebooted = None
+    if str(state['InstanceRequiresReboot']) == "true":
+        waiters.wait_interface_attached(ec2_client,state['interface_id'],state['LambdaInfoTracing'])
+        restart_instance(state['instance_id'],state['LambdaInfoTracing'])
+        rebooted = readiness.clock()
+    # Readiness deadline is kept in the journal, so continuation invocations do not extend it
+    return {'ReadyBy': readiness.clock() + state['ReadinessTimeout'], 'Rebooted': rebooted}
+
+def step_wait_ready(state):
+    """
+    workflow step: wait until the VNF passes its readiness checks, suspending if invocation time runs out,
+    and failing the launch (to be abandoned) if it is not ready by its readiness deadline
+
+    :param state: workflow state
+
+    """
+    LambdaInfoTracing = state['LambdaInfoTracing']
+    specification = state['ReadinessChecks'] or (readiness.REBOOT_CHECKS if str(state['InstanceRequiresReboot']) == "true" else readiness.DEFAULT_CHECKS)
+    try:
+        checks = readiness.parse_checks(specification)
+    except ValueError as e:
+        raise workflow.StepFailed(str(e))
+    if state.get('Rebooted') is None:
+        # Nothing to come back from, e.g. launches without reboot step
+        checks = [(name, argument) for name, argument in checks if name != 'restarted']
+    if os.environ.get('LifecycleFunctionInVPC','true') != "true" and any(name in readiness.PROBES for name, argument in checks):
+        raise workflow.StepFailed("Readiness checks {} need the function to run in the VPC".format(specification))
+    # A warm standby is probed on its own address, the VIP routes and EIP only move to it once active
+    vip = state['primary_address'] if state['WarmStandbyMode'] == "true" and state.get('primary_address') else state['addresses'][0][0]
+    address = readiness.probe_address(state['ReadinessProbeAddress'],vip,state['eipaddress'])
+    target = {'instance_id': state['instance_id'], 'interface_id': state['interface_id'], 'address': address, 'rebooted': state.get('Rebooted')}
+
+    remaining = max(0, state.get('ReadyBy', readiness.clock() + state['ReadinessTimeout']) - readiness.clock())
+    timeout = workflow.budget(state['context'],remaining)
+    if readiness.wait_ready(ec2_client,target,checks,LambdaInfoTracing,timeout):
         return
+    if timeout < remaining:
+        raise workflow.Suspend()
+    state['metrics'].count('NotReady')
+    raise workflow.StepFailed("VNF on instance {} not ready within {} seconds ({})".format(state['instance_id'],state['ReadinessTimeout'],specification))
+
+def step_complete_success(state):
+    """
+    workflow step: complete lifecycle hook with CONTINUE
+
+    :param state: workflow state
+
+    """
+    complete_lifecycle_action_success(state['LifecycleHookName'],state['AutoScalingGroupName'],state['instance_id'],state['LambdaInfoTracing'])
+
+def step_get_subnet(state):
+    """
+    workflow step: obtain VIP subnet from same VPC and CIDR range
+
+    :param state: workflow state
+
+    """
+    return {'subnet_id': get_subnet(state['vpc_id'],state['cidr'],state['LambdaInfoTracing'],state['resources'])}
+
+def step_get_interface(state):
+    """
+    workflow step: obtain VIP ENI from same VPC and VIP, independently of the subnet lookup
+
+    :param state: workflow state
+
+    """
+    return {'interface_id': get_interface(None,state['vip'],state['LambdaInfoTracing'],vpc_id=state['vpc_id'],resources=state['resources'])}
+
+def step_get_route_association(state):
+    """
+    workflow step: obtain Route Table association of the VIP subnet
+
+    :param state: workflow state
+
+    """
+    association_id = None
+    if state.get('subnet_id') is not None:
+        association_id = get_route_table_association(state['subnet_id'],state['route_table_id'],state['LambdaInfoTracing'],state['resources'])
+    return {'route_table_association_id': association_id}
+
+def step_detach_interface(state):
+    """
+    workflow step: detach VIP ENI from the instance, leaving it alone if a replacement instance has taken it over
+
+    :param state: workflow state
+
+    """
+    if state.get('interface_id') is not None:
+        interface = state['resources'].interface(state['interface_id'])
+        if interface and interface.Attachment and interface.Attachment.InstanceId != state['instance_id']:
+            infolog("step_detach_interface -- VIP interface {} already attached to {}",state['LambdaInfoTracing'],state['interface_id'],interface.Attachment.InstanceId)
+            return {'handed_over': True}
+        try:
+            # Detach the ENI from the instance
+            detach_interface(state['interface_id'],state['LambdaInfoTracing'],state['resources'])
+        except botocore.exceptions.ClientError as e:
+            errorlog("Error detaching interface: {}",e.response['Error'])
+
+def step_detach_staged_interface(state):
+    """
+    workflow step: only detach the staged VIP ENI, subnet and ENI remain for next launch in this AZ;
+    left alone once a replacement instance in this AZ has taken it over
+
+    :param state: workflow state
+
+    """
+    interface_id = vippool.get_staged_interface(ec2_client,state['vpc_id'],state['AutoScalingGroupName'],state['AZ'],state['LambdaInfoTracing'])
+    if interface_id is not None:
+        interface = state['resources'].interface(interface_id)
+        if interface and interface.Attachment and interface.Attachment.InstanceId != state['instance_id']:
+            infolog("step_detach_staged_interface -- staged VIP interface {} already attached to {}",state['LambdaInfoTracing'],interface_id,interface.Attachment.InstanceId)
+            return {'interface_id': interface_id, 'handed_over': True}
+        try:
+            # Detach the ENI from the instance
+            detach_interface(interface_id,state['LambdaInfoTracing'],state['resources'])
+        except botocore.exceptions.ClientError as e:
+            errorlog("Error detaching interface: {}",e.response['Error'])
+    return {'interface_id': interface_id}
+
+def step_delete_interface(state):
+    """
+    workflow step: after detaching, delete the interface
+
+    :param state: workflow state
+
+    """
+    if state.get('interface_id') is not None:
+        try:
+            delete_interface(state['interface_id'],state['eipaddress'],state['eipallocation'],state['LambdaInfoTracing'],state['resources'])
+        except botocore.exceptions.ClientError as e:
+            errorlog("Error deleting interface: {}",e.response['Error'])
+
+def step_delete_subnet(state):
+    """
+    workflow step: after having detached and deleted the ENI, subnet can be deleted
+
+    :param state: workflow state
 
-def create_and_associate_subnet(vpc_id,cidr,az,route_table_id,LambdaInfoTracing):
+    """
+    if state.get('subnet_id') is not None:
+        try:
+            disassociate_delete_subnet(state['subnet_id'],state['route_table_id'],state['LambdaInfoTracing'],state.get('route_table_association_id'),state['resources'])
+        except botocore.exceptions.ClientError as e:
+            errorlog("Error deleting subnet: {}",e.response['Error'])
+
+def step_disable_source_dest_check(state):
+    """
+    workflow step: disable source/dest check of the VIP ENI found with it enabled
+
+    :param state: workflow state
+
+    """
+    try:
+        ec2_client.modify_network_interface_attribute(NetworkInterfaceId=state['interface_id'],SourceDestCheck={'Value': False})
+    except botocore.exceptions.ClientError as e:
+        raise workflow.StepFailed("Source/destination check of interface {} could not be disabled: {}".format(state['interface_id'],e.response['Error']))
+    state['resources'].invalidate(state['interface_id'])
+
+def step_set_delete_on_termination(state):
+    """
+    workflow step: let the VIP ENI found attached without it be deleted on instance termination
+
+    :param state: workflow state
+
+    """
+    try:
+        ec2_client.modify_network_interface_attribute(NetworkInterfaceId=state['interface_id'],Attachment={'AttachmentId': state['attachment'], 'DeleteOnTermination': True})
+    except botocore.exceptions.ClientError as e:
+        raise workflow.StepFailed("Delete on termination of interface {} could not be set: {}".format(state['interface_id'],e.response['Error']))
+    state['resources'].invalidate(state['interface_id'])
+
+# Lifecycle action state machines, as (step name, step function, dependencies) tuples;
+# steps whose dependencies have completed run concurrently
+LAUNCH_STEPS = [
+    ('acquire_vip', step_acquire_vip, []),
+    ('create_subnet', step_create_subnet, ['acquire_vip']),
+    ('wait_running', step_wait_running, []),
+    ('associate_subnet', step_associate_subnet, ['create_subnet']),
+    ('create_interface', step_create_interface, ['create_subnet']),
+    ('associate_addresses', step_associate_addresses, ['create_interface']),
+    ('attach_interface', step_attach_interface, ['create_interface', 'wait_running']),
+    ('reboot', step_reboot, ['attach_interface', 'associate_addresses', 'associate_subnet']),
+    ('wait_ready', step_wait_ready, ['reboot']),
+    ('complete', step_complete_success, ['wait_ready']),
+]
+POOL_LAUNCH_STEPS = [
+    ('stage_interface', step_stage_interface, []),
+    ('wait_running', step_wait_running, []),
+    ('attach_interface', step_attach_interface, ['stage_interface', 'wait_running']),
+    ('move_address', step_associate_addresses, ['stage_interface']),
+    ('reboot', step_reboot, ['attach_interface', 'move_address']),
+    ('wait_ready', step_wait_ready, ['reboot']),
+    ('complete', step_complete_success, ['wait_ready']),
+]
+RETAIN_LAUNCH_STEPS = [
+    ('reuse_interface', step_reuse_interface, []),
+    ('wait_running', step_wait_running, []),
+    ('create_subnet', unless_reused(step_create_subnet), ['reuse_interface']),
+    ('associate_subnet', unless_reused(step_associate_subnet), ['create_subnet']),
+    ('create_interface', unless_reused(step_create_interface), ['create_subnet']),
+    ('associate_addresses', unless_reused(step_associate_addresses), ['create_interface']),
+    ('attach_interface', step_attach_interface, ['create_interface', 'wait_running']),
+    ('reboot', step_reboot, ['attach_interface', 'associate_addresses', 'associate_subnet']),
+    ('wait_ready', step_wait_ready, ['reboot']),
+    ('complete', step_complete_success, ['wait_ready']),
+]
+ROUTE_LAUNCH_STEPS = [
+    ('primary_interface', step_primary_interface, []),
+    ('wait_running', step_wait_running, []),
+    ('replace_routes', step_replace_routes, ['primary_interface']),
+    ('move_address', step_move_route_address, ['primary_interface']),
+    ('wait_ready', step_wait_ready, ['wait_running', 'replace_routes', 'move_address']),
+    ('complete', step_complete_success, ['wait_ready']),
+]
+# Warm standby: each VNF keeps its own ENI, and only the active one holds the EIP and VIP routes
+STANDBY_POOL_LAUNCH_STEPS = [
+    ('stage_interface', step_stage_interface, []),
+    ('wait_running', step_wait_running, []),
+    ('attach_interface', step_attach_interface, ['stage_interface', 'wait_running']),
+    ('reboot', step_reboot, ['attach_interface']),
+    ('wait_ready', step_wait_ready, ['reboot']),
+    ('join', step_join_standby, ['wait_ready']),
+    ('complete', step_complete_success, ['join']),
+]
+STANDBY_ROUTE_LAUNCH_STEPS = [
+    ('primary_interface', step_primary_interface, []),
+    ('wait_running', step_wait_running, []),
+    ('wait_ready', step_wait_ready, ['primary_interface', 'wait_running']),
+    ('join', step_join_standby, ['wait_ready']),
+    ('complete', step_complete_success, ['join']),
+]
+TERMINATE_STEPS = [
+    ('acquire_vip', step_acquire_vip_teardown, []),
+    ('get_subnet', step_get_subnet, ['acquire_vip']),
+    ('get_interface', step_get_interface, ['acquire_vip']),
+    ('get_route_association', step_get_route_association, ['get_subnet']),
+    ('detach_interface', while_leased(step_detach_interface), ['get_interface']),
+    ('delete_interface', while_leased(step_delete_interface), ['detach_interface']),
+    ('delete_subnet', while_leased(step_delete_subnet), ['get_route_association', 'delete_interface']),
+    ('complete', step_complete_success, ['delete_subnet']),
+]
+# Terminate action of an instance without VIP resources to tear down
+CONVERGED_TERMINATE_STEPS = [
+    ('complete', step_complete_success, []),
+]
+# Steps taking the actions missing from a launching instance that already holds the VIP ENI,
+# followed by wait_ready and complete
+CONVERGE_STEPS = {
+    'associate_subnet': step_associate_subnet,
+    'disable_source_dest_check': step_disable_source_dest_check,
+    'set_delete_on_termination': step_set_delete_on_termination,
+    'associate_addresses': step_associate_addresses,
+}
+RETAIN_TERMINATE_STEPS = [
+    ('get_interface', step_get_interface, []),
+    ('detach_interface', step_detach_interface, ['get_interface']),
+    ('complete', step_complete_success, ['detach_interface']),
+]
+# Routes stay in place until the next launch points them to its instance
+ROUTE_TERMINATE_STEPS = [
+    ('complete', step_complete_success, []),
+]
+POOL_TERMINATE_STEPS = [
+    ('detach_interface', step_detach_staged_interface, []),
+    ('complete', step_complete_success, ['detach_interface']),
+]
+# EIP and VIP routes move to the standby before anything else
+STANDBY_POOL_TERMINATE_STEPS = [
+    ('leave', step_leave_standby, []),
+    ('detach_interface', step_detach_staged_interface, ['leave']),
+    ('complete', step_complete_success, ['detach_interface']),
+]
+STANDBY_ROUTE_TERMINATE_STEPS = [
+    ('leave', step_leave_standby, []),
+    ('complete', step_complete_success, ['leave']),
+]
+
+def create_subnet(vpc_id,cidr,az,LambdaInfoTracing,resources=None):
     """
     create subnet id from VPC in a specific AZ with a private IPv4 CIDR range
   
     :param vpc_id: VPC id
     :param cidr: CIDR IPv4 range for subnet
     :param az: Availability Zone
-    :param route_table_id: Route Table id
+    :param resources: request-scoped Snapshot of resource descriptions to keep up to date
       
     """
     subnet_id = None
     if vpc_id and cidr:
         try:
-            infolog("create_and_associate_subnet -- VPC ID parameter: {}".format(vpc_id),LambdaInfoTracing)
-            infolog("create_and_associate_subnet -- CIDR parameter: {}".format(cidr),LambdaInfoTracing)
-            infolog("create_and_associate_subnet -- AZ parameter: {}".format(az),LambdaInfoTracing)
+            infolog("create_subnet -- VPC ID parameter: {}",LambdaInfoTracing,vpc_id)
+            infolog("create_subnet -- CIDR parameter: {}",LambdaInfoTracing,cidr)
+            infolog("create_subnet -- AZ parameter: {}",LambdaInfoTracing,az)
             subnet = ec2_client.create_subnet(TagSpecifications=[{'ResourceType': 'subnet', 'Tags': [ {'Key': 'Name', 'Value': 'VIP Subnet'}]}],AvailabilityZone=az,CidrBlock=cidr,VpcId= vpc_id)
-            infolog("create_and_associate_subnet -- EC2 create subnet response: {}".format(subnet),LambdaInfoTracing)
+            infolog("create_subnet -- EC2 create subnet response: {}",LambdaInfoTracing,subnet)
             subnet_id = subnet['Subnet']['SubnetId']
-            infolog("create_and_associate_subnet -- EC2 created subnet ID: {}".format(subnet_id),LambdaInfoTracing)
+            infolog("create_subnet -- EC2 created subnet ID: {}",LambdaInfoTracing,subnet_id)
+            if resources:
+                resources.invalidate(subnet_id)
         except botocore.exceptions.ClientError as e:
-            errorlog("Error creating subnet: {}".format(e.response['Error']))
+            errorlog("Error creating subnet: {}",e.response['Error'])
             if e.response['Error']['Code'] == 'InvalidSubnet.Conflict':
-                errorlog("create_and_associate_subnet -- Previous subnet {} has not been deleted yet".format(cidr))
-    
+                errorlog("create_subnet -- Previous subnet {} has not been deleted yet",cidr)
+    return subnet_id
+
+def associate_subnet(subnet_id,route_table_id,LambdaInfoTracing,resources=None):
+    """
+    associate subnet to Route Table
+  
+    :param subnet_id: subnet id within VPC
+    :param route_table_id: Route Table id
+    :param resources: request-scoped Snapshot of resource descriptions to keep up to date
+      
+    """
+    association_id = None
     if subnet_id:
         try:
-            infolog("create_and_associate_subnet -- Route Table parameter: {}".format(route_table_id),LambdaInfoTracing)
-            infolog("create_and_associate_subnet -- created Subnet ID: {}".format(subnet_id),LambdaInfoTracing)
+            infolog("associate_subnet -- Route Table parameter: {}",LambdaInfoTracing,route_table_id)
+            infolog("associate_subnet -- Subnet ID parameter: {}",LambdaInfoTracing,subnet_id)
             response = ec2_client.associate_route_table(RouteTableId=route_table_id,SubnetId=subnet_id)
-            infolog("create_and_associate_subnet -- found Route Table: {}".format(response),LambdaInfoTracing)
+            infolog("associate_subnet -- found Route Table: {}",LambdaInfoTracing,response)
+            association_id = response['AssociationId']
+            if resources:
+                resources.invalidate(subnet_id)
         except botocore.exceptions.ClientError as e:
-            errorlog("Error associating subnet: {}".format(e.response['Error']))
-        
-    return subnet_id
+            errorlog("Error associating subnet: {}",e.response['Error'])
+    return association_id
 
-def create_interface(subnet_id,sg_id,vip,eipaddress,eipallocation,LambdaInfoTracing):
+def create_interface(subnet_id,sg_id,vip,LambdaInfoTracing,secondary_vips=(),resources=None):
     """
     create interface id with subnet, Security Group and a specific private IPv4 address
   
     :param subnet_id: subnet id within VPC
     :param sg_id: Security Group ID
     :param vip: (virtual) private IPv4 address that is mapped to interface
+    :param secondary_vips: secondary (private IPv4 address, EIP allocation id) tuples for the same interface;
+                           EIPs are associated separately with associate_addresses
+    :param resources: request-scoped Snapshot of resource descriptions to keep up to date
       
     """
 
     network_interface_id = None
     if subnet_id:
         try:
-            infolog("create_interface -- subnet ID parameter: {}".format(subnet_id),LambdaInfoTracing)
-            infolog("create_interface -- Security Group ID parameter: {}".format(sg_id),LambdaInfoTracing)
-            infolog("create_interface -- Virtual IP address parameter:: {}".format(vip),LambdaInfoTracing)
-            network_interface = ec2_client.create_network_interface(Description='VIP ENI',Groups=[sg_id],SubnetId=subnet_id,PrivateIpAddress=vip)
-            infolog("create_interface -- EC2 create ENI response: {}".format(network_interface),LambdaInfoTracing)
+            infolog("create_interface -- subnet ID parameter: {}",LambdaInfoTracing,subnet_id)
+            infolog("create_interface -- Security Group ID parameter: {}",LambdaInfoTracing,sg_id)
+            infolog("create_interface -- Virtual IP address parameter:: {}",LambdaInfoTracing,vip)
+            infolog("create_interface -- Secondary Virtual IP addresses parameter: {}",LambdaInfoTracing,secondary_vips)
+            # All private IPv4 addresses are assigned within the same creation call
+            private_ips = [{'PrivateIpAddress': vip, 'Primary': True}] + [{'PrivateIpAddress': address, 'Primary': False} for address, allocation in secondary_vips]
+            network_interface = ec2_client.create_network_interface(Description='VIP ENI',Groups=[sg_id],SubnetId=subnet_id,PrivateIpAddresses=private_ips)
+            infolog("create_interface -- EC2 create ENI response: {}",LambdaInfoTracing,network_interface)
             network_interface_id = network_interface['NetworkInterface']['NetworkInterfaceId']
-            infolog("create_interface -- EC2 created ENI ID: {}".format(network_interface_id),LambdaInfoTracing)
+            infolog("create_interface -- EC2 created ENI ID: {}",LambdaInfoTracing,network_interface_id)
+            if resources:
+                resources.invalidate(subnet_id)
         except botocore.exceptions.ClientError as e:
-            errorlog("Error creating network interface: {}".format(e.response['Error']))
-
-    # Associate existing EIP allocation
-    if eipallocation:
-        try:
-            infolog("create_interface -- eipaddress parameter: {}".format(eipaddress),LambdaInfoTracing)
-            infolog("create_interface -- eipallocation parameter: {}".format(eipallocation),LambdaInfoTracing)
-            response = ec2_client.associate_address(AllocationId=eipallocation,NetworkInterfaceId=network_interface_id)
-            infolog("create_interface -- EC2 associate EIP response: {}".format(response),LambdaInfoTracing)
-        except botocore.exceptions.ClientError as e:
-            errorlog("Error associating EIP to network interface: {}".format(e.response['Error']))
+            errorlog("Error creating network interface: {}",e.response['Error'])
 
     return network_interface_id
 
 
-def get_subnet(vpc_id,cidr,LambdaInfoTracing):
+def get_subnet(vpc_id,cidr,LambdaInfoTracing,resources=None):
     """
     obtain subnet id from VPC based on IPv4 CIDR range
   
     :param vpc_id: VPC id
     :param cidr: CIDR IPv4 range from subnet
+    :param resources: request-scoped Snapshot of resource descriptions, a new one if None
       
     """
 
     subnet_id = None
     if vpc_id and cidr:
+        resources = resources or snapshot.Snapshot(ec2_client,LambdaInfoTracing)
         try:
-            infolog("get_subnet -- VPC ID parameter: {}".format(vpc_id),LambdaInfoTracing)
-            infolog("get_subnet -- CIDR parameter: {}".format(cidr),LambdaInfoTracing)
-            response = ec2_client.describe_subnets(
-                Filters=[
-                    {
-                        'Name': 'cidr-block',
-                        'Values': [cidr]
-                    }
-                ]
-            )
-            infolog("get_subnet -- EC2 describe subnet reponse: {}".format(response),LambdaInfoTracing)
-            if response['Subnets']:
-                subnet_id = response['Subnets'][0]['SubnetId']
-                infolog("get_subnet -- EC2 obtained subnet ID: {}".format(subnet_id),LambdaInfoTracing)
+            infolog("get_subnet -- VPC ID parameter: {}",LambdaInfoTracing,vpc_id)
+            infolog("get_subnet -- CIDR parameter: {}",LambdaInfoTracing,cidr)
+            subnet = resources.subnet(vpc_id,cidr)
+            infolog("get_subnet -- EC2 subnet record: {}",LambdaInfoTracing,subnet)
+            if subnet:
+                subnet_id = subnet.SubnetId
+                infolog("get_subnet -- EC2 obtained subnet ID: {}",LambdaInfoTracing,subnet_id)
         except botocore.exceptions.ClientError as e:
-            errorlog("Error obtaining subnet: {}".format(e.response['Error']))
+            errorlog("Error obtaining subnet: {}",e.response['Error'])
     return subnet_id
 
-
-def get_interface(subnet_id,vip,LambdaInfoTracing):
+def get_interface(subnet_id,vip,LambdaInfoTracing,vpc_id=None,resources=None):
     """
-    obtain interface id from subnet based on specific IPv4 address
+    obtain interface id from subnet (or from VPC, without subnet id) based on specific IPv4 address
   
     :param subnet_id: subnet id within VPC
     :param vip: (virtual) IPv4 address that is mapped to interface
+    :param vpc_id: VPC id, to look interface up without knowing its subnet
+    :param resources: request-scoped Snapshot of resource descriptions, a new one if None
       
     """
 
     interface_id = None
-    if subnet_id:
+    if subnet_id or vpc_id:
+        resources = resources or snapshot.Snapshot(ec2_client,LambdaInfoTracing)
         try:
-            infolog("get_interface -- Subnet ID parameter: {}".format(subnet_id),LambdaInfoTracing)
-            infolog("get_interface -- Virtual IP address parameter: {}".format(vip),LambdaInfoTracing)
-            response = ec2_client.describe_network_interfaces(
-                Filters=[{"Name": "private-ip-address", "Values": [vip]}]
-            )
-            infolog("get_interface -- EC2 describe ENI response: {}".format(response),LambdaInfoTracing)
-            if response['NetworkInterfaces']:
-                interface_id = response['NetworkInterfaces'][0]['NetworkInterfaceId']
-                infolog("get_interface -- EC2 obtained interface ID: {}".format(interface_id),LambdaInfoTracing)
+            infolog("get_interface -- Subnet ID parameter: {}",LambdaInfoTracing,subnet_id)
+            infolog("get_interface -- VPC ID parameter: {}",LambdaInfoTracing,vpc_id)
+            infolog("get_interface -- Virtual IP address parameter: {}",LambdaInfoTracing,vip)
+            interface = resources.interface_by_address(vip,subnet_id,vpc_id)
+            infolog("get_interface -- EC2 ENI record: {}",LambdaInfoTracing,interface)
+            if interface:
+                interface_id = interface.NetworkInterfaceId
+                infolog("get_interface -- EC2 obtained interface ID: {}",LambdaInfoTracing,interface_id)
         except botocore.exceptions.ClientError as e:
-            errorlog("Error obtaining interface: {}".format(e.response['Error']))
+            errorlog("Error obtaining interface: {}",e.response['Error'])
     return interface_id
 
-
-def detach_interface(network_interface_id,LambdaInfoTracing):
+def detach_interface(network_interface_id,LambdaInfoTracing,resources=None):
     """
     detach  interface if it is attached to instance
   
     :param network_interface_id: network interface id that 
                                we previously obtain
+    :param resources: request-scoped Snapshot of resource descriptions, a new one if None
       
     """
 
     attachment = None
-    response = None
+    interface = None
     if network_interface_id:
+        resources = resources or snapshot.Snapshot(ec2_client,LambdaInfoTracing)
         try:
-            infolog("detach_interface -- Network Interface ID parameter: {}".format(network_interface_id),LambdaInfoTracing)
-            response = ec2_client.describe_network_interfaces(
-                Filters=[{"Name": "network-interface-id", "Values": [network_interface_id]}]
-            )
-            infolog("detach_interface -- EC2 describe ENI response: {}".format(response),LambdaInfoTracing)
+            infolog("detach_interface -- Network Interface ID parameter: {}",LambdaInfoTracing,network_interface_id)
+            interface = resources.interface(network_interface_id)
+            infolog("detach_interface -- EC2 ENI record: {}",LambdaInfoTracing,interface)
         except botocore.exceptions.ClientError as e:
-            errorlog("Error obtaining interface description: {}".format(e.response['Error']))
+            errorlog("Error obtaining interface description: {}",e.response['Error'])
     
-    if response:
-        try:
-            if "Attachment" in response['NetworkInterfaces'][0]:
-                attachment = response['NetworkInterfaces'][0]['Attachment']['AttachmentId']
-                infolog("detach_interface -- EC2 obtained attachmend id: {}".format(attachment),LambdaInfoTracing)
-        except botocore.exceptions.ClientError as e:
-            errorlog("Error obtaining attachment: {}".format(e.response['Error']))
+    if interface and interface.Attachment:
+        attachment = interface.Attachment.AttachmentId
+        infolog("detach_interface -- EC2 obtained attachmend id: {}",LambdaInfoTracing,attachment)
     
     if attachment:
         try:
             response = ec2_client.detach_network_interface(AttachmentId=attachment,Force=True)
-            infolog("detach_interface -- EC2 obtained response from interface detachment: {}".format(response),LambdaInfoTracing)
-            # Wait time to accomplish detachment
-            time.sleep(60)
+            infolog("detach_interface -- EC2 obtained response from interface detachment: {}",LambdaInfoTracing,response)
+            # Wait until detachment is accomplished
+            if waiters.wait_interface_detached(ec2_client,network_interface_id,LambdaInfoTracing):
+                resources.update_interface(network_interface_id,Attachment=None)
+            else:
+                resources.invalidate(network_interface_id)
         except botocore.exceptions.ClientError as e:
-            errorlog("Error trying detachment: {}".format(e.response['Error']))
+            errorlog("Error trying detachment: {}",e.response['Error'])
+            resources.invalidate(network_interface_id)
     
     return attachment
 
-def attach_interface(network_interface_id,instance_id,index,LambdaInfoTracing):
+def attach_interface(network_interface_id,instance_id,index,LambdaInfoTracing,delete_on_termination=True,resources=None):
     """
     attach  interface to instance
   
@@ -347,132 +1292,199 @@ def attach_interface(network_interface_id,instance_id,index,LambdaInfoTracing):
                                we previously obtain
     :param instance_id: instance ID to attach interface to
     :param index: index for interface attachment (starting from '0')
+    :param delete_on_termination: delete interface when instance is terminated
+    :param resources: request-scoped Snapshot of resource descriptions to keep up to date
       
     """
 
     attachment = None
     if network_interface_id and instance_id:
         try:
-            infolog("attach_interface -- Network Interface ID parameter: {}".format(network_interface_id),LambdaInfoTracing)
-            infolog("attach_interface -- Instance ID parameter: {}".format(instance_id),LambdaInfoTracing)
+            infolog("attach_interface -- Network Interface ID parameter: {}",LambdaInfoTracing,network_interface_id)
+            infolog("attach_interface -- Instance ID parameter: {}",LambdaInfoTracing,instance_id)
             attach_interface = ec2_client.attach_network_interface(
                 NetworkInterfaceId=network_interface_id,
                 InstanceId=instance_id,
                 DeviceIndex=index
             )
-            infolog("attach_interface -- EC2 attach ENI response: {}".format(attach_interface),LambdaInfoTracing)
+            infolog("attach_interface -- EC2 attach ENI response: {}",LambdaInfoTracing,attach_interface)
             attachment = attach_interface['AttachmentId']
-            infolog("attach_interface -- created network attachment ID: {}".format(attachment),LambdaInfoTracing)
-
-            network_interface = ec2.NetworkInterface(network_interface_id)
+            infolog("attach_interface -- created network attachment ID: {}",LambdaInfoTracing,attachment)
 
-            #modify_attribute doesn't allow multiple parameter change at once..
-            network_interface.modify_attribute(
-                SourceDestCheck={
-                    'Value': False
-                }
-            )
-            network_interface.modify_attribute(
-                Attachment={
-                    'AttachmentId': attachment,
-                    'DeleteOnTermination': True
-                },
-            )
-            infolog("attach_interface -- created network interface: {}".format(network_interface),LambdaInfoTracing)
+            #modify_attribute doesn't allow multiple parameter change at once, so both changes are made concurrently
+            taskgraph.run_graph([
+                ('source_dest_check', lambda results: ec2_client.modify_network_interface_attribute(
+                    NetworkInterfaceId=network_interface_id,
+                    SourceDestCheck={
+                        'Value': False
+                    }
+                ), []),
+                ('delete_on_termination', lambda results: ec2_client.modify_network_interface_attribute(
+                    NetworkInterfaceId=network_interface_id,
+                    Attachment={
+                        'AttachmentId': attachment,
+                        'DeleteOnTermination': delete_on_termination
+                    }
+                ), []),
+            ])
+            infolog("attach_interface -- modified network interface: {}",LambdaInfoTracing,network_interface_id)
 
         except botocore.exceptions.ClientError as e:
-            errorlog("Error attaching network interface: {}".format(e.response['Error']))
+            errorlog("Error attaching network interface: {}",e.response['Error'])
+        if resources:
+            resources.invalidate(network_interface_id)
+
+    return attachment
+
 
+def get_attachment(network_interface_id,instance_id,LambdaInfoTracing,resources=None):
+    """
+    obtain attachment id if interface is already attached to instance
+
+    :param network_interface_id: network interface id
+    :param instance_id: instance ID
+    :param resources: request-scoped Snapshot of resource descriptions, a new one if None
+
+    """
+    attachment = None
+    resources = resources or snapshot.Snapshot(ec2_client,LambdaInfoTracing)
+    try:
+        interface = resources.interface(network_interface_id)
+        if interface and interface.Attachment and interface.Attachment.InstanceId == instance_id:
+            attachment = interface.Attachment.AttachmentId
+        infolog("get_attachment -- EC2 obtained attachment id: {}",LambdaInfoTracing,attachment)
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error obtaining attachment: {}",e.response['Error'])
     return attachment
 
+def associate_addresses(network_interface_id,addresses,LambdaInfoTracing,resources=None):
+    """
+    associate EIP allocations to private IPv4 addresses of an interface concurrently,
+    moving them from any previous association
+
+    :param network_interface_id: network interface id
+    :param addresses: (private IPv4 address, EIP allocation id or None) tuples
+    :param resources: request-scoped Snapshot of resource descriptions to keep up to date
 
-def delete_interface(network_interface_id,eipaddress,eipallocation,LambdaInfoTracing):
+    """
+    def associate(address,allocation):
+        try:
+            infolog("associate_addresses -- eipallocation {} to private address {}",LambdaInfoTracing,allocation,address)
+            response = ec2_client.associate_address(AllocationId=allocation,NetworkInterfaceId=network_interface_id,PrivateIpAddress=address,AllowReassociation=True)
+            infolog("associate_addresses -- EC2 associate EIP response: {}",LambdaInfoTracing,response)
+            return waiters.wait_address_associated(ec2_client,allocation,network_interface_id,LambdaInfoTracing)
+        except botocore.exceptions.ClientError as e:
+            errorlog("Error associating EIP {} to network interface: {}",allocation,e.response['Error'])
+
+    mappings = [(address, allocation) for address, allocation in addresses if allocation]
+    if not network_interface_id or not mappings:
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(mappings)) as executor:
+        list(executor.map(lambda mapping: associate(*mapping), mappings))
+    if resources:
+        resources.invalidate(network_interface_id)
+
+
+def delete_interface(network_interface_id,eipaddress,eipallocation,LambdaInfoTracing,resources=None):
     """
     delete interface
   
     :param network_interface_id: network interface id to be deleted
+    :param resources: request-scoped Snapshot of resource descriptions, a new one if None
       
     """
-    association = None
+    interface = None
+    resources = resources or snapshot.Snapshot(ec2_client,LambdaInfoTracing)
 
     if network_interface_id:
         try:
-            infolog("delete_interface -- Network Interface ID parameter: {}".format(network_interface_id),LambdaInfoTracing)
-            response = ec2_client.describe_network_interfaces(
-                Filters=[{"Name": "network-interface-id", "Values": [network_interface_id]}]
-            )
-            infolog("delete_interface -- EC2 describe ENI response: {}".format(response),LambdaInfoTracing)
+            infolog("delete_interface -- Network Interface ID parameter: {}",LambdaInfoTracing,network_interface_id)
+            interface = resources.interface(network_interface_id)
+            infolog("delete_interface -- EC2 ENI record: {}",LambdaInfoTracing,interface)
         except botocore.exceptions.ClientError as e:
-            errorlog("Error obtaining interface description: {}".format(e.response['Error']))
+            errorlog("Error obtaining interface description: {}",e.response['Error'])
     
-    # Disassociate existing EIP allocation
-    if ( "NetworkInterfaces" in response ) and eipallocation:
-        try:
-            if response['NetworkInterfaces'][0]:
-                if "Association" in response['NetworkInterfaces'][0]:
-                    association = response['NetworkInterfaces'][0]['Association']['AssociationId']
-                    infolog("delete_interface -- EC2 obtained association id: {}".format(association),LambdaInfoTracing)
-        except botocore.exceptions.ClientError as e:
-            errorlog("Error obtaining association: {}".format(e.response['Error']))
-
-    if association:
-        try:
-            infolog("delete_interface -- eipaddress parameter: {}".format(eipaddress),LambdaInfoTracing)
-            infolog("delete_interface -- eipallocation parameter: {}".format(eipallocation),LambdaInfoTracing)
-            response = ec2_client.disassociate_address(AssociationId=association)
-            infolog("delete_interface -- EC2 disassociate EIP response: {}".format(response),LambdaInfoTracing)
-        except botocore.exceptions.ClientError as e:
-            errorlog("Error disassociating EIP from network interface: {}".format(e.response['Error']))
+    # Disassociate all existing EIP allocations, discovered from the same description
+    if interface:
+        infolog("delete_interface -- eipaddress parameter: {}",LambdaInfoTracing,eipaddress)
+        infolog("delete_interface -- eipallocation parameter: {}",LambdaInfoTracing,eipallocation)
+        viprelease.disassociate_addresses(ec2_client,interface,LambdaInfoTracing)
     
     # Then delete the interface
     try:
-        infolog("delete_interface -- Network Interface ID parameter: {}".format(network_interface_id),LambdaInfoTracing)
+        infolog("delete_interface -- Network Interface ID parameter: {}",LambdaInfoTracing,network_interface_id)
         ec2_client.delete_network_interface(
             NetworkInterfaceId=network_interface_id
         )
-        infolog("delete_interface -- EC2 deleted network interface: {}".format(network_interface_id),LambdaInfoTracing)
+        infolog("delete_interface -- EC2 deleted network interface: {}",LambdaInfoTracing,network_interface_id)
         return True
 
     except botocore.exceptions.ClientError as e:
-        errorlog("Error deleting interface {}: {}".format(network_interface_id,e.response['Error']))
+        errorlog("Error deleting interface {}: {}",network_interface_id,e.response['Error'])
+    finally:
+        resources.invalidate(network_interface_id)
 
+def get_route_table_association(subnet_id,route_table_id,LambdaInfoTracing,resources=None):
+    """
+    obtain Route Table association id of a subnet, or None if subnet has no explicit association
+  
+    :param subnet_id: subnet id
+    :param route_table_id: route table id the subnet is expected to be associated with
+    :param resources: request-scoped Snapshot of resource descriptions, a new one if None
+      
+    """
+    RouteTableAssociationId = None
+    resources = resources or snapshot.Snapshot(ec2_client,LambdaInfoTracing)
+    try:
+        infolog("get_route_table_association -- Subnet ID parameter: {}",LambdaInfoTracing,subnet_id)
+        infolog("get_route_table_association -- Route Table ID parameter: {}",LambdaInfoTracing,route_table_id)
+        association = resources.route_table_association(subnet_id)
+        infolog("get_route_table_association -- EC2 obtained route table association: {}",LambdaInfoTracing,association)
+        if association:
+            RouteTableAssociationId = association.RouteTableAssociationId
+            if association.RouteTableId != route_table_id:
+                errorlog("Subnet {} is associated with Route Table {} instead of {}",subnet_id,association.RouteTableId,route_table_id)
+        infolog("get_route_table_association -- EC2 obtained route table id subnet: {}",LambdaInfoTracing,RouteTableAssociationId)
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error obtaining Route Table Association {}: {}",subnet_id,e.response['Error'])
+    return RouteTableAssociationId
 
-def disassociate_delete_subnet(subnet_id,route_table_id,LambdaInfoTracing):
+def disassociate_delete_subnet(subnet_id,route_table_id,LambdaInfoTracing,RouteTableAssociationId=None,resources=None):
     """
     disassociate_delete subnet
   
     :param subnet_id: subnet id to be deleted
     :param route_table_id: route table id to disassociate subnet from
+    :param RouteTableAssociationId: association id if already obtained, looked up otherwise
+    :param resources: request-scoped Snapshot of resource descriptions, a new one if None
       
     """
-    try:
-        infolog("disassociate_delete_subnet -- Subnet ID parameter: {}".format(subnet_id),LambdaInfoTracing)
-        infolog("disassociate_delete_subnet -- Route Table ID parameter: {}".format(route_table_id),LambdaInfoTracing)
-        response = ec2_client.describe_route_tables(RouteTableIds=[route_table_id])
-        infolog("disassociate_delete_subnet -- EC2 obtained route table description: {}".format(response),LambdaInfoTracing)
-        RouteTableAssociationId = response['RouteTables'][0]['Associations'][0]['RouteTableAssociationId']
-        infolog("disassociate_delete_subnet -- EC2 obtained route table id subnet: {}".format(RouteTableAssociationId),LambdaInfoTracing)
-    except botocore.exceptions.ClientError as e:
-        errorlog("Error obtaining Route Table Association {}: {}".format(subnet_id,e.response['Error']))
+    resources = resources or snapshot.Snapshot(ec2_client,LambdaInfoTracing)
+    if RouteTableAssociationId is None:
+        RouteTableAssociationId = get_route_table_association(subnet_id,route_table_id,LambdaInfoTracing,resources)
     
     if RouteTableAssociationId:
         try:
-            infolog("disassociate_delete_subnet -- Subnet ID parameter: {}".format(subnet_id),LambdaInfoTracing)
-            infolog("disassociate_delete_subnet -- Route Table ID parameter: {}".format(route_table_id),LambdaInfoTracing)
+            infolog("disassociate_delete_subnet -- Subnet ID parameter: {}",LambdaInfoTracing,subnet_id)
+            infolog("disassociate_delete_subnet -- Route Table ID parameter: {}",LambdaInfoTracing,route_table_id)
             response = ec2_client.disassociate_route_table(AssociationId=RouteTableAssociationId)
-            infolog("disassociate_delete_subnet -- EC2 disassociating subnet: {}".format(response),LambdaInfoTracing)
+            infolog("disassociate_delete_subnet -- EC2 disassociating subnet: {}",LambdaInfoTracing,response)
+            resources.invalidate(subnet_id)
         except botocore.exceptions.ClientError as e:
-            errorlog("Error disassociating subnet {}: {}".format(subnet_id,e.response['Error']))
+            errorlog("Error disassociating subnet {}: {}",subnet_id,e.response['Error'])
+    else:
+        infolog("disassociate_delete_subnet -- no Route Table association for subnet {}, nothing to disassociate",LambdaInfoTracing,subnet_id)
 
     try:
-        infolog("disassociate_delete_subnet -- Subnet ID parameter: {}".format(subnet_id),LambdaInfoTracing)
+        infolog("disassociate_delete_subnet -- Subnet ID parameter: {}",LambdaInfoTracing,subnet_id)
         ec2_client.delete_subnet(
             SubnetId=subnet_id
         )
-        infolog("disassociate_delete_subnet -- EC2 deleted subnet: {}".format(subnet_id),LambdaInfoTracing)
+        infolog("disassociate_delete_subnet -- EC2 deleted subnet: {}",LambdaInfoTracing,subnet_id)
+        resources.invalidate(subnet_id)
         return True
     except botocore.exceptions.ClientError as e:
-        errorlog("Error deleting subnet {}: {}".format(subnet_id,e.response['Error']))
+        errorlog("Error deleting subnet {}: {}",subnet_id,e.response['Error'])
 
 
 def complete_lifecycle_action_success(hookname,groupname,instance_id,LambdaInfoTracing):
@@ -488,18 +1500,18 @@ def complete_lifecycle_action_success(hookname,groupname,instance_id,LambdaInfoT
     """
 
     try:
-        infolog("complete_lifecycle_action_success -- hookname parameter: {}".format(hookname),LambdaInfoTracing)
-        infolog("complete_lifecycle_action_success -- ASG parameter: {}".format(groupname),LambdaInfoTracing)
-        infolog("complete_lifecycle_action_success -- Instance ID parameter: {}".format(instance_id),LambdaInfoTracing)
+        infolog("complete_lifecycle_action_success -- hookname parameter: {}",LambdaInfoTracing,hookname)
+        infolog("complete_lifecycle_action_success -- ASG parameter: {}",LambdaInfoTracing,groupname)
+        infolog("complete_lifecycle_action_success -- Instance ID parameter: {}",LambdaInfoTracing,instance_id)
         asg_client.complete_lifecycle_action(
             LifecycleHookName=hookname,
             AutoScalingGroupName=groupname,
             InstanceId=instance_id,
             LifecycleActionResult='CONTINUE'
         )
-        infolog("complete_lifecycle_action_success -- Lifecycle hook CONTINUEd for: {}".format(instance_id),LambdaInfoTracing)
+        infolog("complete_lifecycle_action_success -- Lifecycle hook CONTINUEd for: {}",LambdaInfoTracing,instance_id)
     except botocore.exceptions.ClientError as e:
-            errorlog("Error completing life cycle hook for instance {}: {}".format(instance_id, e.response['Error']))
+            errorlog("Error completing life cycle hook for instance {}: {}",instance_id, e.response['Error'])
             errorlog('{"Error": "1"}')
 
 def complete_lifecycle_action_failure(hookname,groupname,instance_id,LambdaInfoTracing):
@@ -515,18 +1527,18 @@ def complete_lifecycle_action_failure(hookname,groupname,instance_id,LambdaInfoT
     """
 
     try:
-        infolog("complete_lifecycle_action_failure -- hookname parameter: {}".format(hookname),LambdaInfoTracing)
-        infolog("complete_lifecycle_action_failure -- ASG parameter: {}".format(groupname),LambdaInfoTracing)
-        infolog("complete_lifecycle_action_failure -- Instance ID parameter: {}".format(instance_id),LambdaInfoTracing)
+        infolog("complete_lifecycle_action_failure -- hookname parameter: {}",LambdaInfoTracing,hookname)
+        infolog("complete_lifecycle_action_failure -- ASG parameter: {}",LambdaInfoTracing,groupname)
+        infolog("complete_lifecycle_action_failure -- Instance ID parameter: {}",LambdaInfoTracing,instance_id)
         asg_client.complete_lifecycle_action(
             LifecycleHookName=hookname,
             AutoScalingGroupName=groupname,
             InstanceId=instance_id,
             LifecycleActionResult='ABANDON'
         )
-        infolog("complete_lifecycle_action_failure -- Lifecycle hook ABANDONed for: {}".format(instance_id),LambdaInfoTracing)
+        infolog("complete_lifecycle_action_failure -- Lifecycle hook ABANDONed for: {}",LambdaInfoTracing,instance_id)
     except botocore.exceptions.ClientError as e:
-            errorlog("Error completing life cycle hook for instance {}: {}".format(instance_id, e.response['Error']))
+            errorlog("Error completing life cycle hook for instance {}: {}",instance_id, e.response['Error'])
             errorlog('{"Error": "1"}')
 
 def restart_instance(instance_id,LambdaInfoTracing):
@@ -538,27 +1550,10 @@ def restart_instance(instance_id,LambdaInfoTracing):
     """
     if instance_id:
         try:
-            infolog("restart_instance -- Instance ID: {}".format(instance_id),LambdaInfoTracing)
+            infolog("restart_instance -- Instance ID: {}",LambdaInfoTracing,instance_id)
             response = ec2_client.reboot_instances(
                 InstanceIds=[instance_id]
             )
-            infolog("restart_instance -- EC2 restart EC2 response: {}".format(response),LambdaInfoTracing)
+            infolog("restart_instance -- EC2 restart EC2 response: {}",LambdaInfoTracing,response)
         except botocore.exceptions.ClientError as e:
-            errorlog("Error restarting EC2 instance: {}".format(e.response['Error']))
-
-def errorlog(error):
-    """ 
-    Log
-    
-    takes message as an input and print it with time in iso format 
-    """
-    logger.error('%s', error)
-
-def infolog(string,LambdaInfoTracing):
-    """ 
-    Log
-    
-    takes message as an input and print it with time in iso format 
-    """
-    if str(LambdaInfoTracing) == "true": 
-        logger.info('%s', string)
+            errorlog("Error restarting EC2 instance: {}",e.response['Error'])
@@ -0,0 +1,58 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+# Client settings, overridden with environment variables: short timeouts, since EC2 and Auto Scaling
+# calls either answer quickly or should be retried; adaptive retries back off client-side under throttling;
+# enough pooled connections for the concurrent steps of a lifecycle action
+CONFIG = Config(
+    connect_timeout=float(os.environ.get('AWSConnectTimeout', 5)),
+    read_timeout=float(os.environ.get('AWSReadTimeout', 15)),
+    retries={'max_attempts': int(os.environ.get('AWSMaxAttempts', 8)), 'mode': 'adaptive'},
+    max_pool_connections=int(os.environ.get('AWSMaxPoolConnections', 20)),
+)
+
+# Clients created on first use and reused by warm containers: service name -> client
+clients = {}
+lock = threading.Lock()
+
+class LazyClient(object):
+    """
+    boto3 client proxy, creating the shared client for its service on first attribute access
+    """
+
+    def __init__(self,service):
+        self.service = service
+
+    def __getattr__(self,name):
+        return getattr(client(self.service), name)
+
+def client(service):
+    """
+    obtain the shared boto3 client for a service, creating it with CONFIG on first use
+
+    :param service: AWS service name, e.g. 'ec2'
+
+    """
+    if service not in clients:
+        with lock:
+            if service not in clients:
+                clients[service] = boto3.client(service, config=CONFIG)
+    return clients[service]
@@ -0,0 +1,115 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import collections
+from logs import infolog
+import taskgraph
+
+
+# Actions building the VIP resources of a launching instance, in the order they are taken
+LAUNCH_ACTIONS = ('create_subnet', 'associate_subnet', 'create_interface', 'attach_interface', 'disable_source_dest_check', 'set_delete_on_termination', 'associate_addresses')
+
+# Current state of the VIP resources of a VPC
+Observed = collections.namedtuple('Observed', ['Subnet', 'RouteTableAssociation', 'Interface'])
+
+def observe(resources,vpc_id,cidr,vip,LambdaInfoTracing):
+    """
+    describe VIP subnet, its route table association and VIP ENI (with attachment, delete-on-termination,
+    source/dest check and EIP associations) in one snapshot, the subnet and ENI lookups running concurrently
+
+    :param resources: request-scoped Snapshot describing them, which keeps their descriptions
+    :param vpc_id: VPC id
+    :param cidr: CIDR IPv4 range of the VIP subnet
+    :param vip: VIP address
+
+    """
+    results = taskgraph.run_graph([
+        ('subnet', lambda results: resources.subnet(vpc_id,cidr), []),
+        ('interface', lambda results: resources.interface_by_address(vip,vpc_id=vpc_id), []),
+        ('route_table_association', lambda results: resources.route_table_association(results['subnet'].SubnetId) if results['subnet'] else None, ['subnet']),
+    ])
+    observed = Observed(results['subnet'], results['route_table_association'], results['interface'])
+    infolog("observe -- VIP resources of {}: {}",LambdaInfoTracing,vpc_id,observed)
+    return observed
+
+def owned(observed,instance_id):
+    """
+    check whether the VIP resources belong to an instance, i.e. the VIP ENI is attached to it
+
+    :param observed: Observed state
+    :param instance_id: instance id
+
+    """
+    interface = observed.Interface
+    return bool(interface and interface.Attachment and interface.Attachment.InstanceId == instance_id
+                and observed.Subnet and interface.SubnetId == observed.Subnet.SubnetId)
+
+def launch_plan(observed,instance_id,route_table_id,addresses):
+    """
+    diff the observed state against the desired state of a launching instance: VIP subnet associated to the
+    WAN Route Table, VIP ENI attached to the instance with source/dest check disabled, deleted on termination
+    and with its EIPs associated; returns the missing (action, resource id) tuples, empty if there is none
+
+    :param observed: Observed state
+    :param instance_id: launching instance id
+    :param route_table_id: WAN Route Table id
+    :param addresses: (VIP address, EIP allocation id or None) tuples
+
+    """
+    subnet, association, interface = observed
+    if not owned(observed,instance_id):
+        actions = []
+        if subnet or interface:
+            # Leftovers, or resources of the previous instance, are torn down before building them again
+            actions.append(('release_vip', interface.NetworkInterfaceId if interface else subnet.SubnetId))
+        return actions + [(action, None) for action in LAUNCH_ACTIONS]
+
+    actions = []
+    if association is None or association.RouteTableId != route_table_id:
+        actions.append(('associate_subnet', subnet.SubnetId))
+    if interface.SourceDestCheck is not False:
+        actions.append(('disable_source_dest_check', interface.NetworkInterfaceId))
+    if interface.Attachment.DeleteOnTermination is not True:
+        actions.append(('set_delete_on_termination', interface.Attachment.AttachmentId))
+    associated = {(association.PrivateIpAddress, association.AllocationId) for association in interface.Associations}
+    if any(allocation and (address, allocation) not in associated for address, allocation in addresses):
+        actions.append(('associate_addresses', interface.NetworkInterfaceId))
+    return actions
+
+def terminate_plan(observed,instance_id):
+    """
+    diff the observed state against the desired state of a terminating instance: no VIP ENI, route table
+    association or subnet left, unless handed over to a replacement instance (VIP ENI attached to it);
+    returns the missing (action, resource id) tuples, empty if there is none
+
+    :param observed: Observed state
+    :param instance_id: terminating instance id
+
+    """
+    subnet, association, interface = observed
+    if interface and interface.Attachment and interface.Attachment.InstanceId != instance_id:
+        return []
+    actions = []
+    if interface and interface.Attachment:
+        actions.append(('detach_interface', interface.Attachment.AttachmentId))
+    if interface:
+        actions.append(('delete_interface', interface.NetworkInterfaceId))
+    if association:
+        actions.append(('disassociate_subnet', association.RouteTableAssociationId))
+    if subnet:
+        actions.append(('delete_subnet', subnet.SubnetId))
+    return actions
@@ -0,0 +1,240 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import concurrent.futures
+import logs
+from logs import errorlog, infolog
+import os
+import time
+import botocore
+import awsclients
+import inventory
+import metrics
+import readiness
+import registry
+import statestore
+
+asg_client = awsclients.LazyClient('autoscaling')
+ec2_client = awsclients.LazyClient('ec2')
+
+# Data plane checks, as readiness checks that only need the probed address, e.g. 'tcp:179';
+# ICMP is not among them, Lambda functions cannot send echo requests
+PROBES = ('tcp',)
+# Probe rounds in which every one of at least this many targets fails are taken as a fault of the monitor
+# itself (e.g. its network path to the VPC), and mark no VNF unhealthy
+FAULT_QUORUM = 2
+# Seconds between probe rounds, within each invocation of the one minute schedule
+INTERVAL = float(os.environ.get('HealthCheckInterval', 10))
+# Seconds covered by one invocation, the period of its schedule
+PERIOD = 60
+# Concurrent probes at most, across all VNFs
+MAX_PROBES = 32
+
+# Clock and sleep of probe rounds, kept as module attributes so they can be virtualised
+clock = time.monotonic
+sleep = time.sleep
+
+# State store keeping consecutive probe failures across invocations, created once per container
+state_store = None
+
+def lambda_handler(event, context):
+    """
+    probe the data plane of all in-service VNFs every INTERVAL seconds for one schedule period, marking
+    a VNF unhealthy in its Auto Scaling Group after its threshold of consecutive failed rounds, so that
+    it is replaced without waiting for EC2 health checks
+    """
+    logs.bind(CorrelationId=event.get('id'))
+    groups = monitored_groups()
+    deadline = clock() + PERIOD
+    if context is not None:
+        # Leave time for a last round of probes before the function times out
+        deadline = min(deadline, clock() + context.get_remaining_time_in_millis() / 1000.0 - readiness.PROBE_TIMEOUT - 1)
+    monitors = []
+    for asg_name, config in groups.items():
+        try:
+            monitors.append(Monitor(asg_name,config))
+        except ValueError as e:
+            errorlog("Health checks of {} not monitored: {}",asg_name,e)
+    try:
+        while True:
+            started = clock()
+            probe_round(monitors)
+            if started + INTERVAL > deadline:
+                break
+            sleep(max(0, started + INTERVAL - clock()))
+    finally:
+        for monitor in monitors:
+            monitor.metrics.flush()
+
+def monitored_groups():
+    """
+    obtain VNF config of each monitored Auto Scaling Group: all registered VNFs, or the single one of the stack
+    """
+    source = os.environ.get('VNFRegistry')
+    if not source:
+        return {os.environ['AutoScalingGroupName']: registry.env_config()}
+    return registry.get_index(source)
+
+def probe_round(monitors):
+    """
+    probe all in-service VNFs of all monitors concurrently, then mark those over their threshold unhealthy,
+    unless all of them failed
+
+    :param monitors: Monitor of each Auto Scaling Group
+
+    """
+    targets = [(monitor, target) for monitor in monitors for target in monitor.targets()]
+    if not targets:
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(targets), MAX_PROBES)) as executor:
+        results = list(executor.map(lambda item: item[0].probe(item[1]), targets))
+    if len(targets) >= FAULT_QUORUM and not any(results):
+        # The whole fleet failing at once is far likelier a monitor fault than a fleet failure
+        errorlog("All {} health monitor targets failed in the same round, no VNF marked unhealthy",len(targets))
+        for monitor in monitors:
+            monitor.metrics.count('MonitorFaults')
+        return
+    for monitor in monitors:
+        monitor.record([(target, healthy) for (owner, target), healthy in zip(targets, results) if owner is monitor])
+
+class Monitor(object):
+    """
+    health monitor of the VNFs of one Auto Scaling Group, counting consecutive failed probe rounds per instance
+    in the state store
+    """
+
+    def __init__(self,asg_name,config):
+        self.asg_name = asg_name
+        self.LambdaInfoTracing = str(config.get('LambdaInfoTracing','false'))
+        self.checks = parse_probes(str(config.get('HealthChecks') or ''))
+        self.threshold = int(config.get('HealthCheckThreshold') or 3)
+        self.address = config.get('HealthCheckAddress') or ('primary' if str(config.get('WarmStandbyMode','false')) == "true" else 'vip')
+        if self.address == 'eip':
+            # The function runs in the VPC without a public address, it reaches private addresses only
+            raise ValueError("EIP cannot be probed from within the VPC")
+        self.config = config
+        self.key = 'health-' + asg_name
+        self.metrics = metrics.Histogram({'AutoScalingGroupName': asg_name, 'VNFType': config.get('VNFType')},prefix='Health.')
+
+    def targets(self):
+        """
+        obtain probe targets of the in-service, healthy instances of the Auto Scaling Group
+        """
+        targets = []
+        try:
+            response = asg_client.describe_auto_scaling_groups(AutoScalingGroupNames=[self.asg_name])
+            for group in response['AutoScalingGroups']:
+                for instance in group.get('Instances', []):
+                    # Launching VNFs are checked for readiness by their lifecycle action instead
+                    if instance['LifecycleState'] != 'InService' or instance['HealthStatus'] != 'Healthy':
+                        continue
+                    address = self.probe_address(instance['InstanceId'])
+                    if address:
+                        targets.append({'instance_id': instance['InstanceId'], 'address': address, 'LambdaInfoTracing': self.LambdaInfoTracing})
+        except botocore.exceptions.ClientError as e:
+            errorlog("Error describing Auto Scaling Group {}: {}",self.asg_name,e.response['Error'])
+        return targets
+
+    def probe_address(self,instance_id):
+        """
+        obtain address probed on an instance
+
+        :param instance_id: instance id
+
+        """
+        if self.address == 'primary':
+            instance = inventory.get_instance(ec2_client,instance_id,self.LambdaInfoTracing)
+            primary = [interface for interface in (instance or {}).get('NetworkInterfaces', []) if interface['DeviceIndex'] == 0]
+            return primary[0]['PrivateIpAddress'] if primary else None
+        return readiness.probe_address(self.address,str(self.config.get('VIPAddress','')).split('/')[0],str(self.config.get('EIPAddress','')).split('/')[0])
+
+    def probe(self,target):
+        """
+        run the probes of a target in order, stopping at the first failing one; returns True if all pass
+
+        :param target: dict with 'instance_id', 'address' and 'LambdaInfoTracing'
+
+        """
+        for name, argument in self.checks:
+            if not readiness.CHECKS[name](None,target,argument):
+                return False
+        return True
+
+    def record(self,results):
+        """
+        update consecutive failures of the probed instances, marking unhealthy those reaching the threshold
+
+        :param results: (target, healthy) tuples
+
+        """
+        failures, version = store().get(self.key)
+        failures = failures or {}
+        updated = {}
+        for target, healthy in results:
+            instance_id = target['instance_id']
+            self.metrics.count('Probes')
+            if healthy:
+                continue
+            self.metrics.count('ProbeFailures')
+            updated[instance_id] = failures.get(instance_id, 0) + 1
+            infolog("Monitor -- {} failed probe {} of {} on {}",self.LambdaInfoTracing,instance_id,updated[instance_id],self.threshold,target['address'])
+            if updated[instance_id] >= self.threshold and set_unhealthy(instance_id,self.LambdaInfoTracing):
+                self.metrics.count('Unhealthy')
+                del updated[instance_id]
+        if updated != failures:
+            try:
+                store().put(self.key,updated,version)
+            except statestore.ConflictError:
+                errorlog("Monitor -- failure counts of {} updated concurrently",self.asg_name)
+
+def parse_probes(specification):
+    """
+    parse a comma separated list of data plane probes, e.g. 'tcp:179' or 'tcp:179,tcp:22'
+
+    :param specification: list of probe names, each optionally followed by ':' and an argument
+
+    """
+    checks = readiness.parse_checks(specification)
+    if not checks:
+        raise ValueError("No health checks configured")
+    for name, argument in checks:
+        if name not in PROBES:
+            raise ValueError("Unsupported health check: {}".format(name))
+    return checks
+
+def set_unhealthy(instance_id,LambdaInfoTracing):
+    """
+    mark an instance unhealthy in its Auto Scaling Group, which terminates and replaces it; returns True if marked
+
+    :param instance_id: instance id
+
+    """
+    try:
+        asg_client.set_instance_health(InstanceId=instance_id,HealthStatus='Unhealthy',ShouldRespectGracePeriod=False)
+        infolog("set_unhealthy -- instance {} marked unhealthy",LambdaInfoTracing,instance_id)
+        return True
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error marking instance {} unhealthy: {}",instance_id,e.response['Error'])
+        return False
+
+def store():
+    """
+    obtain state store for consecutive probe failures, created once per container
+    """
+    global state_store
+    if state_store is None:
+        state_store = statestore.get_store()
+    return state_store
@@ -0,0 +1,88 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from logs import errorlog, infolog
+import os
+import threading
+import botocore
+
+
+# Seconds between heartbeats, well below the HeartbeatTimeout of the lifecycle hooks
+INTERVAL = float(os.environ.get('HeartbeatInterval', 30))
+
+def wait(event,seconds):
+    """
+    wait for an event or a number of seconds, kept as module function so it can be virtualised
+
+    :param event: threading.Event ending the wait when set
+    :param seconds: seconds to wait at most
+
+    """
+    return event.wait(seconds)
+
+class Heartbeat(object):
+    """
+    context manager recording lifecycle action heartbeats on a background thread while its block runs,
+    so that the lifecycle hook timeout only expires once the invocation itself has stopped
+    """
+
+    def __init__(self,asg_client,hookname,groupname,instance_id,token,LambdaInfoTracing,interval=None):
+        self.asg_client = asg_client
+        self.hookname = hookname
+        self.groupname = groupname
+        self.instance_id = instance_id
+        self.token = token
+        self.LambdaInfoTracing = LambdaInfoTracing
+        self.interval = INTERVAL if interval is None else interval
+        self.stopped = threading.Event()
+        self.thread = None
+        self.beats = 0
+
+    def __enter__(self):
+        if self.interval > 0:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self,*exc_info):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        return False
+
+    def run(self):
+        while not wait(self.stopped,self.interval):
+            if not self.beat():
+                return
+
+    def beat(self):
+        """
+        record one heartbeat; returns False once the lifecycle action is no longer active
+        """
+        params = {'LifecycleHookName': self.hookname, 'AutoScalingGroupName': self.groupname, 'InstanceId': self.instance_id}
+        if self.token:
+            params['LifecycleActionToken'] = self.token
+        try:
+            self.asg_client.record_lifecycle_action_heartbeat(**params)
+            self.beats += 1
+            infolog("Heartbeat -- heartbeat {} recorded for: {}",self.LambdaInfoTracing,self.beats,self.instance_id)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] == 'ValidationError':
+                # Lifecycle action already completed or expired
+                infolog("Heartbeat -- lifecycle action no longer active for: {}",self.LambdaInfoTracing,self.instance_id)
+                return False
+            errorlog("Error recording lifecycle action heartbeat for instance {}: {}",self.instance_id,e.response['Error'])
+        return True
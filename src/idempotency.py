@@ -0,0 +1,101 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from logs import errorlog, infolog
+import os
+import time
+import uuid
+import waiters
+from statestore import ConflictError
+
+
+# Seconds a duplicate event waits for the in-flight invocation to finish (0 to return immediately)
+WAIT = float(os.environ.get('DuplicateEventWait', 0))
+# Seconds a claim is held outside Lambda, where the invocation has no deadline
+LEASE = 900
+
+# Wall clock of claim leases, kept in the state store across invocations
+clock = time.time
+
+class Claim(object):
+    """
+    exclusive claim on a lifecycle action, kept in a state store next to its workflow journal, so that
+    duplicate deliveries of the same event neither redo nor undo the work of the invocation holding it
+
+    The claim is leased until the holding invocation times out, so that a retry can take over
+    the lifecycle action once the holder is gone, and records the result once the holder is done.
+    """
+
+    def __init__(self,store,key,context,LambdaInfoTracing):
+        self.store = store
+        self.key = 'claim-' + key
+        self.context = context
+        self.LambdaInfoTracing = LambdaInfoTracing
+        self.owner = getattr(context, 'aws_request_id', None) or str(uuid.uuid4())
+        self.version = 0
+        self.record = None
+
+    def acquire(self):
+        """
+        claim the lifecycle action; returns False if another invocation holds it or has completed it
+        """
+        record, version = self.store.get(self.key)
+        if record is not None and (record.get('Result') or (record['Owner'] not in (None, self.owner) and record['LeaseUntil'] > clock())):
+            infolog("Claim -- {} held by {} (result: {})",self.LambdaInfoTracing,self.key,record['Owner'],record.get('Result'))
+            self.record = record
+            return False
+        if self.context is not None:
+            lease = self.context.get_remaining_time_in_millis() / 1000.0
+        else:
+            lease = LEASE
+        try:
+            self.record = {'Owner': self.owner, 'LeaseUntil': clock() + lease, 'Result': None}
+            self.version = self.store.put(self.key,self.record,version)
+        except ConflictError:
+            infolog("Claim -- {} claimed concurrently by another invocation",self.LambdaInfoTracing,self.key)
+            self.record = self.store.get(self.key)[0]
+            return False
+        return True
+
+    def release(self,result=None):
+        """
+        release the claim, recording the result of the lifecycle action if it has been completed
+
+        :param result: lifecycle action result, None to let another invocation resume it
+
+        """
+        self.record = {'Owner': None, 'LeaseUntil': 0, 'Result': result}
+        try:
+            self.version = self.store.put(self.key,self.record,self.version)
+        except ConflictError:
+            errorlog("Claim -- {} was taken over by another invocation",self.key)
+
+    def wait(self,timeout):
+        """
+        wait until the invocation holding the claim records a result, or its claim is released or expires;
+        returns the result, or None if the lifecycle action is still to be (re)claimed
+
+        :param timeout: seconds to wait at most
+
+        """
+        def probe():
+            self.record = self.store.get(self.key)[0]
+            if self.record is None or self.record.get('Result'):
+                return True
+            return self.record['Owner'] is None or self.record['LeaseUntil'] <= clock()
+        if timeout > 0 and waiters.wait_until('claim_released',probe,self.LambdaInfoTracing,timeout):
+            return (self.record or {}).get('Result')
+        return None
@@ -0,0 +1,108 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from logs import errorlog, infolog
+import os
+import time
+import botocore
+
+
+# Warm-container cache of instance metadata: instance id -> (expiry time, record)
+clock = time.monotonic
+cache = {}
+CACHE_TTL = float(os.environ.get('InstanceCacheTTL', 900))
+
+def get_instance(ec2_client,instance_id,LambdaInfoTracing,refresh=False):
+    """
+    obtain instance metadata (AZ, subnet, VPC, state and ENIs), from cache if still valid
+
+    :param ec2_client: EC2 client
+    :param instance_id: instance ID to look up
+    :param refresh: bypass cached entry and describe the instance again
+
+    """
+    evict_expired()
+    if not refresh and instance_id in cache:
+        infolog("get_instance -- cache hit for instance: {}",LambdaInfoTracing,instance_id)
+        return cache[instance_id][1]
+
+    record = describe_instance(ec2_client,instance_id,LambdaInfoTracing)
+    if record:
+        cache[instance_id] = (clock() + CACHE_TTL, record)
+    return record
+
+def describe_instance(ec2_client,instance_id,LambdaInfoTracing):
+    """
+    describe a single instance by id, following pagination
+
+    :param ec2_client: EC2 client
+    :param instance_id: instance ID to look up
+
+    """
+    record = None
+    try:
+        paginator = ec2_client.get_paginator('describe_instances')
+        for page in paginator.paginate(InstanceIds=[instance_id]):
+            for reservation in page['Reservations']:
+                for instance in reservation.get('Instances', []):
+                    if instance['InstanceId'] == instance_id:
+                        record = instance_record(instance)
+        infolog("describe_instance -- instance record: {}",LambdaInfoTracing,record)
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error describing instance {}: {}",instance_id,e.response['Error'])
+    return record
+
+def instance_record(instance):
+    """
+    reduce an EC2 instance description to the metadata used by the lifecycle handlers
+
+    :param instance: instance element from describe_instances response
+
+    """
+    return {
+        'InstanceId': instance['InstanceId'],
+        'AvailabilityZone': instance['Placement']['AvailabilityZone'],
+        'SubnetId': instance.get('SubnetId'),
+        'VpcId': instance.get('VpcId'),
+        'State': instance.get('State', {}).get('Name'),
+        'NetworkInterfaces': [
+            {
+                'NetworkInterfaceId': interface['NetworkInterfaceId'],
+                'DeviceIndex': interface.get('Attachment', {}).get('DeviceIndex'),
+                'AttachmentId': interface.get('Attachment', {}).get('AttachmentId'),
+                'SubnetId': interface.get('SubnetId'),
+                'PrivateIpAddress': interface.get('PrivateIpAddress'),
+            }
+            for interface in instance.get('NetworkInterfaces', [])
+        ],
+    }
+
+def invalidate(instance_id):
+    """
+    drop cached metadata for an instance
+
+    :param instance_id: instance ID to drop
+
+    """
+    cache.pop(instance_id, None)
+
+def evict_expired():
+    """
+    drop all cached entries whose TTL has expired
+    """
+    now = clock()
+    for instance_id in [key for key, (expiry, record) in cache.items() if expiry <= now]:
+        del cache[instance_id]
@@ -0,0 +1,116 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from logs import errorlog, infolog
+import time
+import waiters
+from statestore import ConflictError
+
+
+# Seconds a lease is held outside Lambda, where the invocation has no deadline
+DURATION = 900
+
+# Wall clock of lease expiry, kept in the state store across invocations
+clock = time.time
+
+class Lease(object):
+    """
+    lease lock with fencing tokens, kept in a state store, serialising the lifecycle actions that create
+    or tear down the resources of the same VIP
+
+    A lease is held until the invocation holding it times out, so that it can be taken over once its holder
+    is gone. Each change of holder increments the fencing token, so a holder that lost its lease can tell.
+    """
+
+    def __init__(self,store,key,owner,context,LambdaInfoTracing):
+        self.store = store
+        self.key = 'lease-' + key
+        self.owner = owner
+        self.context = context
+        self.LambdaInfoTracing = LambdaInfoTracing
+        self.token = None
+        self.holding = False
+        # Previous holder, if its lease expired before being taken over by this one
+        self.stale = None
+
+    def acquire(self):
+        """
+        acquire the lease if it is free, expired or already held by this owner; returns True once held
+        """
+        record, version = self.store.get(self.key)
+        now = clock()
+        if record is not None and record['Owner'] not in (None, self.owner) and record['ExpiresAt'] > now:
+            return False
+        if record is not None and record['Owner'] == self.owner:
+            token = record['Token']
+        else:
+            token = (record['Token'] if record is not None else 0) + 1
+            self.stale = record['Owner'] if record is not None and record['Owner'] is not None else None
+        duration = self.context.get_remaining_time_in_millis() / 1000.0 if self.context is not None else DURATION
+        try:
+            self.store.put(self.key,{'Owner': self.owner, 'Token': token, 'ExpiresAt': now + duration},version)
+        except ConflictError:
+            return False
+        self.token = token
+        self.holding = True
+        infolog("Lease -- {} acquired with token {} (taken over from: {})",self.LambdaInfoTracing,self.key,token,self.stale)
+        return True
+
+    def wait(self,timeout):
+        """
+        wait until the lease is acquired; returns True once held
+
+        :param timeout: seconds to wait at most
+
+        """
+        return bool(waiters.wait_until('lease_released',self.acquire,self.LambdaInfoTracing,timeout))
+
+    def wait_taken(self,timeout):
+        """
+        wait until another owner has acquired the lease since this owner released it; returns True once taken
+
+        :param timeout: seconds to wait at most
+
+        """
+        def probe():
+            record = self.store.get(self.key)[0]
+            return record is not None and record['Token'] > self.token
+        return bool(waiters.wait_until('lease_released',probe,self.LambdaInfoTracing,timeout))
+
+    def held(self):
+        """
+        fencing check before acting on the resources: True if this owner still holds the lease with its token
+        """
+        record = self.store.get(self.key)[0]
+        return self.token is not None and record is not None and record['Owner'] == self.owner \
+            and record['Token'] == self.token and record['ExpiresAt'] > clock()
+
+    def release(self):
+        """
+        release the lease, unless it has been taken over meanwhile
+        """
+        if not self.holding:
+            return
+        self.holding = False
+        record, version = self.store.get(self.key)
+        if record is None or record['Owner'] != self.owner or record['Token'] != self.token:
+            errorlog("Lease -- {} was taken over by another owner",self.key)
+            return
+        try:
+            self.store.put(self.key,{'Owner': None, 'Token': self.token, 'ExpiresAt': 0},version)
+            infolog("Lease -- {} released with token {}",self.LambdaInfoTracing,self.key,self.token)
+        except ConflictError:
+            errorlog("Lease -- {} was taken over by another owner",self.key)
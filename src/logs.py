@@ -0,0 +1,128 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Longest rendering of a single message argument, e.g. a full describe response
+MAX_FIELD = int(os.environ.get('LogMaxFieldLength', 2048))
+# 'json' for one compact JSON object per line, 'text' for the plain message
+LOG_FORMAT = os.environ.get('LogFormat', 'json')
+# Per-level sampling rates, e.g. 'INFO=0.1': share of invocations emitting records of that level
+SAMPLE_RATES = {
+    level.strip().upper(): float(rate)
+    for level, _, rate in (entry.partition('=') for entry in os.environ.get('LogSampleRate', '').split(',')) if rate
+}
+
+# Keys of AWS responses that only add noise to logs
+REDACTED_KEYS = ('ResponseMetadata',)
+
+# Fields of the current invocation added to every record, and its sampling decisions
+fields = {}
+sampled = {}
+
+class LazyMessage(object):
+    """
+    log message formatted only when a handler actually emits the record
+    """
+
+    def __init__(self,template,args):
+        self.template = template
+        self.args = args
+
+    def __str__(self):
+        if not self.args:
+            return self.template
+        return self.template.format(*[shorten(arg) for arg in self.args])
+
+class JsonFormatter(logging.Formatter):
+    """
+    format records as compact JSON objects with the invocation fields
+    """
+
+    def format(self,record):
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + '.{:03d}Z'.format(int(record.msecs)),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'aws_request_id', None):
+            entry['aws_request_id'] = record.aws_request_id
+        entry.update(fields)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+def bind(**correlation):
+    """
+    start logging for a new invocation: set fields added to every record (e.g. correlation id,
+    instance id), draw the sampling decisions and install the JSON formatter on the root logger
+
+    :param correlation: fields identifying the invocation, None values are left out
+
+    """
+    fields.clear()
+    fields.update({key: value for key, value in correlation.items() if value is not None})
+    sampled.clear()
+    sampled.update({level: random.random() < rate for level, rate in SAMPLE_RATES.items()})
+    if LOG_FORMAT == 'json':
+        if not logger.handlers:
+            logger.addHandler(logging.StreamHandler())
+        for handler in logger.handlers:
+            if not isinstance(handler.formatter, JsonFormatter):
+                handler.setFormatter(JsonFormatter())
+
+def shorten(value):
+    """
+    render a message argument, dropping noisy keys of AWS responses and truncating it to MAX_FIELD characters
+
+    :param value: message argument
+
+    """
+    if isinstance(value, dict) and any(key in value for key in REDACTED_KEYS):
+        value = {key: item for key, item in value.items() if key not in REDACTED_KEYS}
+    text = str(value)
+    if len(text) > MAX_FIELD:
+        text = '{}...({} more characters)'.format(text[:MAX_FIELD], len(text) - MAX_FIELD)
+    return text
+
+def infolog(template,LambdaInfoTracing,*args):
+    """
+    log a tracing message, only formatted if tracing is enabled and the invocation is sampled for INFO
+
+    :param template: message with '{}' placeholders
+    :param args: placeholder values, rendered with shorten
+
+    """
+    if str(LambdaInfoTracing) == "true" and sampled.get('INFO', True):
+        logger.info('%s', LazyMessage(template,args))
+
+def errorlog(template,*args):
+    """
+    log an error message, unless the invocation is not sampled for ERROR
+
+    :param template: message with '{}' placeholders
+    :param args: placeholder values, rendered with shorten
+
+    """
+    if sampled.get('ERROR', True):
+        logger.error('%s', LazyMessage(template,args))
@@ -0,0 +1,134 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+# CloudWatch namespace of failover metrics
+NAMESPACE = os.environ.get('MetricsNamespace', 'VNF/Failover')
+# Dimension set of every metric, unless a histogram is given its own
+DIMENSIONS = ['AutoScalingGroupName', 'AvailabilityZone', 'VNFType']
+# Embedded Metric Format limit of values per metric in a single record
+MAX_VALUES = 100
+
+clock = time.monotonic
+
+class Histogram(object):
+    """
+    in-process histogram of metric values for one invocation, flushed once as a CloudWatch
+    Embedded Metric Format (EMF) record to stdout
+    """
+
+    def __init__(self,dimensions,prefix='',stream=None,names=None):
+        self.names = names or DIMENSIONS
+        self.dimensions = {key: str(dimensions.get(key) or 'unknown') for key in self.names}
+        self.prefix = prefix
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.values = collections.OrderedDict()
+        self.units = {}
+        self.properties = {}
+
+    def observe(self,name,value,unit='Milliseconds'):
+        """
+        add a value to a metric
+
+        :param name: metric name, prefixed with the histogram prefix
+        :param value: metric value
+        :param unit: CloudWatch unit of the metric
+
+        """
+        name = self.prefix + name
+        with self.lock:
+            self.values.setdefault(name, []).append(value)
+            self.units[name] = unit
+
+    def count(self,name,value=1):
+        """
+        add a count to a metric
+
+        :param name: metric name
+        :param value: number of occurrences
+
+        """
+        self.observe(name,value,'Count')
+
+    def timer(self,name):
+        """
+        context manager observing the elapsed milliseconds of its block
+
+        :param name: metric name
+
+        """
+        return Timer(self,name)
+
+    def set_property(self,key,value):
+        """
+        add a property to the record, searchable in CloudWatch Logs but not a dimension
+
+        :param key: property name
+        :param value: property value
+
+        """
+        with self.lock:
+            self.properties[key] = value
+
+    def flush(self):
+        """
+        write all values observed so far as a single EMF record and start over
+        """
+        with self.lock:
+            values, self.values = self.values, collections.OrderedDict()
+            properties = dict(self.properties)
+        if not values:
+            return
+        record = dict(properties)
+        record.update(self.dimensions)
+        record['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': NAMESPACE,
+                'Dimensions': [self.names],
+                'Metrics': [{'Name': name, 'Unit': self.units[name]} for name in values],
+            }],
+        }
+        for name, observed in values.items():
+            observed = [round(value, 3) for value in observed[:MAX_VALUES]]
+            record[name] = observed[0] if len(observed) == 1 else observed
+        stream = self.stream or sys.stdout
+        stream.write(json.dumps(record, separators=(',', ':')) + '\n')
+        stream.flush()
+
+class Timer(object):
+    """
+    context manager observing the elapsed milliseconds of its block into a histogram
+    """
+
+    def __init__(self,histogram,name):
+        self.histogram = histogram
+        self.name = name
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self,*exc_info):
+        self.histogram.observe(self.name,(clock() - self.start) * 1000)
+        return False
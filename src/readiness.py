@@ -0,0 +1,171 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from logs import infolog
+import os
+import socket
+import time
+import waiters
+
+
+# Readiness checks when none are configured: ENI attachment, plus the management (SSH) port coming back and
+# status checks if the VNF is rebooted, since a reboot does not reset EC2 status checks; the port is probed
+# ahead of status checks so that it is seen going down
+DEFAULT_CHECKS = 'interface_attached'
+REBOOT_CHECKS = 'interface_attached,restarted:22,instance_status'
+# Seconds after which a rebooted instance has gone down even if no probe saw it: EC2 hard reboots an
+# instance that has not shut down cleanly within four minutes
+REBOOT_GRACE = 300
+# Seconds a launched VNF has to become ready (from the reboot step) before its launch is abandoned
+TIMEOUT = 600
+# Seconds to wait for a TCP connection
+PROBE_TIMEOUT = float(os.environ.get('ReadinessProbeTimeout', 3))
+# Checks connecting to the VNF, which need the function to run in its VPC
+PROBES = ('tcp', 'restarted')
+
+# Wall clock of readiness deadlines, kept in the workflow journal across invocations
+clock = time.time
+# TCP connect of probes, replaceable to probe a simulated data plane
+connect = socket.create_connection
+
+def check_interface_attached(ec2_client,target,argument):
+    """
+    readiness check: VIP ENI attachment to the instance is in 'attached' state
+
+    :param ec2_client: EC2 client
+    :param target: dict with 'instance_id', 'interface_id' and 'address' of the VNF
+    :param argument: unused
+
+    """
+    response = ec2_client.describe_network_interfaces(NetworkInterfaceIds=[target['interface_id']])
+    attachment = response['NetworkInterfaces'][0].get('Attachment', {})
+    return attachment.get('InstanceId') == target['instance_id'] and attachment.get('Status') == 'attached'
+
+def check_instance_status(ec2_client,target,argument):
+    """
+    readiness check: instance is running and both EC2 instance and system status checks are 'ok'
+
+    :param ec2_client: EC2 client
+    :param target: dict with 'instance_id', 'interface_id' and 'address' of the VNF
+    :param argument: unused
+
+    """
+    response = ec2_client.describe_instance_status(InstanceIds=[target['instance_id']],IncludeAllInstances=True)
+    statuses = response['InstanceStatuses']
+    return bool(statuses) and statuses[0]['InstanceState']['Name'] == 'running' \
+        and statuses[0]['InstanceStatus']['Status'] == 'ok' \
+        and statuses[0]['SystemStatus']['Status'] == 'ok'
+
+def check_tcp(ec2_client,target,argument):
+    """
+    readiness check: VNF accepts TCP connections on a port
+
+    :param ec2_client: unused
+    :param target: dict with 'instance_id', 'interface_id' and 'address' of the VNF
+    :param argument: TCP port
+
+    """
+    try:
+        with connect((target['address'], int(argument)), timeout=PROBE_TIMEOUT):
+            return True
+    except OSError as e:
+        infolog("check_tcp -- no connection to {}:{}: {}",target['LambdaInfoTracing'],target['address'],argument,e)
+        return False
+
+def check_restarted(ec2_client,target,argument):
+    """
+    readiness check: VNF accepts TCP connections on a port again after its reboot, having refused them at
+    least once since (kept in the target as 'went_down' across the polls of a wait) or REBOOT_GRACE seconds
+    after the reboot
+
+    :param ec2_client: unused
+    :param target: dict with 'instance_id', 'interface_id', 'address' and 'rebooted' (time of the reboot) of the VNF
+    :param argument: TCP port
+
+    """
+    if not check_tcp(ec2_client,target,argument):
+        target['went_down'] = True
+        return False
+    return bool(target.get('went_down')) or clock() >= target['rebooted'] + REBOOT_GRACE
+
+# Readiness checks by name, each taking EC2 client, target and the argument after ':' in its specification,
+# e.g. 'tcp:22'; further checks can be plugged in here
+CHECKS = {
+    'interface_attached': check_interface_attached,
+    'instance_status': check_instance_status,
+    'tcp': check_tcp,
+    'restarted': check_restarted,
+}
+
+def parse_checks(specification):
+    """
+    parse a comma separated list of readiness checks, e.g. 'interface_attached,instance_status,tcp:22'
+
+    :param specification: list of check names, each optionally followed by ':' and an argument
+
+    """
+    checks = []
+    for entry in specification.split(','):
+        name, _, argument = entry.strip().partition(':')
+        if not name:
+            continue
+        if name not in CHECKS:
+            raise ValueError("Unknown readiness check: {}".format(name))
+        checks.append((name, argument))
+    return checks
+
+def probe_address(setting,vip,eipaddress):
+    """
+    obtain address probed by TCP checks
+
+    :param setting: 'vip' (or empty), 'eip' or an IPv4 address, e.g. a management address
+    :param vip: VIP address of the VNF
+    :param eipaddress: EIP address of the VNF
+
+    """
+    if setting in ('', 'vip'):
+        return vip
+    if setting == 'eip':
+        return eipaddress
+    return setting
+
+def wait_ready(ec2_client,target,checks,LambdaInfoTracing,timeout):
+    """
+    poll readiness checks, in order and stopping at the first failing one, until all pass or timeout expires;
+    returns True once ready
+
+    :param ec2_client: EC2 client
+    :param target: dict with 'instance_id', 'interface_id' and 'address' of the VNF
+    :param checks: list of (check name, argument) tuples
+    :param timeout: seconds to wait at most
+
+    """
+    # Same target across polls, so that checks can keep what they observed
+    target = dict(target, LambdaInfoTracing=LambdaInfoTracing)
+    failing = []
+
+    def probe():
+        del failing[:]
+        for name, argument in checks:
+            if not CHECKS[name](ec2_client,target,argument):
+                failing.append(name)
+                return False
+        return True
+
+    if waiters.wait_until('vnf_ready',probe,LambdaInfoTracing,timeout):
+        return True
+    infolog("wait_ready -- instance {} failing readiness check: {}",LambdaInfoTracing,target['instance_id'],failing)
+    return False
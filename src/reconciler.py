@@ -0,0 +1,268 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import concurrent.futures
+import logs
+from logs import errorlog, infolog
+import os
+import time
+import botocore
+import awsclients
+import lease
+import metrics
+import registry
+import snapshot
+import statestore
+import vippool
+import viprelease
+import waiters
+
+asg_client = awsclients.LazyClient('autoscaling')
+ec2_client = awsclients.LazyClient('ec2')
+
+# Seconds a VIP subnet or ENI must have been seen orphaned, over consecutive runs, before it is released
+GRACE_PERIOD = float(os.environ.get('OrphanGracePeriod', 900))
+# Name tag of the VIP subnets and description of the VIP ENIs created by the ENI lifecycle function
+SUBNET_NAME = 'VIP Subnet'
+INTERFACE_DESCRIPTION = 'VIP ENI'
+# Auto Scaling Groups described per call at most
+MAX_GROUPS = 50
+# Dimension set of reconciler metrics, recorded per VPC with the Auto Scaling Groups of its VNFs
+DIMENSIONS = ['AutoScalingGroupName', 'VpcId']
+
+# Wall clock of first sightings, kept in the state store across runs
+clock = time.time
+
+# State store keeping first sightings of orphans across runs, created once per container
+state_store = None
+
+def lambda_handler(event, context):
+    """
+    release VIP subnets and ENIs, with their EIP and Route Table associations, left behind by lifecycle actions
+    that failed partway or timed out, once orphaned for GRACE_PERIOD; returns the report of the run
+
+    Without releasing anything with 'DryRun' set in the event, or OrphanReconcilerDryRun set to 'true'.
+    """
+    logs.bind(CorrelationId=event.get('id'))
+    dry_run = str(event.get('DryRun', os.environ.get('OrphanReconcilerDryRun', 'false'))).lower() == "true"
+    vpcs = {}
+    for asg_name, config in reconciled_groups().items():
+        if config.get('VPCId'):
+            vpcs.setdefault(config['VPCId'], {})[asg_name] = config
+    live = live_instances([asg_name for configs in vpcs.values() for asg_name in configs])
+    if live is None:
+        # Without all live instances, attached VIP ENIs cannot be told apart from orphans
+        errorlog("Orphan reconciliation skipped, Auto Scaling Groups could not be described")
+        return None
+    if not vpcs:
+        return {'DryRun': dry_run, 'VPCs': {}}
+    reconcilers = [Reconciler(vpc_id,configs,live,dry_run) for vpc_id, configs in vpcs.items()]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(reconcilers)) as executor:
+        reports = list(executor.map(lambda reconciler: reconciler.run(), reconcilers))
+    return {'DryRun': dry_run, 'VPCs': dict(zip(vpcs, reports))}
+
+def reconciled_groups():
+    """
+    obtain VNF config of each Auto Scaling Group: all registered VNFs, or the single one of the stack
+    """
+    source = os.environ.get('VNFRegistry')
+    if not source:
+        return {os.environ['AutoScalingGroupName']: registry.env_config()}
+    return registry.get_index(source)
+
+def live_instances(asg_names):
+    """
+    obtain ids of all instances of Auto Scaling Groups, in any lifecycle state, or None if not all could be described
+
+    :param asg_names: Auto Scaling Group names
+
+    """
+    instances = set()
+    try:
+        paginator = asg_client.get_paginator('describe_auto_scaling_groups')
+        for start in range(0, len(asg_names), MAX_GROUPS):
+            for page in paginator.paginate(AutoScalingGroupNames=asg_names[start:start + MAX_GROUPS]):
+                for group in page['AutoScalingGroups']:
+                    instances.update(instance['InstanceId'] for instance in group.get('Instances', []))
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error describing Auto Scaling Groups: {}",e.response['Error'])
+        return None
+    return instances
+
+class Reconciler(object):
+    """
+    orphan reconciler of the VIP subnets and ENIs in one VPC, joined against the VNFs configured in it and
+    the live instances of their Auto Scaling Groups
+    """
+
+    def __init__(self,vpc_id,configs,live,dry_run):
+        self.vpc_id = vpc_id
+        self.configs = configs
+        self.live = live
+        self.dry_run = dry_run
+        self.LambdaInfoTracing = "true" if any(str(config.get('LambdaInfoTracing','false')) == "true" for config in configs.values()) else "false"
+        self.key = 'orphans-' + vpc_id
+        self.metrics = metrics.Histogram({'AutoScalingGroupName': ','.join(sorted(configs)), 'VpcId': vpc_id},prefix='Reconcile.',names=DIMENSIONS)
+        self.metrics.set_property('DryRun',dry_run)
+
+    def run(self):
+        """
+        discover VIP subnets and ENIs, track orphans and release those orphaned for GRACE_PERIOD; returns the report
+        """
+        report = {'Orphans': {}, 'Released': [], 'Remaining': []}
+        try:
+            with self.metrics.timer('Duration'):
+                subnets, interfaces = self.discover()
+                self.metrics.count('Subnets',len(subnets))
+                self.metrics.count('Interfaces',len(interfaces))
+                candidates = self.candidates(subnets,interfaces)
+                self.metrics.count('Candidates',len(candidates))
+                ages = self.track(candidates)
+                report['Orphans'] = {resource_id: round(age) for resource_id, age in ages.items()}
+                expired = [resource_id for resource_id, age in ages.items() if age >= GRACE_PERIOD]
+                self.metrics.count('Orphaned',len(expired))
+                if expired and not self.dry_run:
+                    report['Remaining'] = self.release([interfaces[resource_id] for resource_id in expired if resource_id in interfaces],
+                                                       [resource_id for resource_id in expired if resource_id in subnets])
+                    report['Released'] = [resource_id for resource_id in expired if resource_id not in report['Remaining']]
+                self.metrics.count('Released',len(report['Released']))
+        except botocore.exceptions.ClientError as e:
+            errorlog("Error reconciling VIP subnets and interfaces of {}: {}",self.vpc_id,e.response['Error'])
+        finally:
+            self.metrics.set_property('Orphans',report['Orphans'])
+            self.metrics.flush()
+        infolog("Reconciler -- {} report: {}",self.LambdaInfoTracing,self.vpc_id,report)
+        return report
+
+    def discover(self):
+        """
+        describe the VIP subnets and VIP ENIs of the VPC concurrently, following pagination; returns maps of id to record
+        """
+        def describe(operation,key,record,*filters):
+            records = {}
+            paginator = ec2_client.get_paginator(operation)
+            for page in paginator.paginate(Filters=[{'Name': 'vpc-id', 'Values': [self.vpc_id]}] + list(filters)):
+                for description in page[key]:
+                    # Hot spare VIP subnets and ENIs are unattached on purpose, and released with the stack
+                    if not any(tag['Key'] == vippool.POOL_TAG for tag in description.get('Tags', description.get('TagSet', []))):
+                        item = record(description)
+                        records[item[0]] = item
+            return records
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            subnets = executor.submit(describe,'describe_subnets','Subnets',snapshot.subnet_record,{'Name': 'tag:Name', 'Values': [SUBNET_NAME]})
+            interfaces = executor.submit(describe,'describe_network_interfaces','NetworkInterfaces',snapshot.interface_record,{'Name': 'description', 'Values': [INTERFACE_DESCRIPTION]})
+            return subnets.result(), interfaces.result()
+
+    def candidates(self,subnets,interfaces):
+        """
+        obtain ids of the VIP subnets and ENIs of configured VNFs that no live instance uses
+
+        An ENI is orphaned unless attached to a live instance, or retained for the next instance in VIPRetainMode.
+        A subnet is orphaned unless one of its ENIs is not. Resources of a VIP with a lifecycle action in flight are
+        left alone.
+
+        :param subnets: map of subnet id to Subnet record
+        :param interfaces: map of network interface id to Interface record
+
+        """
+        vips = {}
+        for config in self.configs.values():
+            addresses = [str(config.get('VIPAddress','')).split('/')[0]] + [address for address, allocation in registry.secondary_vips(config.get('SecondaryVIPs',''))]
+            for address in addresses:
+                vips[address] = config
+        cidrs = {str(config.get('VIPCIDRBlock')): config for config in self.configs.values()}
+        busy = {cidr for cidr in cidrs if self.in_flight(cidr)}
+        subnet_cidrs = {subnet_id: subnet.CidrBlock for subnet_id, subnet in subnets.items()}
+
+        candidates = set()
+        kept_subnets = set()
+        for interface_id, interface in interfaces.items():
+            owners = [vips[address] for address in interface.PrivateIpAddresses if address in vips]
+            if not owners or subnet_cidrs.get(interface.SubnetId) in busy:
+                kept_subnets.add(interface.SubnetId)
+                continue
+            if interface.Attachment and interface.Attachment.InstanceId in self.live:
+                kept_subnets.add(interface.SubnetId)
+            elif not interface.Attachment and any(str(config.get('VIPRetainMode','false')) == "true" for config in owners):
+                kept_subnets.add(interface.SubnetId)
+            else:
+                candidates.add(interface_id)
+        for subnet_id, subnet in subnets.items():
+            if subnet.CidrBlock in cidrs and subnet.CidrBlock not in busy and subnet_id not in kept_subnets:
+                candidates.add(subnet_id)
+        return candidates
+
+    def in_flight(self,cidr):
+        """
+        check whether a lifecycle action holds the lease of a VIP CIDR range, i.e. is creating or tearing down its resources
+
+        :param cidr: VIP CIDR IPv4 range
+
+        """
+        record = store().get("lease-vip-{}-{}".format(self.vpc_id,cidr))[0]
+        return record is not None and record['Owner'] is not None and record['ExpiresAt'] > lease.clock()
+
+    def track(self,candidates):
+        """
+        record first sightings of orphan candidates, dropping those no longer orphaned; returns map of id to
+        seconds orphaned, empty if another run is tracking them concurrently
+
+        :param candidates: ids of orphan candidates
+
+        """
+        sightings, version = store().get(self.key)
+        sightings = sightings or {}
+        now = clock()
+        updated = {resource_id: sightings.get(resource_id, now) for resource_id in candidates}
+        if updated != sightings:
+            try:
+                store().put(self.key,updated,version)
+            except statestore.ConflictError:
+                errorlog("Reconciler -- orphans of {} tracked concurrently",self.vpc_id)
+                return {}
+        return {resource_id: now - seen for resource_id, seen in updated.items()}
+
+    def release(self,interfaces,subnet_ids):
+        """
+        release orphaned ENIs and subnets in bulk, repeating the release pass as detachments complete; returns ids left
+
+        :param interfaces: Interface records of orphaned ENIs
+        :param subnet_ids: ids of orphaned subnets
+
+        """
+        remaining = [interface.NetworkInterfaceId for interface in interfaces] + list(subnet_ids)
+
+        def probe():
+            pending = [interface.NetworkInterfaceId for interface in interfaces if interface.NetworkInterfaceId in remaining]
+            current = []
+            if pending:
+                response = ec2_client.describe_network_interfaces(Filters=[{'Name': 'network-interface-id', 'Values': pending}])
+                current = [snapshot.interface_record(interface) for interface in response['NetworkInterfaces']]
+            remaining[:] = viprelease.release(ec2_client,current,[subnet_id for subnet_id in subnet_ids if subnet_id in remaining],self.LambdaInfoTracing)
+            return not remaining
+
+        waiters.wait_until('orphans_released',probe,self.LambdaInfoTracing)
+        return remaining
+
+def store():
+    """
+    obtain state store for orphan sightings and VIP leases, created once per container
+    """
+    global state_store
+    if state_store is None:
+        state_store = statestore.get_store()
+    return state_store
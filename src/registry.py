@@ -0,0 +1,127 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+from logs import errorlog, infolog
+import os
+import time
+import statestore
+
+# Per-deployment settings that can be set per VNF Auto Scaling Group
+CONFIG_KEYS = [
+    'SecGroupId', 'VPCId', 'WANRouteTable', 'VIPCIDRBlock', 'VIPAddress', 'EIPAddress', 'EIPAllocationId',
+    'LambdaInfoTracing', 'InstanceRequiresReboot', 'SubnetCreationAttempts', 'VIPPoolMode',
+    'VIPRetainMode', 'VIPFailoverMode', 'VIPRouteTables', 'VIPSupernetCIDRBlock', 'AvailabilityZones',
+    'SecondaryVIPs', 'VNFType', 'ReadinessChecks', 'ReadinessTimeout', 'ReadinessProbeAddress', 'WarmStandbyMode',
+    'HealthChecks', 'HealthCheckThreshold', 'HealthCheckAddress', 'DesiredCapacity',
+]
+
+# Key of the registry document when kept in a state store
+REGISTRY_KEY = 'vnf-registry'
+
+# Warm-container cache of the registry index: ASG name -> VNF config
+clock = time.monotonic
+cache = {'Expires': 0, 'Source': None, 'Index': None}
+REGISTRY_TTL = float(os.environ.get('VNFRegistryTTL', 300))
+
+def resolve(asg_name):
+    """
+    obtain VNF config for an Auto Scaling Group, or None if ASG is not registered
+
+    Without a VNFRegistry environment variable, the single VNF config is read from environment variables.
+
+    :param asg_name: Auto Scaling Group name from lifecycle event
+
+    """
+    source = os.environ.get('VNFRegistry')
+    if not source:
+        return env_config()
+    return get_index(source).get(asg_name)
+
+def secondary_vips(value):
+    """
+    parse secondary VIP list into (private IPv4 address, EIP allocation id or None) tuples
+
+    :param value: comma separated '<address>[/32][=<EIP allocation id>]' entries, or a list of them
+
+    """
+    if isinstance(value, str):
+        value = value.split(',')
+    vips = []
+    for entry in value or []:
+        address, _, allocation = str(entry).strip().partition('=')
+        if address:
+            vips.append((address.split('/')[0], allocation or None))
+    return vips
+
+def env_config():
+    """
+    obtain VNF config from environment variables
+    """
+    return {key: os.environ[key] for key in CONFIG_KEYS if key in os.environ}
+
+def get_index(source):
+    """
+    obtain registry index from cache, reloading it once TTL has expired or source has changed
+
+    :param source: registry location
+
+    """
+    if cache['Index'] is None or cache['Source'] != source or cache['Expires'] <= clock():
+        cache['Index'] = build_index(load_document(source))
+        cache['Source'] = source
+        cache['Expires'] = clock() + REGISTRY_TTL
+        infolog("get_index -- loaded {} VNFs from registry {}",os.environ.get('LambdaInfoTracing'),len(cache['Index']),source)
+    return cache['Index']
+
+def load_document(source):
+    """
+    load registry document from a JSON file, or from a state store
+
+    :param source: path (or file:// URI) to a .json document, or a state store URI
+                   ('dynamodb://<table>', 'sqlite://<path>') keeping the document under REGISTRY_KEY
+
+    """
+    path = source[len('file://'):] if source.startswith('file://') else source
+    if path.endswith('.json'):
+        with open(path) as f:
+            return json.load(f)
+    document, version = statestore.get_store(source).get(REGISTRY_KEY)
+    return document or {}
+
+def build_index(document):
+    """
+    build index of ASG name to VNF config, each VNF entry overriding the 'Defaults' entry
+    and environment variables; VNFs in hot spare mode without AvailabilityZones are left out
+
+    :param document: registry document as {'Defaults': {...}, 'VNFs': {<ASG name>: {...}}}
+
+    """
+    defaults = env_config()
+    defaults.update(document.get('Defaults', {}))
+    index = {}
+    for asg_name, vnf in document.get('VNFs', {}).items():
+        config = dict(defaults)
+        config.update(vnf)
+        for key in ('AvailabilityZones', 'SecondaryVIPs'):
+            if isinstance(config.get(key), list):
+                config[key] = ','.join(config[key])
+        # VIP pool subnets are carved per AZ in the order of AvailabilityZones, which must be known up front
+        if str(config.get('VIPPoolMode','false')) == "true" and not str(config.get('AvailabilityZones','')).strip(','):
+            errorlog("VNF {} in hot spare mode has no AvailabilityZones, ignored",asg_name)
+            continue
+        index[asg_name] = {key: str(value) for key, value in config.items()}
+    return index
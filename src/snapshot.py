@@ -0,0 +1,216 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import collections
+from logs import infolog
+import threading
+
+
+# Records handed to lifecycle steps, reduced from EC2 descriptions
+Subnet = collections.namedtuple('Subnet', ['SubnetId', 'VpcId', 'CidrBlock', 'AvailabilityZone', 'State'])
+Attachment = collections.namedtuple('Attachment', ['AttachmentId', 'InstanceId', 'DeviceIndex', 'Status', 'DeleteOnTermination'])
+Association = collections.namedtuple('Association', ['AssociationId', 'AllocationId', 'PublicIp', 'PrivateIpAddress'])
+Interface = collections.namedtuple('Interface', ['NetworkInterfaceId', 'SubnetId', 'VpcId', 'AvailabilityZone', 'Status', 'PrivateIpAddresses', 'Attachment', 'Associations', 'SourceDestCheck'])
+RouteTableAssociation = collections.namedtuple('RouteTableAssociation', ['RouteTableAssociationId', 'RouteTableId', 'SubnetId'])
+
+class Snapshot(object):
+    """
+    request-scoped cache of subnet, ENI (with attachment and EIP associations) and route table descriptions,
+    so that each resource is described once per invocation; entries are dropped when a mutating call touches them
+
+    Lookups raise botocore ClientError like the underlying describe calls, and are safe to use from concurrent steps.
+    """
+
+    def __init__(self,ec2_client,LambdaInfoTracing):
+        self.ec2_client = ec2_client
+        self.LambdaInfoTracing = LambdaInfoTracing
+        self.lock = threading.Lock()
+        self.subnets = {}
+        self.interfaces = {}
+        self.addresses = {}
+        # Route table association index: subnet id -> RouteTableAssociation or None
+        self.route_associations = {}
+        # Number of describe calls issued, i.e. cache misses
+        self.calls = 0
+
+    def subnet(self,vpc_id,cidr):
+        """
+        obtain subnet record from VPC based on IPv4 CIDR range, or None
+
+        :param vpc_id: VPC id
+        :param cidr: CIDR IPv4 range from subnet
+
+        """
+        key = (vpc_id, cidr)
+        with self.lock:
+            if key in self.subnets:
+                return self.subnets[key]
+        response = self.describe('describe_subnets',Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]},{'Name': 'cidr-block', 'Values': [cidr]}])
+        record = subnet_record(response['Subnets'][0]) if response['Subnets'] else None
+        with self.lock:
+            self.subnets[key] = record
+        return record
+
+    def interface(self,network_interface_id):
+        """
+        obtain interface record by id, or None if it does not exist
+
+        :param network_interface_id: network interface id
+
+        """
+        with self.lock:
+            if network_interface_id in self.interfaces:
+                return self.interfaces[network_interface_id]
+        response = self.describe('describe_network_interfaces',Filters=[{'Name': 'network-interface-id', 'Values': [network_interface_id]}])
+        record = self.keep(response['NetworkInterfaces'])[0] if response['NetworkInterfaces'] else None
+        if record is None:
+            with self.lock:
+                self.interfaces[network_interface_id] = None
+        return record
+
+    def interface_by_address(self,vip,subnet_id=None,vpc_id=None):
+        """
+        obtain interface record from subnet (or from VPC, without subnet id) based on specific IPv4 address, or None
+
+        :param vip: (virtual) IPv4 address that is mapped to interface
+        :param subnet_id: subnet id within VPC
+        :param vpc_id: VPC id, to look interface up without knowing its subnet
+
+        """
+        scope = ('subnet-id', subnet_id) if subnet_id else ('vpc-id', vpc_id)
+        key = scope + (vip,)
+        with self.lock:
+            if key in self.addresses:
+                network_interface_id = self.addresses[key]
+                if network_interface_id is None or network_interface_id in self.interfaces:
+                    return self.interfaces.get(network_interface_id)
+        response = self.describe('describe_network_interfaces',Filters=[{'Name': scope[0], 'Values': [scope[1]]},{'Name': 'private-ip-address', 'Values': [vip]}])
+        records = self.keep(response['NetworkInterfaces'])
+        with self.lock:
+            self.addresses[key] = records[0].NetworkInterfaceId if records else None
+        return records[0] if records else None
+
+    def route_table_association(self,subnet_id):
+        """
+        obtain the route table association record of a subnet, or None if it has no explicit association
+
+        :param subnet_id: subnet id
+
+        """
+        with self.lock:
+            if subnet_id in self.route_associations:
+                return self.route_associations[subnet_id]
+        response = self.describe('describe_route_tables',Filters=[{'Name': 'association.subnet-id', 'Values': [subnet_id]}])
+        index = {subnet_id: None}
+        for table in response['RouteTables']:
+            for association in table.get('Associations', []):
+                if association.get('SubnetId'):
+                    index[association['SubnetId']] = RouteTableAssociation(association['RouteTableAssociationId'], table['RouteTableId'], association['SubnetId'])
+        with self.lock:
+            self.route_associations.update(index)
+        return index[subnet_id]
+
+    def update_interface(self,network_interface_id,**fields):
+        """
+        update cached interface record after a mutating call with a known outcome, e.g. Attachment=None once detached
+
+        :param network_interface_id: network interface id
+        :param fields: record fields to replace
+
+        """
+        with self.lock:
+            if self.interfaces.get(network_interface_id) is not None:
+                self.interfaces[network_interface_id] = self.interfaces[network_interface_id]._replace(**fields)
+
+    def invalidate(self,resource_id):
+        """
+        drop cached entries for a subnet, interface or route table touched by a mutating call
+
+        :param resource_id: subnet, network interface or route table id
+
+        """
+        with self.lock:
+            self.interfaces.pop(resource_id, None)
+            self.route_associations.pop(resource_id, None)
+            for key in [key for key, record in self.subnets.items() if record is None or record.SubnetId == resource_id]:
+                del self.subnets[key]
+            for key in [key for key, network_interface_id in self.addresses.items() if network_interface_id in (None, resource_id) or resource_id in key]:
+                del self.addresses[key]
+            for subnet_id in [subnet_id for subnet_id, record in self.route_associations.items() if record is not None and resource_id in record]:
+                del self.route_associations[subnet_id]
+
+    def keep(self,descriptions):
+        """
+        cache interface records from describe_network_interfaces elements and return them
+
+        :param descriptions: NetworkInterfaces elements
+
+        """
+        records = [interface_record(description) for description in descriptions]
+        with self.lock:
+            for record in records:
+                self.interfaces[record.NetworkInterfaceId] = record
+        return records
+
+    def describe(self,operation,**kwargs):
+        """
+        issue a describe call, counting it
+
+        :param operation: EC2 client method name
+        :param kwargs: call parameters
+
+        """
+        with self.lock:
+            self.calls += 1
+        response = getattr(self.ec2_client, operation)(**kwargs)
+        infolog("Snapshot -- EC2 {} response: {}",self.LambdaInfoTracing,operation,response)
+        return response
+
+def subnet_record(subnet):
+    """
+    reduce a subnet description to a Subnet record
+
+    :param subnet: Subnets element from describe_subnets response
+
+    """
+    return Subnet(subnet['SubnetId'], subnet.get('VpcId'), subnet.get('CidrBlock'), subnet.get('AvailabilityZone'), subnet.get('State'))
+
+def interface_record(interface):
+    """
+    reduce a network interface description to an Interface record, with its attachment, EIP associations
+    and source/dest check
+
+    :param interface: NetworkInterfaces element from describe_network_interfaces response
+
+    """
+    attachment = interface.get('Attachment')
+    if attachment:
+        attachment = Attachment(attachment['AttachmentId'], attachment.get('InstanceId'), attachment.get('DeviceIndex'), attachment.get('Status'), attachment.get('DeleteOnTermination'))
+    addresses = interface.get('PrivateIpAddresses', [])
+    return Interface(
+        interface['NetworkInterfaceId'],
+        interface.get('SubnetId'),
+        interface.get('VpcId'),
+        interface.get('AvailabilityZone'),
+        interface.get('Status'),
+        tuple(address['PrivateIpAddress'] for address in addresses),
+        attachment or None,
+        tuple(
+            Association(address['Association']['AssociationId'], address['Association'].get('AllocationId'), address['Association'].get('PublicIp'), address['PrivateIpAddress'])
+            for address in addresses if 'AssociationId' in address.get('Association', {})
+        ),
+        interface.get('SourceDestCheck'),
+    )
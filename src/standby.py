@@ -0,0 +1,121 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from logs import infolog
+from statestore import ConflictError
+
+
+# Attempts of a membership update racing with other lifecycle actions of the same VNF
+UPDATE_ATTEMPTS = 5
+
+class Controller(object):
+    """
+    warm-standby controller: membership of the active VNF and its already booted standby VNFs, kept in a
+    state store, deciding which VNF holds the EIP and the VIP routes
+
+    Each member is a dict with its 'InstanceId', 'AZ', 'InterfaceId' (its own pre-attached ENI) and 'Addresses',
+    the (private address, EIP allocation id) pairs its EIPs are associated with while active. A member made
+    active stays marked as not 'Activated' until the EIP and VIP routes have been moved to it, so that a retried
+    lifecycle action moves them again.
+    """
+
+    def __init__(self,store,key,LambdaInfoTracing):
+        self.store = store
+        self.key = 'standby-' + key
+        self.LambdaInfoTracing = LambdaInfoTracing
+
+    def members(self):
+        """
+        obtain active member (or None) and list of standby members
+        """
+        record = self.store.get(self.key)[0] or {}
+        return record.get('Active'), record.get('Standby', [])
+
+    def update(self,change):
+        """
+        apply a change to the membership record, retrying on concurrent updates; returns the result of the change
+
+        :param change: function taking the record, modifying it in place and returning a result
+
+        """
+        for attempt in range(UPDATE_ATTEMPTS):
+            record, version = self.store.get(self.key)
+            record = record or {'Active': None, 'Standby': []}
+            result = change(record)
+            try:
+                self.store.put(self.key,record,version)
+                return result
+            except ConflictError:
+                infolog("Controller -- {} updated concurrently, retrying",self.LambdaInfoTracing,self.key)
+        raise ConflictError(self.key)
+
+    def join(self,member,alive):
+        """
+        register a ready VNF, as the active one if there is no live active VNF, as a standby otherwise;
+        returns 'active' if the EIP and VIP routes are to be moved to it, 'standby' otherwise
+
+        :param member: member dict of the VNF
+        :param alive: function telling whether an instance id is still running
+
+        """
+        def change(record):
+            active = record['Active']
+            record['Standby'] = [standby for standby in record['Standby'] if standby['InstanceId'] != member['InstanceId']]
+            if active is not None and active['InstanceId'] == member['InstanceId']:
+                return 'standby' if active.get('Activated') else 'active'
+            if active is None or not alive(active['InstanceId']):
+                record['Active'] = dict(member, Activated=False)
+                return 'active'
+            record['Standby'].append(member)
+            return 'standby'
+        role = self.update(change)
+        infolog("Controller -- {} joined {} as {}",self.LambdaInfoTracing,member['InstanceId'],self.key,role)
+        return role
+
+    def leave(self,instance_id,alive):
+        """
+        remove a terminating VNF, promoting the first live standby if it was the active one; returns the active
+        member if the EIP and VIP routes are still to be moved to it, None otherwise
+
+        :param instance_id: instance id of the terminating VNF
+        :param alive: function telling whether an instance id is still running
+
+        """
+        def change(record):
+            record['Standby'] = [standby for standby in record['Standby'] if standby['InstanceId'] != instance_id]
+            if record['Active'] is not None and record['Active']['InstanceId'] == instance_id:
+                record['Active'] = None
+                while record['Standby'] and record['Active'] is None:
+                    standby = record['Standby'].pop(0)
+                    if alive(standby['InstanceId']):
+                        record['Active'] = dict(standby, Activated=False)
+            active = record['Active']
+            return active if active is not None and not active.get('Activated') else None
+        promoted = self.update(change)
+        infolog("Controller -- {} left {}, promoted: {}",self.LambdaInfoTracing,instance_id,self.key,promoted)
+        return promoted
+
+    def activated(self,instance_id):
+        """
+        record that the EIP and VIP routes have been moved to the active VNF
+
+        :param instance_id: instance id of the active VNF
+
+        """
+        def change(record):
+            if record['Active'] is not None and record['Active']['InstanceId'] == instance_id:
+                record['Active']['Activated'] = True
+        self.update(change)
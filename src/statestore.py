@@ -0,0 +1,185 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import botocore
+import awsclients
+
+# Items expire after this amount of seconds
+ITEM_TTL = 86400
+
+class ConflictError(Exception):
+    """
+    raised when an item was modified by someone else since it was read
+    """
+    pass
+
+class FileStateStore(object):
+    """
+    versioned key-value store keeping one JSON file per key in a local directory
+    """
+
+    def __init__(self,path):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def filename(self,key):
+        return os.path.join(self.path, key.replace('/', '_') + '.json')
+
+    def get(self,key):
+        """
+        obtain item and its version, or (None, 0) if it does not exist
+
+        :param key: item key
+
+        """
+        try:
+            with open(self.filename(key)) as f:
+                record = json.load(f)
+        except (IOError, ValueError):
+            return None, 0
+        if record['ExpiresAt'] <= time.time():
+            return None, 0
+        return record['Item'], record['Version']
+
+    def put(self,key,item,version):
+        """
+        write item if its stored version still matches, returning the new version
+
+        :param key: item key
+        :param item: JSON serialisable item
+        :param version: version previously read (0 for a new item)
+
+        """
+        with self.lock:
+            if self.get(key)[1] != version:
+                raise ConflictError(key)
+            tmpname = self.filename(key) + '.tmp'
+            with open(tmpname, 'w') as f:
+                json.dump({'Item': item, 'Version': version + 1, 'ExpiresAt': time.time() + ITEM_TTL}, f)
+            os.replace(tmpname, self.filename(key))
+        return version + 1
+
+    def delete(self,key):
+        """
+        delete item if it exists
+
+        :param key: item key
+
+        """
+        with self.lock:
+            try:
+                os.remove(self.filename(key))
+            except OSError:
+                pass
+
+class SQLiteStateStore(object):
+    """
+    versioned key-value store in a local SQLite database
+    """
+
+    def __init__(self,path):
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        self.connection.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, item TEXT, version INTEGER, expires REAL)')
+
+    def get(self,key):
+        with self.lock:
+            row = self.connection.execute('SELECT item, version FROM state WHERE key = ? AND expires > ?', (key, time.time())).fetchone()
+        if not row:
+            return None, 0
+        return json.loads(row[0]), row[1]
+
+    def put(self,key,item,version):
+        with self.lock:
+            now = time.time()
+            if version == 0:
+                self.connection.execute('DELETE FROM state WHERE key = ? AND expires <= ?', (key, now))
+                cursor = self.connection.execute('INSERT OR IGNORE INTO state VALUES (?, ?, 1, ?)', (key, json.dumps(item), now + ITEM_TTL))
+            else:
+                cursor = self.connection.execute('UPDATE state SET item = ?, version = ?, expires = ? WHERE key = ? AND version = ?',
+                    (json.dumps(item), version + 1, now + ITEM_TTL, key, version))
+        if cursor.rowcount != 1:
+            raise ConflictError(key)
+        return version + 1
+
+    def delete(self,key):
+        with self.lock:
+            self.connection.execute('DELETE FROM state WHERE key = ?', (key,))
+
+class DynamoDBStateStore(object):
+    """
+    versioned key-value store in a DynamoDB table with 'Key' as partition key and 'ExpiresAt' as TTL attribute
+    """
+
+    def __init__(self,table_name,client=None):
+        self.table_name = table_name
+        self.client = client or awsclients.LazyClient('dynamodb')
+
+    def get(self,key):
+        response = self.client.get_item(TableName=self.table_name, Key={'Key': {'S': key}}, ConsistentRead=True)
+        record = response.get('Item')
+        if not record or int(record['ExpiresAt']['N']) <= time.time():
+            return None, 0
+        return json.loads(record['Item']['S']), int(record['Version']['N'])
+
+    def put(self,key,item,version):
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    'Key': {'S': key},
+                    'Item': {'S': json.dumps(item)},
+                    'Version': {'N': str(version + 1)},
+                    'ExpiresAt': {'N': str(int(time.time() + ITEM_TTL))},
+                },
+                ConditionExpression='attribute_not_exists(#k) OR #v = :v OR #e <= :now',
+                ExpressionAttributeNames={'#k': 'Key', '#v': 'Version', '#e': 'ExpiresAt'},
+                ExpressionAttributeValues={':v': {'N': str(version)}, ':now': {'N': str(int(time.time()))}},
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                raise ConflictError(key)
+            raise
+        return version + 1
+
+    def delete(self,key):
+        self.client.delete_item(TableName=self.table_name, Key={'Key': {'S': key}})
+
+def get_store(uri=None):
+    """
+    create a state store from its URI, defaulting to StateStore environment variable; there is no fallback,
+    since a store local to a container is not shared with concurrent invocations
+
+    :param uri: 'dynamodb://<table>', 'sqlite://<path>' or 'file://<directory>' (the latter two for local runs)
+
+    """
+    uri = uri or os.environ.get('StateStore')
+    if not uri:
+        raise ValueError("No state store configured: set StateStore, e.g. to 'dynamodb://<table>'")
+    scheme, _, location = uri.partition('://')
+    if scheme == 'dynamodb':
+        return DynamoDBStateStore(location)
+    if scheme == 'sqlite':
+        return SQLiteStateStore(location)
+    if scheme == 'file':
+        return FileStateStore(location)
+    raise ValueError("Unsupported state store: {}".format(uri))
@@ -0,0 +1,64 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import concurrent.futures
+
+# Maximum number of tasks running at the same time
+MAX_WORKERS = 8
+
+def run_graph(tasks,done=None,max_workers=MAX_WORKERS):
+    """
+    run tasks as soon as their dependencies have completed, overlapping independent ones in a thread pool,
+    and return a dict of task name to result
+
+    If a task raises, no further task is started and the first exception is raised once running tasks end.
+
+    :param tasks: list of (task name, task function, list of dependency names) tuples, where each
+                  task function takes the dict of results of completed tasks
+    :param done: optional dict of results of tasks already completed, which are not run again
+
+    """
+    results = dict(done or {})
+    pending = {name: (function, list(dependencies)) for name, function, dependencies in tasks if name not in results}
+    for name, (function, dependencies) in pending.items():
+        for dependency in dependencies:
+            if dependency not in pending and dependency not in results:
+                raise ValueError("Task {} depends on unknown task {}".format(name,dependency))
+
+    error = None
+    running = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            if error is None:
+                ready = [name for name, (function, dependencies) in pending.items() if all(dependency in results for dependency in dependencies)]
+                for name in ready:
+                    function = pending.pop(name)[0]
+                    running[executor.submit(function, dict(results))] = name
+            if not running:
+                if error is None and pending:
+                    raise ValueError("Dependency cycle between tasks: {}".format(sorted(pending)))
+                break
+            finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+    if error is not None:
+        raise error
+    return results
@@ -14,58 +14,89 @@
 #  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 #  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-import boto3
-import json
-import logging
-import time
+import concurrent.futures
+import logs
+from logs import errorlog, infolog
 import botocore
 import os
-from datetime import datetime
+import awsclients
+import registry
+import waiters
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-ec2_client = boto3.client('ec2')
-asg_client = boto3.client('autoscaling')
-ec2 = boto3.resource('ec2')
+asg_client = awsclients.LazyClient('autoscaling')
+
+# Lifecycle transitions needing a hook before the first instance is launched
+HOOK_TRANSITIONS = ('autoscaling:EC2_INSTANCE_LAUNCHING', 'autoscaling:EC2_INSTANCE_TERMINATING')
 
 def lambda_handler(event, context):
-    AutoScalingGroupName = os.environ['AutoScalingGroupName']
+    AutoScalingGroupNames = [name.strip() for name in str(os.environ['AutoScalingGroupName']).split(',') if name.strip()]
     ASGUpdateHealthCheckGraceTime = os.environ['ASGUpdateHealthCheckGraceTime']
     LambdaInfoTracing = str(os.environ['LambdaInfoTracing'])
+    # Correlate all log records of this event
+    logs.bind(CorrelationId=event.get('id'))
 
     # printing event received:
-    infolog("lambda_handler -- Event keys: {}".format(list(event['detail'].keys())),LambdaInfoTracing)
-    infolog("lambda_handler -- Complete Event: {}".format(str(event['detail'])),LambdaInfoTracing)
+    infolog("lambda_handler -- Event keys: {}",LambdaInfoTracing,list(event['detail'].keys()))
+    infolog("lambda_handler -- Complete Event: {}",LambdaInfoTracing,event['detail'])
     
     # Tracing EC2 details
-    infolog("lambda_handler -- Event: {}".format(event["detail-type"]),LambdaInfoTracing)
-    infolog("lambda_handler -- AutoScalingGroupName: {}".format(AutoScalingGroupName),LambdaInfoTracing)
-    infolog("lambda_handler -- ASGUpdateHealthCheckGraceTime: {}".format(ASGUpdateHealthCheckGraceTime),LambdaInfoTracing)
+    infolog("lambda_handler -- Event: {}",LambdaInfoTracing,event["detail-type"])
+    infolog("lambda_handler -- AutoScalingGroupNames: {}",LambdaInfoTracing,AutoScalingGroupNames)
+    infolog("lambda_handler -- ASGUpdateHealthCheckGraceTime: {}",LambdaInfoTracing,ASGUpdateHealthCheckGraceTime)
 
-    if ASGUpdateHealthCheckGraceTime and AutoScalingGroupName:
-        try:
-            # Wait time to accomplish detachment
-            time.sleep(float(ASGUpdateHealthCheckGraceTime))
-            response = asg_client.update_auto_scaling_group(AutoScalingGroupName=AutoScalingGroupName,DesiredCapacity=1)
-            infolog("lambda_handler -- Updated AutiScalingGroup with Desired Capacity 1: {}".format(response),LambdaInfoTracing)
-            
-        except botocore.exceptions.ClientError as e:
-            errorlog("Error trying AutoScalingGroup Update: {}".format(e.response['Error']))
-            errorlog('{"Error": "1"}')
+    if not ASGUpdateHealthCheckGraceTime or not AutoScalingGroupNames:
+        return {}
+    # Every Auto Scaling Group waits for its own hooks, so one slow group does not hold back the others
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(AutoScalingGroupNames)) as executor:
+        capacities = executor.map(lambda name: scale_up(name,float(ASGUpdateHealthCheckGraceTime),LambdaInfoTracing), AutoScalingGroupNames)
+        return dict(zip(AutoScalingGroupNames, capacities))
 
-def errorlog(error):
-    """ 
-    Log
-    
-    takes message as an input and print it with time in iso format 
+def desired_capacity(AutoScalingGroupName):
     """
-    logger.error('{}Z {}'.format(datetime.utcnow().isoformat(), error))
+    obtain desired capacity of an Auto Scaling Group: its DesiredCapacity setting if above 0, or two VNFs
+    in warm standby mode and one otherwise
+
+    :param AutoScalingGroupName: Auto Scaling Group name
+
+    """
+    # Auto Scaling Groups not in the VNF registry, like the one of this stack, take the function settings
+    config = registry.resolve(AutoScalingGroupName) or registry.env_config()
+    if int(config.get('DesiredCapacity') or 0) > 0:
+        return int(config['DesiredCapacity'])
+    # Warm standby runs a second, already booted VNF next to the active one
+    return 2 if str(config.get('WarmStandbyMode','false')) == "true" else 1
+
+def hooks_registered(AutoScalingGroupName,LambdaInfoTracing):
+    """
+    tell whether the launch and terminate lifecycle hooks of an Auto Scaling Group are registered
+
+    :param AutoScalingGroupName: Auto Scaling Group name
+
+    """
+    response = asg_client.describe_lifecycle_hooks(AutoScalingGroupName=AutoScalingGroupName)
+    transitions = {hook['LifecycleTransition'] for hook in response['LifecycleHooks']}
+    infolog("hooks_registered -- lifecycle hooks of {}: {}",LambdaInfoTracing,AutoScalingGroupName,sorted(transitions))
+    return all(transition in transitions for transition in HOOK_TRANSITIONS)
+
+def scale_up(AutoScalingGroupName,timeout,LambdaInfoTracing):
+    """
+    wait until both lifecycle hooks of an Auto Scaling Group are registered, then set its desired capacity;
+    returns the desired capacity set, or None
+
+    :param AutoScalingGroupName: Auto Scaling Group name
+    :param timeout: seconds to wait for the lifecycle hooks at most
 
-def infolog(string,LambdaInfoTracing):
-    """ 
-    Log
-    
-    takes message as an input and print it with time in iso format 
     """
-    if str(LambdaInfoTracing) == "true": 
-        logger.info('{}Z {}'.format(datetime.utcnow().isoformat(), string))
\ No newline at end of file
+    if not waiters.wait_until('lifecycle_hooks',lambda: hooks_registered(AutoScalingGroupName,LambdaInfoTracing),LambdaInfoTracing,timeout):
+        # Launching without hooks would leave the instance without its VIP
+        errorlog("Lifecycle hooks of {} not registered within {} seconds, desired capacity left unchanged",AutoScalingGroupName,timeout)
+        return None
+    DesiredCapacity = desired_capacity(AutoScalingGroupName)
+    try:
+        response = asg_client.update_auto_scaling_group(AutoScalingGroupName=AutoScalingGroupName,DesiredCapacity=DesiredCapacity)
+        infolog("scale_up -- Updated AutoScalingGroup {} with Desired Capacity {}: {}",LambdaInfoTracing,AutoScalingGroupName,DesiredCapacity,response)
+        return DesiredCapacity
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error trying AutoScalingGroup Update of {}: {}",AutoScalingGroupName,e.response['Error'])
+        errorlog('{"Error": "1"}')
+        return None
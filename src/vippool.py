@@ -0,0 +1,159 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import ipaddress
+from logs import errorlog, infolog
+import botocore
+import waiters
+
+
+# Tag key marking pre-provisioned VIP subnets and ENIs, with the AZ as value
+POOL_TAG = 'VIPPool'
+# Tag key of the VNF owning pre-provisioned VIP subnets and ENIs, with the name of its Auto Scaling Group as value
+POOL_VNF_TAG = 'VIPPoolVNF'
+
+def pool_cidrs(supernet,azs):
+    """
+    carve one VIP CIDR range per distinct AZ out of the VIP supernet
+
+    :param supernet: CIDR IPv4 range for the VIP supernet
+    :param azs: list of Availability Zones (may contain repetitions)
+
+    """
+    distinct_azs = list(dict.fromkeys(azs))
+    network = ipaddress.ip_network(supernet)
+    new_prefix = network.prefixlen + max(1, (len(distinct_azs) - 1).bit_length())
+    cidrs = network.subnets(new_prefix=new_prefix)
+    return {az: str(next(cidrs)) for az in distinct_azs}
+
+def pool_vip(cidr,vip,vip_cidr):
+    """
+    obtain the VIP address within a pool CIDR range, at the same host offset as the VIP in its CIDR range
+
+    :param cidr: CIDR IPv4 range of the pool subnet
+    :param vip: (virtual) private IPv4 address
+    :param vip_cidr: CIDR IPv4 range the VIP belongs to
+
+    """
+    offset = int(ipaddress.ip_address(vip)) - int(ipaddress.ip_network(vip_cidr).network_address)
+    network = ipaddress.ip_network(cidr)
+    if offset >= network.num_addresses - 1:
+        raise ValueError("VIP offset {} does not fit in pool subnet {}".format(offset,cidr))
+    return str(network.network_address + offset)
+
+def stage_pool(ec2_client,vpc_id,vnf_id,supernet,azs,route_table_id,sg_id,vip,vip_cidr,LambdaInfoTracing,secondary_vips=()):
+    """
+    stage VIP subnet and ENI in each AZ, returning a map of AZ to staged interface id
+
+    :param ec2_client: EC2 client
+    :param vpc_id: VPC id
+    :param vnf_id: VNF identifier, the name of its Auto Scaling Group
+    :param supernet: CIDR IPv4 range for the VIP supernet
+    :param azs: list of Availability Zones
+    :param route_table_id: Route Table id
+    :param sg_id: Security Group ID
+    :param vip: (virtual) private IPv4 address
+    :param vip_cidr: CIDR IPv4 range the VIP belongs to
+    :param secondary_vips: secondary (virtual) private IPv4 addresses, mapped to each pool subnet as the VIP
+
+    """
+    staged = {}
+    for az, cidr in pool_cidrs(supernet,azs).items():
+        secondary_ips = [pool_vip(cidr,address,vip_cidr) for address in secondary_vips]
+        staged[az] = stage_az(ec2_client,vpc_id,vnf_id,az,cidr,route_table_id,sg_id,pool_vip(cidr,vip,vip_cidr),LambdaInfoTracing,secondary_ips)
+    infolog("stage_pool -- staged VIP interfaces: {}",LambdaInfoTracing,staged)
+    return staged
+
+def stage_az(ec2_client,vpc_id,vnf_id,az,cidr,route_table_id,sg_id,vip,LambdaInfoTracing,secondary_ips=()):
+    """
+    stage VIP subnet, route table association and ENI in a specific AZ, reusing existing ones of the same VNF
+
+    :param ec2_client: EC2 client
+    :param vpc_id: VPC id
+    :param vnf_id: VNF identifier, the name of its Auto Scaling Group
+    :param az: Availability Zone
+    :param cidr: CIDR IPv4 range for subnet
+    :param route_table_id: Route Table id
+    :param sg_id: Security Group ID
+    :param vip: (virtual) private IPv4 address for the staged interface
+    :param secondary_ips: secondary private IPv4 addresses for the staged interface
+
+    """
+    tags = [{'Key': POOL_TAG, 'Value': az},{'Key': POOL_VNF_TAG, 'Value': vnf_id}]
+    subnet_id = None
+    interface_id = None
+    try:
+        response = ec2_client.describe_subnets(
+            Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]},{'Name': 'cidr-block', 'Values': [cidr]}]
+        )
+        if response['Subnets']:
+            subnet_id = response['Subnets'][0]['SubnetId']
+            # Pool CIDR ranges of VNFs sharing a VIP supernet overlap, their staged ENIs must not be swapped
+            owner = {tag['Key']: tag['Value'] for tag in response['Subnets'][0].get('Tags', [])}.get(POOL_VNF_TAG, vnf_id)
+            if owner != vnf_id:
+                errorlog("VIP subnet {} in {} is staged for VNF {}, not {}",subnet_id,az,owner,vnf_id)
+                return None
+        else:
+            subnet = ec2_client.create_subnet(TagSpecifications=[{'ResourceType': 'subnet', 'Tags': [{'Key': 'Name', 'Value': 'VIP Subnet'}] + tags}],AvailabilityZone=az,CidrBlock=cidr,VpcId=vpc_id)
+            subnet_id = subnet['Subnet']['SubnetId']
+            waiters.wait_subnet_available(ec2_client,subnet_id,LambdaInfoTracing)
+            ec2_client.associate_route_table(RouteTableId=route_table_id,SubnetId=subnet_id)
+        infolog("stage_az -- VIP subnet in {}: {}",LambdaInfoTracing,az,subnet_id)
+
+        response = ec2_client.describe_network_interfaces(
+            Filters=[{'Name': 'subnet-id', 'Values': [subnet_id]},{'Name': 'private-ip-address', 'Values': [vip]}]
+        )
+        if response['NetworkInterfaces']:
+            interface_id = response['NetworkInterfaces'][0]['NetworkInterfaceId']
+            # Assign any secondary address missing on the staged interface in one call
+            assigned = [address['PrivateIpAddress'] for address in response['NetworkInterfaces'][0].get('PrivateIpAddresses', [])]
+            missing = [address for address in secondary_ips if address not in assigned]
+            if missing:
+                ec2_client.assign_private_ip_addresses(NetworkInterfaceId=interface_id,PrivateIpAddresses=missing,AllowReassignment=True)
+        else:
+            network_interface = ec2_client.create_network_interface(
+                Description='VIP ENI',Groups=[sg_id],SubnetId=subnet_id,
+                PrivateIpAddresses=[{'PrivateIpAddress': vip, 'Primary': True}] + [{'PrivateIpAddress': address, 'Primary': False} for address in secondary_ips],
+                TagSpecifications=[{'ResourceType': 'network-interface', 'Tags': tags}]
+            )
+            interface_id = network_interface['NetworkInterface']['NetworkInterfaceId']
+            ec2_client.modify_network_interface_attribute(NetworkInterfaceId=interface_id,SourceDestCheck={'Value': False})
+        infolog("stage_az -- VIP interface in {}: {}",LambdaInfoTracing,az,interface_id)
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error staging VIP subnet and interface in {}: {}",az,e.response['Error'])
+    return interface_id
+
+def get_staged_interface(ec2_client,vpc_id,vnf_id,az,LambdaInfoTracing):
+    """
+    obtain staged VIP interface id of a VNF for a specific AZ
+
+    :param ec2_client: EC2 client
+    :param vpc_id: VPC id
+    :param vnf_id: VNF identifier, the name of its Auto Scaling Group
+    :param az: Availability Zone
+
+    """
+    interface_id = None
+    try:
+        response = ec2_client.describe_network_interfaces(
+            Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]},{'Name': 'tag:' + POOL_TAG, 'Values': [az]},{'Name': 'tag:' + POOL_VNF_TAG, 'Values': [vnf_id]}]
+        )
+        if response['NetworkInterfaces']:
+            interface_id = response['NetworkInterfaces'][0]['NetworkInterfaceId']
+        infolog("get_staged_interface -- staged VIP interface in {}: {}",LambdaInfoTracing,az,interface_id)
+    except botocore.exceptions.ClientError as e:
+        errorlog("Error obtaining staged VIP interface in {}: {}",az,e.response['Error'])
+    return interface_id
@@ -0,0 +1,167 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import concurrent.futures
+from logs import errorlog, infolog
+import botocore
+import taskgraph
+
+
+def release(ec2_client,interfaces,subnet_ids,LambdaInfoTracing):
+    """
+    one non-blocking release pass over VIP interfaces and subnets: disassociates EIPs and detaches interfaces
+    without waiting for the detachment, deletes detached ones, disassociates subnets from their Route Table and
+    deletes those left without interfaces; returns the ids of interfaces and subnets still to be deleted
+
+    :param ec2_client: EC2 client
+    :param interfaces: Interface records of the network interfaces to release
+    :param subnet_ids: ids of the subnets to release
+
+    """
+    interfaces = list({interface.NetworkInterfaceId: interface for interface in interfaces}.values())
+    subnet_ids = list(dict.fromkeys(subnet_ids))
+
+    def remove_interfaces(results):
+        if not interfaces:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(interfaces)) as executor:
+            deleted = list(executor.map(lambda interface: remove_interface(ec2_client,interface,LambdaInfoTracing), interfaces))
+        return [interface for interface, gone in zip(interfaces, deleted) if not gone]
+
+    def get_route_associations(results):
+        return get_route_table_associations(ec2_client,subnet_ids,LambdaInfoTracing) if subnet_ids else {}
+
+    def remove_subnets(results):
+        # Subnets still holding an interface cannot be deleted yet, only disassociated
+        busy = {interface.SubnetId for interface in results['remove_interfaces']}
+        if not subnet_ids:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(subnet_ids)) as executor:
+            deleted = list(executor.map(lambda subnet_id: remove_subnet(ec2_client,subnet_id,results['get_route_associations'].get(subnet_id),subnet_id not in busy,LambdaInfoTracing), subnet_ids))
+        return [subnet_id for subnet_id, gone in zip(subnet_ids, deleted) if not gone]
+
+    results = taskgraph.run_graph([
+        ('remove_interfaces', remove_interfaces, []),
+        ('get_route_associations', get_route_associations, []),
+        ('remove_subnets', remove_subnets, ['remove_interfaces', 'get_route_associations']),
+    ])
+    return [interface.NetworkInterfaceId for interface in results['remove_interfaces']] + results['remove_subnets']
+
+def remove_interface(ec2_client,network_interface,LambdaInfoTracing):
+    """
+    disassociate all EIPs of an interface, then detach it without waiting for the detachment, or delete it
+    once detached; returns True if the interface is gone
+
+    :param ec2_client: EC2 client
+    :param network_interface: network interface record
+
+    """
+    network_interface_id = network_interface.NetworkInterfaceId
+    if network_interface.Associations:
+        disassociate_addresses(ec2_client,network_interface,LambdaInfoTracing)
+
+    if network_interface.Attachment:
+        if network_interface.Attachment.Status != 'detaching':
+            try:
+                response = ec2_client.detach_network_interface(AttachmentId=network_interface.Attachment.AttachmentId,Force=True)
+                infolog("remove_interface -- EC2 obtained response from interface detachment: {}",LambdaInfoTracing,response)
+            except botocore.exceptions.ClientError as e:
+                errorlog("Error detaching interface {}: {}",network_interface_id,e.response['Error'])
+        return False
+
+    try:
+        ec2_client.delete_network_interface(NetworkInterfaceId=network_interface_id)
+        infolog("remove_interface -- EC2 deleted network interface: {}",LambdaInfoTracing,network_interface_id)
+        return True
+    except botocore.exceptions.ClientError as e:
+        if e.response['Error']['Code'] == 'InvalidNetworkInterfaceID.NotFound':
+            return True
+        errorlog("Error deleting interface {}: {}",network_interface_id,e.response['Error'])
+        return False
+
+def disassociate_addresses(ec2_client,network_interface,LambdaInfoTracing):
+    """
+    disassociate all EIP associations of an interface concurrently
+
+    :param ec2_client: EC2 client
+    :param network_interface: network interface record
+
+    """
+    def disassociate(association):
+        try:
+            response = ec2_client.disassociate_address(AssociationId=association)
+            infolog("disassociate_addresses -- EC2 disassociate EIP response: {}",LambdaInfoTracing,response)
+        except botocore.exceptions.ClientError as e:
+            errorlog("Error disassociating EIP from network interface: {}",e.response['Error'])
+
+    associations = [association.AssociationId for association in network_interface.Associations]
+    infolog("disassociate_addresses -- EC2 obtained association ids: {}",LambdaInfoTracing,associations)
+    if associations:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(associations)) as executor:
+            list(executor.map(disassociate, associations))
+
+def get_route_table_associations(ec2_client,subnet_ids,LambdaInfoTracing):
+    """
+    obtain Route Table association ids of subnets in one call, as a map of subnet id to association id
+    for subnets with an explicit association
+
+    :param ec2_client: EC2 client
+    :param subnet_ids: subnet ids
+
+    """
+    response = ec2_client.describe_route_tables(Filters=[{'Name': 'association.subnet-id', 'Values': list(subnet_ids)}])
+    associations = {}
+    for table in response['RouteTables']:
+        for association in table.get('Associations', []):
+            if association.get('SubnetId') in subnet_ids:
+                associations[association['SubnetId']] = association['RouteTableAssociationId']
+    infolog("get_route_table_associations -- EC2 obtained route table associations: {}",LambdaInfoTracing,associations)
+    return associations
+
+def remove_subnet(ec2_client,subnet_id,RouteTableAssociationId,deletable,LambdaInfoTracing):
+    """
+    disassociate subnet from its Route Table, and delete it once no interface is left in it;
+    returns True if the subnet is gone
+
+    :param ec2_client: EC2 client
+    :param subnet_id: subnet id to be deleted
+    :param RouteTableAssociationId: association id, or None if subnet has no explicit association
+    :param deletable: whether all interfaces of the subnet are deleted
+
+    """
+    if RouteTableAssociationId:
+        try:
+            response = ec2_client.disassociate_route_table(AssociationId=RouteTableAssociationId)
+            infolog("remove_subnet -- EC2 disassociating subnet {}: {}",LambdaInfoTracing,subnet_id,response)
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'InvalidAssociationID.NotFound':
+                errorlog("Error disassociating subnet {}: {}",subnet_id,e.response['Error'])
+
+    if not deletable:
+        return False
+    try:
+        ec2_client.delete_subnet(SubnetId=subnet_id)
+        infolog("remove_subnet -- EC2 deleted subnet: {}",LambdaInfoTracing,subnet_id)
+        return True
+    except botocore.exceptions.ClientError as e:
+        if e.response['Error']['Code'] == 'InvalidSubnetID.NotFound':
+            return True
+        # Interfaces deleted in this pass may still count as dependencies for a moment
+        if e.response['Error']['Code'] == 'DependencyViolation':
+            infolog("remove_subnet -- subnet {} still has dependencies",LambdaInfoTracing,subnet_id)
+        else:
+            errorlog("Error deleting subnet {}: {}",subnet_id,e.response['Error'])
+        return False
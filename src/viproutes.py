@@ -0,0 +1,96 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import concurrent.futures
+from logs import errorlog, infolog
+import botocore
+
+
+# Error codes of replace_route when the table has no route for the destination yet
+MISSING_ROUTE_CODES = ('InvalidRoute.NotFound', 'InvalidParameterValue')
+
+def route_tables(route_table_id,extra_route_tables):
+    """
+    obtain the route tables carrying VIP routes: WAN route table, followed by any additional (e.g. LAN) ones
+
+    :param route_table_id: WAN Route Table id
+    :param extra_route_tables: comma separated list of additional Route Table ids (may be empty)
+
+    """
+    tables = [route_table_id] + [table.strip() for table in str(extra_route_tables).split(',') if table.strip()]
+    return list(dict.fromkeys(tables))
+
+def destinations(addresses):
+    """
+    obtain /32 route destinations of VIP addresses
+
+    :param addresses: (VIP address, EIP allocation id or None) tuples
+
+    """
+    return [address.split('/')[0] + '/32' for address, allocation in addresses]
+
+def replace_routes(ec2_client,tables,cidrs,network_interface_id,LambdaInfoTracing):
+    """
+    point VIP routes of all route tables to an interface concurrently, creating missing ones;
+    returns True if all routes point to it
+
+    :param ec2_client: EC2 client
+    :param tables: Route Table ids
+    :param cidrs: /32 route destinations
+    :param network_interface_id: network interface id of the VNF
+
+    """
+    def replace(route):
+        table, cidr = route
+        try:
+            ec2_client.replace_route(RouteTableId=table,DestinationCidrBlock=cidr,NetworkInterfaceId=network_interface_id)
+            infolog("replace_routes -- route {} in {} replaced to {}",LambdaInfoTracing,cidr,table,network_interface_id)
+            return True
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] not in MISSING_ROUTE_CODES:
+                errorlog("Error replacing route {} in {}: {}",cidr,table,e.response['Error'])
+                return False
+        try:
+            ec2_client.create_route(RouteTableId=table,DestinationCidrBlock=cidr,NetworkInterfaceId=network_interface_id)
+            infolog("replace_routes -- route {} in {} created to {}",LambdaInfoTracing,cidr,table,network_interface_id)
+            return True
+        except botocore.exceptions.ClientError as e:
+            errorlog("Error creating route {} in {}: {}",cidr,table,e.response['Error'])
+            return False
+
+    routes = [(table, cidr) for table in tables for cidr in cidrs]
+    if not routes:
+        return True
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(routes)) as executor:
+        return all(list(executor.map(replace, routes)))
+
+def delete_routes(ec2_client,tables,cidrs,LambdaInfoTracing):
+    """
+    delete VIP routes from all route tables, ignoring routes that do not exist
+
+    :param ec2_client: EC2 client
+    :param tables: Route Table ids
+    :param cidrs: /32 route destinations
+
+    """
+    for table in tables:
+        for cidr in cidrs:
+            try:
+                ec2_client.delete_route(RouteTableId=table,DestinationCidrBlock=cidr)
+                infolog("delete_routes -- route {} deleted from {}",LambdaInfoTracing,cidr,table)
+            except botocore.exceptions.ClientError as e:
+                if e.response['Error']['Code'] != 'InvalidRoute.NotFound':
+                    errorlog("Error deleting route {} from {}: {}",cidr,table,e.response['Error'])
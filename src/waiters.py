@@ -0,0 +1,177 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+from logs import errorlog, infolog
+import random
+import time
+import botocore
+
+
+# Clock and sleep used by all waiters, kept as module attributes so they can be virtualised
+clock = time.monotonic
+sleep = time.sleep
+
+# Per-phase caps (in seconds): overall timeout, first delay and maximum delay between polls
+PHASE_CAPS = {
+    'subnet_available':   {'timeout': 60,  'delay': 1, 'max_delay': 5},
+    'subnet_released':    {'timeout': 60,  'delay': 2, 'max_delay': 10},
+    'interface_attached': {'timeout': 60,  'delay': 1, 'max_delay': 5},
+    'interface_detached': {'timeout': 90,  'delay': 2, 'max_delay': 10},
+    'instance_running':   {'timeout': 300, 'delay': 5, 'max_delay': 15},
+    'address_associated': {'timeout': 30,  'delay': 1, 'max_delay': 5},
+    'vnf_ready':          {'timeout': 600, 'delay': 5, 'max_delay': 15},
+    'claim_released':     {'timeout': 600, 'delay': 2, 'max_delay': 10},
+    'lease_released':     {'timeout': 600, 'delay': 1, 'max_delay': 5},
+    'standby_left':       {'timeout': 60,  'delay': 2, 'max_delay': 10},
+    'lifecycle_hooks':    {'timeout': 120, 'delay': 1, 'max_delay': 10},
+    'stack_teardown':     {'timeout': 45,  'delay': 2, 'max_delay': 10},
+    'orphans_released':   {'timeout': 120, 'delay': 2, 'max_delay': 10},
+}
+
+def backoff_delay(attempt,delay,max_delay):
+    """
+    obtain jittered exponential backoff delay for a given attempt
+
+    :param attempt: attempt number (starting from '0')
+    :param delay: delay for the first attempt
+    :param max_delay: cap for the delay between attempts
+
+    """
+    ceiling = min(max_delay, delay * (2 ** attempt))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+def wait_until(phase,probe,LambdaInfoTracing,timeout=None):
+    """
+    poll probe with jittered exponential backoff until it returns a result or phase timeout expires
+
+    :param phase: phase name, key in PHASE_CAPS
+    :param probe: callable returning a truthy value once the condition holds
+    :param timeout: optional override of the phase timeout
+
+    """
+    caps = PHASE_CAPS[phase]
+    if timeout is None:
+        timeout = caps['timeout']
+    deadline = clock() + timeout
+    attempt = 0
+    while True:
+        try:
+            result = probe()
+            if result:
+                infolog("wait_until -- {} reached after {} polls",LambdaInfoTracing,phase,attempt+1)
+                return result
+        except botocore.exceptions.ClientError as e:
+            # Resources may not be visible yet due to eventual consistency
+            infolog("wait_until -- {} poll error: {}",LambdaInfoTracing,phase,e.response['Error'])
+        remaining = deadline - clock()
+        if remaining <= 0:
+            errorlog("wait_until -- {} not reached within {} seconds",phase,timeout)
+            return None
+        sleep(min(remaining, backoff_delay(attempt,caps['delay'],caps['max_delay'])))
+        attempt += 1
+
+def wait_subnet_available(ec2_client,subnet_id,LambdaInfoTracing,timeout=None):
+    """
+    wait until subnet is in 'available' state
+
+    :param ec2_client: EC2 client
+    :param subnet_id: subnet id within VPC
+
+    """
+    def probe():
+        response = ec2_client.describe_subnets(SubnetIds=[subnet_id])
+        return response['Subnets'] and response['Subnets'][0]['State'] == 'available'
+    return wait_until('subnet_available',probe,LambdaInfoTracing,timeout)
+
+def wait_subnet_released(ec2_client,vpc_id,cidr,LambdaInfoTracing,timeout=None):
+    """
+    wait until no subnet exists in VPC with a given IPv4 CIDR range
+
+    :param ec2_client: EC2 client
+    :param vpc_id: VPC id
+    :param cidr: CIDR IPv4 range for subnet
+
+    """
+    def probe():
+        response = ec2_client.describe_subnets(
+            Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]},{'Name': 'cidr-block', 'Values': [cidr]}]
+        )
+        return not response['Subnets']
+    return wait_until('subnet_released',probe,LambdaInfoTracing,timeout)
+
+def wait_interface_attached(ec2_client,network_interface_id,LambdaInfoTracing,timeout=None):
+    """
+    wait until interface attachment is in 'attached' state
+
+    :param ec2_client: EC2 client
+    :param network_interface_id: network interface id
+
+    """
+    def probe():
+        response = ec2_client.describe_network_interfaces(NetworkInterfaceIds=[network_interface_id])
+        interface = response['NetworkInterfaces'][0]
+        return interface.get('Attachment',{}).get('Status') == 'attached'
+    return wait_until('interface_attached',probe,LambdaInfoTracing,timeout)
+
+def wait_interface_detached(ec2_client,network_interface_id,LambdaInfoTracing,timeout=None):
+    """
+    wait until interface is no longer attached to any instance
+
+    :param ec2_client: EC2 client
+    :param network_interface_id: network interface id
+
+    """
+    def probe():
+        try:
+            response = ec2_client.describe_network_interfaces(NetworkInterfaceIds=[network_interface_id])
+        except botocore.exceptions.ClientError as e:
+            # Interface deleted meanwhile, e.g. torn down by a launch rebuilding it in another AZ
+            if e.response['Error']['Code'] == 'InvalidNetworkInterfaceID.NotFound':
+                return True
+            raise
+        if not response['NetworkInterfaces']:
+            return True
+        interface = response['NetworkInterfaces'][0]
+        return interface['Status'] == 'available' or interface.get('Attachment',{}).get('Status') == 'detached'
+    return wait_until('interface_detached',probe,LambdaInfoTracing,timeout)
+
+def wait_instance_running(ec2_client,instance_id,LambdaInfoTracing,timeout=None):
+    """
+    wait until instance is in 'running' state
+
+    :param ec2_client: EC2 client
+    :param instance_id: instance ID
+
+    """
+    def probe():
+        response = ec2_client.describe_instance_status(InstanceIds=[instance_id],IncludeAllInstances=True)
+        statuses = response['InstanceStatuses']
+        return statuses and statuses[0]['InstanceState']['Name'] == 'running'
+    return wait_until('instance_running',probe,LambdaInfoTracing,timeout)
+
+def wait_address_associated(ec2_client,eipallocation,network_interface_id,LambdaInfoTracing,timeout=None):
+    """
+    wait until EIP allocation is associated to a network interface
+
+    :param ec2_client: EC2 client
+    :param eipallocation: EIP allocation id
+    :param network_interface_id: network interface id
+
+    """
+    def probe():
+        response = ec2_client.describe_addresses(AllocationIds=[eipallocation])
+        return response['Addresses'] and response['Addresses'][0].get('NetworkInterfaceId') == network_interface_id
+    return wait_until('address_associated',probe,LambdaInfoTracing,timeout)
@@ -0,0 +1,145 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+import contextlib
+from logs import errorlog, infolog
+import threading
+import taskgraph
+from statestore import ConflictError
+
+
+# Time (in milliseconds) kept in reserve for checkpointing and handing over to a continuation invocation
+RESERVE_MS = 20000
+
+# Workflow outcomes
+DONE = 'done'
+FAILED = 'failed'
+SUSPENDED = 'suspended'
+CONFLICT = 'conflict'
+
+class StepFailed(Exception):
+    """
+    raised by a step that cannot be completed, making the workflow fail
+    """
+    pass
+
+class Suspend(Exception):
+    """
+    raised by a step that needs more time than left in this invocation, to be resumed later
+    """
+    pass
+
+def budget(context,cap):
+    """
+    obtain seconds a step may wait, capped by time left in this invocation
+
+    :param context: Lambda context (or None outside Lambda)
+    :param cap: maximum seconds the step would wait
+
+    """
+    if context is None:
+        return cap
+    return max(0, min(cap, (context.get_remaining_time_in_millis() - RESERVE_MS) / 1000.0))
+
+def run_steps(store,key,steps,state,context,LambdaInfoTracing,metrics=None):
+    """
+    run workflow steps once their dependencies have completed, overlapping independent ones,
+    checkpointing each completed step in the journal and skipping completed ones when resumed;
+    returns DONE, FAILED, SUSPENDED or CONFLICT
+
+    :param store: state store keeping the journal
+    :param key: journal key, unique to the lifecycle action
+    :param steps: list of (step name, step function) or (step name, step function, list of dependency names)
+                  tuples, where each step function takes the workflow state and returns a dict of outputs
+                  to merge into it; a step without dependency list depends on the step before it
+    :param state: workflow state with step inputs
+    :param context: Lambda context (or None outside Lambda)
+    :param metrics: optional metrics.Histogram observing the duration of each step run in this invocation
+
+    """
+    journal, version = store.get(key)
+    if journal is None:
+        journal = {'Status': 'running', 'Completed': [], 'Started': [], 'Outputs': {}}
+    if journal['Status'] in (DONE, FAILED):
+        infolog("run_steps -- journal {} already {}",LambdaInfoTracing,key,journal['Status'])
+        state.update(journal['Outputs'])
+        return journal['Status']
+
+    state.update(journal['Outputs'])
+    journal.setdefault('Started', [])
+    # Journal updates from concurrent steps are serialised
+    lock = threading.Lock()
+    checkpoint = {'Version': version}
+
+    def save():
+        checkpoint['Version'] = store.put(key,journal,checkpoint['Version'])
+
+    def task(name,step):
+        def run(results):
+            if context is not None and context.get_remaining_time_in_millis() < RESERVE_MS:
+                infolog("run_steps -- suspending {} before step {}",LambdaInfoTracing,key,name)
+                raise Suspend()
+            with lock:
+                # A step that was started but never completed is being resumed
+                step_state = dict(state, Resumed=name in journal['Started'])
+                if not step_state['Resumed']:
+                    journal['Started'].append(name)
+                save()
+            infolog("run_steps -- {} step {} (resumed: {})",LambdaInfoTracing,key,name,step_state['Resumed'])
+
+            timer = metrics.timer(name) if metrics is not None else contextlib.nullcontext()
+            try:
+                with timer:
+                    outputs = step(step_state) or {}
+            except StepFailed as e:
+                errorlog("run_steps -- step {} failed: {}",name,e)
+                raise
+
+            with lock:
+                state.update(outputs)
+                journal['Outputs'].update(outputs)
+                journal['Completed'].append(name)
+                journal['Started'].remove(name)
+                save()
+            return outputs
+        return run
+
+    tasks = []
+    previous = []
+    for entry in steps:
+        name, step = entry[0], entry[1]
+        dependencies = entry[2] if len(entry) > 2 else previous
+        tasks.append((name, task(name,step), dependencies))
+        previous = [name]
+
+    try:
+        try:
+            taskgraph.run_graph(tasks,done={name: None for name in journal['Completed']})
+        except Suspend:
+            infolog("run_steps -- {} suspended",LambdaInfoTracing,key)
+            return SUSPENDED
+        except StepFailed as e:
+            journal['Status'] = FAILED
+            journal['Error'] = str(e)
+            save()
+            return FAILED
+
+        journal['Status'] = DONE
+        save()
+        return DONE
+    except ConflictError:
+        errorlog("run_steps -- journal {} is being updated by another invocation",key)
+        return CONFLICT
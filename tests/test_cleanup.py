@@ -0,0 +1,92 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+import os
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, os.path.join(HERE, '..', 'benchmarks'))
+
+import awsclients
+import cleanup
+import simbackend
+import waiters
+
+VPC = 'vpc-wan'
+INSTANCE = 'i-0000000000000000a'
+ALLOCATION = 'eipalloc-0123456789abcdef0'
+PROPERTIES = {
+    'VPCId': VPC, 'AutoScalingGroupName': 'vnf-a-asg', 'WANRouteTable': 'rtb-wan', 'SecGroupId': 'sg-vnf', 'VIPCIDRBlock': '10.16.10.0/24', 'VIPAddress': '10.16.10.20/32',
+    'EIPAddress': '203.0.113.10', 'EIPAllocationId': ALLOCATION, 'LambdaInfoTracing': 'false', 'VIPFailoverMode': 'subnet',
+    'VIPRouteTables': '', 'SecondaryVIPs': '', 'VIPPoolMode': 'true', 'VIPSupernetCIDRBlock': '10.16.12.0/22',
+    'AvailabilityZones': ['eu-west-1a', 'eu-west-1b', 'eu-west-1c'],
+}
+
+
+class StackDeleteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = simbackend.Simulation(scale=0.001)
+        self.ec2 = self.simulation.backends['ec2']
+        self.clock = self.simulation.clock
+        self.saved = cleanup.clock, waiters.clock, waiters.sleep, cleanup.helper.Data
+        cleanup.clock = waiters.clock = self.clock.now
+        waiters.sleep = self.clock.sleep
+        cleanup.helper.Data = {}
+        awsclients.clients.update({service: self.simulation.client(service) for service in ('ec2', 'autoscaling')})
+
+    def tearDown(self):
+        cleanup.clock, waiters.clock, waiters.sleep, cleanup.helper.Data = self.saved
+        awsclients.clients.clear()
+
+    def deploy(self):
+        """
+        VIP subnet and ENI attached to a running VNF with the EIP associated, and the hot spare VIP pool staged
+        in every AZ when the stack was created
+        """
+        client = self.simulation.client('ec2')
+        self.ec2.add_instance(INSTANCE,'eu-west-1a',launched=self.clock.now() - self.simulation.profile['boot'])
+        subnet = client.create_subnet(VpcId=VPC,CidrBlock=PROPERTIES['VIPCIDRBlock'],AvailabilityZone='eu-west-1a')
+        client.associate_route_table(RouteTableId=PROPERTIES['WANRouteTable'],SubnetId=subnet['Subnet']['SubnetId'])
+        interface = client.create_network_interface(SubnetId=subnet['Subnet']['SubnetId'],Description='VIP ENI',PrivateIpAddress='10.16.10.20')
+        interface_id = interface['NetworkInterface']['NetworkInterfaceId']
+        client.attach_network_interface(NetworkInterfaceId=interface_id,InstanceId=INSTANCE,DeviceIndex=1)
+        client.associate_address(AllocationId=ALLOCATION,NetworkInterfaceId=interface_id,PrivateIpAddress='10.16.10.20')
+        cleanup.create({'RequestType': 'Create', 'ResourceProperties': PROPERTIES},None)
+        self.clock.sleep(self.simulation.profile['consistency'])
+
+    def test_teardown_within_timeout(self):
+        self.deploy()
+        self.assertEqual(len(self.ec2.leftovers()), 8)
+        event = {'RequestType': 'Delete', 'PhysicalResourceId': 'cleanup', 'ResourceProperties': PROPERTIES}
+        start = self.clock.now()
+        cleanup.delete(event,None)
+        event['CrHelperData'] = dict(cleanup.helper.Data)
+        # crhelper polls on its CloudWatch Events schedule until poll_delete returns the resource id
+        while not cleanup.poll_delete(event,None):
+            self.assertLess(self.clock.now() - start, cleanup.TEARDOWN_TIMEOUT)
+            self.clock.sleep(cleanup.POLLING_INTERVAL * 60)
+        self.assertLess(self.clock.now() - start, cleanup.TEARDOWN_TIMEOUT)
+        self.assertEqual(self.ec2.leftovers(), [])
+        self.assertIsNone(self.ec2.addresses[ALLOCATION].get('AssociationId'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, os.path.join(HERE, '..', 'benchmarks'))
+
+import awsclients
+import healthmonitor
+import simbackend
+import statestore
+
+
+class FakeAutoScaling(object):
+    """
+    Auto Scaling stand-in: one group per VNF with a single in-service instance, recording instances marked unhealthy
+    """
+
+    def __init__(self,groups):
+        self.groups = groups
+        self.unhealthy = []
+
+    def describe_auto_scaling_groups(self,AutoScalingGroupNames):
+        return {'AutoScalingGroups': [
+            {'Instances': [{'InstanceId': self.groups[name], 'LifecycleState': 'InService', 'HealthStatus': 'Healthy'}]}
+            for name in AutoScalingGroupNames
+        ]}
+
+    def set_instance_health(self,InstanceId,HealthStatus,ShouldRespectGracePeriod):
+        self.unhealthy.append(InstanceId)
+
+class HealthMonitorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.targets = {'vnf-a-asg': simbackend.FakeTarget(), 'vnf-b-asg': simbackend.FakeTarget()}
+        self.asg = FakeAutoScaling({'vnf-a-asg': 'i-0000000000000000a', 'vnf-b-asg': 'i-0000000000000000b'})
+        awsclients.clients['autoscaling'] = self.asg
+        directory = tempfile.mkdtemp()
+        healthmonitor.state_store = statestore.get_store('sqlite://' + os.path.join(directory, 'state.db'))
+        self.monitors = [healthmonitor.Monitor(name,self.config(target)) for name, target in sorted(self.targets.items())]
+
+    def tearDown(self):
+        awsclients.clients.pop('autoscaling', None)
+        healthmonitor.state_store = None
+        for target in self.targets.values():
+            if target.server.fileno() != -1:
+                target.fail()
+
+    def config(self,target,**settings):
+        config = {'HealthChecks': 'tcp:{}'.format(target.port), 'HealthCheckThreshold': '3', 'HealthCheckAddress': target.address}
+        config.update(settings)
+        return config
+
+    def probe_rounds(self,rounds):
+        for _ in range(rounds):
+            healthmonitor.probe_round(self.monitors)
+
+    def test_probe_fake_target(self):
+        monitor = self.monitors[0]
+        target = {'instance_id': 'i-0000000000000000a', 'address': self.targets['vnf-a-asg'].address, 'LambdaInfoTracing': 'false'}
+        self.assertTrue(monitor.probe(target))
+        self.targets['vnf-a-asg'].fail()
+        self.assertFalse(monitor.probe(target))
+
+    def test_failed_vnf_marked_unhealthy_at_threshold(self):
+        self.targets['vnf-a-asg'].fail()
+        self.probe_rounds(2)
+        self.assertEqual(self.asg.unhealthy, [])
+        self.probe_rounds(1)
+        self.assertEqual(self.asg.unhealthy, ['i-0000000000000000a'])
+
+    def test_all_targets_failed_is_monitor_fault(self):
+        for target in self.targets.values():
+            target.fail()
+        self.probe_rounds(4)
+        self.assertEqual(self.asg.unhealthy, [])
+
+    def test_single_failed_target_marked_unhealthy(self):
+        self.monitors = self.monitors[:1]
+        self.targets['vnf-a-asg'].fail()
+        self.probe_rounds(3)
+        self.assertEqual(self.asg.unhealthy, ['i-0000000000000000a'])
+
+    def test_unreachable_probes_rejected(self):
+        target = self.targets['vnf-a-asg']
+        with self.assertRaises(ValueError):
+            healthmonitor.Monitor('vnf-a-asg',self.config(target,HealthChecks='icmp'))
+        with self.assertRaises(ValueError):
+            healthmonitor.Monitor('vnf-a-asg',self.config(target,HealthCheckAddress='eip'))
+        with self.assertRaises(ValueError):
+            healthmonitor.Monitor('vnf-a-asg',self.config(target,HealthChecks=''))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, os.path.join(HERE, '..', 'benchmarks'))
+
+import failover
+import readiness
+import simbackend
+
+
+class RebootReadinessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = simbackend.Simulation(scale=0.001)
+        self.ec2 = self.simulation.backends['ec2']
+        self.clock = self.simulation.clock
+        self.saved = readiness.clock, readiness.connect
+        readiness.clock, readiness.connect = self.clock.now, self.ec2.connect
+        # Instance past its boot and status checks
+        self.ec2.add_instance('i-0000000000000000a','us-east-1a',launched=self.clock.now() - 200)
+        primary = [interface for interface in self.ec2.interfaces.values() if interface['Attachment']['InstanceId'] == 'i-0000000000000000a'][0]
+        self.target = {'instance_id': 'i-0000000000000000a', 'interface_id': primary['NetworkInterfaceId'], 'address': primary['PrivateIpAddress'],
+                       'LambdaInfoTracing': 'false'}
+
+    def tearDown(self):
+        readiness.clock, readiness.connect = self.saved
+
+    def reboot(self):
+        self.ec2.reboot_instances(InstanceIds=[self.target['instance_id']])
+        self.target['rebooted'] = self.clock.now()
+
+    def test_status_checks_stay_ok_across_reboot(self):
+        self.reboot()
+        self.assertTrue(readiness.check_instance_status(self.ec2,self.target,''))
+        self.assertFalse(readiness.check_tcp(self.ec2,self.target,'22'))
+
+    def test_restarted_after_going_down(self):
+        self.reboot()
+        self.assertFalse(readiness.check_restarted(self.ec2,self.target,'22'))
+        self.clock.sleep(self.simulation.profile['reboot'])
+        self.assertTrue(readiness.check_restarted(self.ec2,self.target,'22'))
+
+    def test_restarted_not_seen_down(self):
+        # Probed before the reboot takes the VNF down, or only once it is back
+        self.target['rebooted'] = self.clock.now()
+        self.assertFalse(readiness.check_restarted(self.ec2,self.target,'22'))
+        self.clock.sleep(readiness.REBOOT_GRACE)
+        self.assertTrue(readiness.check_restarted(self.ec2,self.target,'22'))
+
+    def test_restarted_only_after_reboot(self):
+        self.assertNotIn('restarted', [name for name, argument in readiness.parse_checks(readiness.DEFAULT_CHECKS)])
+        self.assertEqual([name for name, argument in readiness.parse_checks(readiness.REBOOT_CHECKS)],
+                         ['interface_attached', 'restarted', 'instance_status'])
+
+
+class NotReadyRollbackTest(unittest.TestCase):
+
+    def test_rollback_releases_attached_interface(self):
+        # VNF attached but never serving its data plane: the launch is abandoned once its readiness timeout expires
+        run = failover.Run({'status_checks': 10000.0},0.002,1,[],tempfile.mkdtemp())
+        self.addCleanup(setattr, readiness, 'connect', readiness.connect)
+        with failover.environment(ReadinessChecks='interface_attached,tcp:1',ReadinessTimeout='60'), contextlib.redirect_stdout(io.StringIO()):
+            run.ec2.add_instance('i-00000000000000001','eu-west-1a')
+            run.publish(failover.lifecycle_event('launch','i-00000000000000001'))
+            run.wait()
+        self.assertEqual(run.failures, [])
+        self.assertEqual(run.asg.result('i-00000000000000001')['Result'], 'ABANDON')
+        # VIP ENI detached and deleted, VIP subnet deleted rather than left disassociated
+        self.assertEqual(run.ec2.leftovers(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
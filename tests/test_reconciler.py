@@ -0,0 +1,121 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  SPDX-License-Identifier: MIT-0
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this
+#  software and associated documentation files (the "Software"), to deal in the Software
+#  without restriction, including without limitation the rights to use, copy, modify,
+#  merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+#  permit persons to whom the Software is furnished to do so.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+#  INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+#  PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+#  HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+#  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+#  SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+sys.path.insert(0, os.path.join(HERE, '..', 'benchmarks'))
+
+import awsclients
+import lease
+import reconciler
+import simbackend
+import statestore
+import waiters
+
+VPC = 'vpc-wan'
+ASG = 'vnf-a-asg'
+ENVIRONMENT = {'AutoScalingGroupName': ASG, 'VPCId': VPC, 'VIPCIDRBlock': '10.16.10.0/24', 'VIPAddress': '10.16.10.20/32', 'LambdaInfoTracing': 'false'}
+
+
+class ReconcilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.simulation = simbackend.Simulation(scale=0.001)
+        self.ec2 = self.simulation.backends['ec2']
+        self.clock = self.simulation.clock
+        self.saved = reconciler.clock, lease.clock, waiters.clock, waiters.sleep
+        reconciler.clock = lease.clock = waiters.clock = self.clock.now
+        waiters.sleep = self.clock.sleep
+        awsclients.clients.update({service: self.simulation.client(service) for service in ('ec2', 'autoscaling')})
+        reconciler.state_store = statestore.get_store('sqlite://' + os.path.join(tempfile.mkdtemp(), 'state.db'))
+        self.environment = {key: os.environ.get(key) for key in list(ENVIRONMENT) + ['VNFRegistry']}
+        os.environ.update(ENVIRONMENT)
+        os.environ.pop('VNFRegistry', None)
+
+    def tearDown(self):
+        reconciler.clock, lease.clock, waiters.clock, waiters.sleep = self.saved
+        reconciler.state_store = None
+        awsclients.clients.clear()
+        for key, value in self.environment.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    def leak(self):
+        """
+        leave a VIP subnet and VIP ENI behind, as a launch failing after create_interface does
+        """
+        client = self.simulation.client('ec2')
+        subnet = client.create_subnet(VpcId=VPC,CidrBlock=ENVIRONMENT['VIPCIDRBlock'],AvailabilityZone='us-east-1a',
+                                      TagSpecifications=[{'ResourceType': 'subnet', 'Tags': [{'Key': 'Name', 'Value': reconciler.SUBNET_NAME}]}])
+        subnet_id = subnet['Subnet']['SubnetId']
+        interface = client.create_network_interface(SubnetId=subnet_id,Description=reconciler.INTERFACE_DESCRIPTION,PrivateIpAddress='10.16.10.20')
+        self.clock.sleep(self.simulation.profile['consistency'])
+        return subnet_id, interface['NetworkInterface']['NetworkInterfaceId']
+
+    def reconcile(self,event):
+        """
+        run the reconciler, returning the report of the VPC and the EMF records it wrote
+        """
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            report = reconciler.lambda_handler(event,None)
+        return report['VPCs'][VPC], [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_release_after_grace_period(self):
+        subnet_id, interface_id = self.leak()
+        report, records = self.reconcile({'id': 'event-1', 'DryRun': True})
+        self.assertEqual(set(report['Orphans']), {subnet_id, interface_id})
+        self.assertEqual(report['Released'], [])
+        self.assertIn(interface_id, self.ec2.interfaces)
+
+        self.clock.sleep(reconciler.GRACE_PERIOD)
+        report, records = self.reconcile({'id': 'event-2'})
+        self.assertEqual(set(report['Released']), {subnet_id, interface_id})
+        self.assertFalse(self.ec2.leftovers())
+
+    def test_live_instance_resources_kept(self):
+        subnet_id, interface_id = self.leak()
+        self.ec2.add_instance('i-0000000000000000a','us-east-1a',launched=self.clock.now() - self.simulation.profile['boot'])
+        self.simulation.backends['autoscaling'].instances['i-0000000000000000a'] = {'LifecycleState': 'InService', 'HealthStatus': 'Healthy'}
+        self.simulation.client('ec2').attach_network_interface(NetworkInterfaceId=interface_id,InstanceId='i-0000000000000000a',DeviceIndex=1)
+        self.clock.sleep(self.simulation.profile['attach'])
+        report, records = self.reconcile({'id': 'event-1'})
+        self.assertEqual(report['Orphans'], {})
+
+    def test_metrics_dimensions(self):
+        self.leak()
+        report, records = self.reconcile({'id': 'event-1', 'DryRun': True})
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual(record['_aws']['CloudWatchMetrics'][0]['Dimensions'], [reconciler.DIMENSIONS])
+        self.assertEqual((record['AutoScalingGroupName'], record['VpcId']), (ASG, VPC))
+        self.assertEqual((record['Reconcile.Subnets'], record['Reconcile.Interfaces'], record['Reconcile.Candidates']), (1, 1, 2))
+        self.assertTrue(record['DryRun'])
+
+
+if __name__ == '__main__':
+    unittest.main()